@@ -6,6 +6,46 @@ import type { ExtractedPOResponse } from '../types/po';
 dotenv.config();
 
 const FASTAPI_BASE_URL = (process.env.FASTAPI_URL || 'http://localhost:8000').replace(/\/$/, '');
+// FASTAPI_USE_JOBS=true submits to POST /jobs and polls GET /jobs/:id instead of holding one request open
+const FASTAPI_USE_JOBS = ['1', 'true', 'yes'].includes((process.env.FASTAPI_USE_JOBS || '').toLowerCase());
+const FASTAPI_JOB_POLL_MS = Number(process.env.FASTAPI_JOB_POLL_MS || 2000);
+
+type ExtractionJob = {
+  job_id: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  attempts: number;
+  error?: string;
+  result?: ExtractedPOResponse;
+};
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function runExtractionJob(formData: FormData, timeout: number): Promise<ExtractedPOResponse> {
+  const deadline = Date.now() + timeout;
+  const { data: created } = await axios.post<ExtractionJob>(`${FASTAPI_BASE_URL}/jobs`, formData, {
+    headers: {
+      ...formData.getHeaders(),
+    },
+    timeout: 60000,
+    maxContentLength: Infinity,
+    maxBodyLength: Infinity,
+  });
+  console.log(`[Backend] FastAPI job queued: ${created.job_id}`);
+
+  while (Date.now() < deadline) {
+    await sleep(FASTAPI_JOB_POLL_MS);
+    const { data: job } = await axios.get<ExtractionJob>(`${FASTAPI_BASE_URL}/jobs/${created.job_id}`, {
+      timeout: 30000,
+    });
+    if (job.status === 'succeeded' && job.result) {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(`FastAPI job ${job.job_id} failed after ${job.attempts} attempt(s): ${job.error ?? 'unknown error'}`);
+    }
+  }
+  throw new Error(`FastAPI job ${created.job_id} did not finish within ${(timeout / 1000).toFixed(0)}s. Consider increasing FASTAPI_TIMEOUT_MS environment variable.`);
+}
 
 export const fastapiService = {
   async extractPurchaseOrder(
@@ -37,19 +77,23 @@ export const fastapiService = {
       console.log(`[Backend] Starting FastAPI extraction for file: ${file.originalname} (${fileSizeKB} KB)`);
       console.log(`[Backend] FastAPI URL: ${FASTAPI_BASE_URL}`);
       console.log(`[Backend] Timeout: ${(timeout / 1000).toFixed(0)}s`);
-      
-      const { data } = await axios.post<ExtractedPOResponse>(
-        `${FASTAPI_BASE_URL}/extract-invoice`,
-        formData,
-        {
-          headers: {
-            ...formData.getHeaders(),
-          },
-          timeout,
-          maxContentLength: Infinity,
-          maxBodyLength: Infinity,
-        },
-      );
+
+      const data = FASTAPI_USE_JOBS
+        ? await runExtractionJob(formData, timeout)
+        : (
+            await axios.post<ExtractedPOResponse>(
+              `${FASTAPI_BASE_URL}/extract-invoice`,
+              formData,
+              {
+                headers: {
+                  ...formData.getHeaders(),
+                },
+                timeout,
+                maxContentLength: Infinity,
+                maxBodyLength: Infinity,
+              },
+            )
+          ).data;
 
       const duration = ((Date.now() - startTime) / 1000).toFixed(2);
       console.log(`[Backend] FastAPI extraction completed in ${duration}s for file: ${file.originalname}`);
@@ -0,0 +1,198 @@
+"""Document compaction between reading a file and building the prompt.
+
+Everything here is lossless for extraction purposes: it only removes what the model would
+ignore anyway (layout whitespace, empty rows/columns, pandas "Unnamed: n" placeholders and
+trailing ".0" on whole numbers, header blocks repeated on every page or sheet), so the same
+items come back for fewer input tokens.
+
+count_tokens() uses tiktoken when it is installed and a chars/4 estimate otherwise. Workbooks are
+read row by row (excel_reader.py), imported on first Excel use so importing this module stays cheap.
+"""
+import csv
+import datetime
+import io
+import math
+import re
+from functools import lru_cache
+
+# Lines this close to the top/bottom of a page are candidates for repeated header/footer removal
+PAGE_HEADER_LINES = 8
+PAGE_FOOTER_LINES = 3
+
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_COLUMN_GAP = re.compile(r"[ \u00a0]{2,}|\t")
+_NUMBER_LIKE = re.compile(r"^-?\d[\d,]*(?:\.\d+)?$")
+
+
+def _collapse(line: str) -> str:
+    return _SPACES.sub(" ", line).strip()
+
+
+def _collapse_columns(line: str) -> str:
+    """Layout-mode text: gaps of 2+ spaces separate table columns and become one tab each."""
+    return _collapse(_COLUMN_GAP.sub("\x00", line.strip())).replace("\x00", "\t")
+
+
+def compact_pdf_pages(page_texts: list[str], columns: bool = False) -> list[str]:
+    """Collapse layout whitespace, drop blank lines and header/footer lines repeated from earlier pages.
+
+    columns=True (text from layout-mode extraction) keeps column boundaries as tabs.
+    """
+    collapse = _collapse_columns if columns else _collapse
+    seen_edges: set[str] = set()
+    pages = []
+    for text in page_texts:
+        lines = [line for line in (collapse(raw) for raw in text.splitlines()) if line]
+        edge_positions = set(range(min(PAGE_HEADER_LINES, len(lines))))
+        edge_positions.update(range(max(0, len(lines) - PAGE_FOOTER_LINES), len(lines)))
+        kept = []
+        for pos, line in enumerate(lines):
+            if pos in edge_positions:
+                if line in seen_edges and not _is_item_line(line):
+                    continue
+                seen_edges.add(line)
+            kept.append(line)
+        pages.append("\n".join(kept))
+    return pages
+
+
+def _is_item_line(line: str) -> bool:
+    """Serial-numbered rows are never treated as repeated headers, even if identical."""
+    parts = line.split(None, 1)
+    return len(parts) == 2 and parts[0].rstrip(".)").isdigit()
+
+
+def _cell(value) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime):
+        if (value.hour, value.minute, value.second, value.microsecond) == (0, 0, 0, 0):
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat(sep=" ")
+    text = _collapse(str(value))
+    return "" if text.startswith("Unnamed: ") else text
+
+
+def _title_row_index(rows: list[list[str]]) -> int | None:
+    """Index of the column-title row: the first row with 3+ filled cells and no numbers."""
+    for i, row in enumerate(rows):
+        filled = [c for c in row if c]
+        if len(filled) >= 3 and not any(_NUMBER_LIKE.match(c) for c in filled):
+            return i
+    return None
+
+
+def sheet_cells(rows) -> list[list[str]]:
+    """Cells of one sheet (rows of cell values, e.g. from excel_reader.iter_sheets) as text, without fully empty rows."""
+    cells = ([_cell(v) for v in row] for row in rows)
+    return [row for row in cells if any(row)]
+
+
+def _drop_empty_columns(rows: list[list[str]]) -> list[list[str]]:
+    """Remove columns that are empty in every row, and trailing empty cells (they carry no position).
+
+    Rows are replaced in place, so a large sheet is not held twice.
+    """
+    if not rows:
+        return []
+    width = max(len(row) for row in rows)
+    filled = [False] * width
+    for row in rows:
+        for j, cell in enumerate(row):
+            if cell:
+                filled[j] = True
+    keep = [j for j in range(width) if filled[j]]
+    for i, row in enumerate(rows):
+        cells = [row[j] if j < len(row) else "" for j in keep]
+        while cells and not cells[-1]:
+            cells.pop()
+        rows[i] = cells
+    return rows
+
+
+def _csv_length(rows: list[list[str]]) -> int:
+    """Length of the rows written by csv.writer (minimal quoting), without writing them."""
+    end = len(rows)
+    while end and not rows[end - 1]:
+        end -= 1  # trailing empty rows are only newlines, stripped with the last one
+    total = 0
+    for row in rows[:end]:
+        total += max(len(row), 1)  # separators and the newline
+        if row == [""]:
+            total += 2  # written as ""
+        for cell in row:
+            total += len(cell)
+            if "," in cell or '"' in cell or "\n" in cell or "\r" in cell:
+                total += 2 + cell.count('"')
+    return total - 1 if end else 0
+
+
+def encode_rows(rows: list[list[str]], table_format: str = "auto") -> str:
+    """Serialise rows as CSV or TSV; "auto" picks whichever is shorter (only the chosen text is built)."""
+    if table_format == "tsv" or (table_format == "auto" and not any("\t" in c or "\n" in c for r in rows for c in r)):
+        tsv_length = sum(len(cell) for row in rows for cell in row) + sum(max(len(row) - 1, 0) for row in rows)
+        tsv_length += len(rows) - 1 if rows else 0
+        if table_format == "tsv" or tsv_length < _csv_length(rows):
+            return "\n".join("\t".join(row) for row in rows)
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(rows)
+    return buf.getvalue().rstrip("\n")
+
+
+def compact_excel_text(source, table_format: str = "auto") -> str:
+    """Every worksheet as compact table text.
+
+    Rows above the column-title row (buyer, PO number, date) are sent as their filled cells only;
+    empty columns are dropped from the table below it. Header rows repeated on later sheets or
+    further down a sheet (printed page breaks) are sent once.
+    """
+    from excel_reader import iter_sheets
+
+    seen_header_rows: set[tuple[str, ...]] = set()
+    parts = []
+    for sheet_name, sheet_rows in iter_sheets(source):
+        rows = sheet_cells(sheet_rows)
+        title = _title_row_index(rows)
+        header_end = -1 if title is None else title
+        header_rows, table_rows = [], []
+        for i, row in enumerate(rows):
+            key = tuple(c for c in row if c)
+            if key in seen_header_rows:
+                continue
+            if i < header_end:
+                seen_header_rows.add(key)
+                header_rows.append(list(key))
+            else:
+                if i == header_end:
+                    seen_header_rows.add(key)
+                table_rows.append(row)
+        body = header_rows + _drop_empty_columns(table_rows)
+        if body:
+            parts.append(f"=== Sheet: {sheet_name} ===\n" + encode_rows(body, table_format))
+    return "\n\n".join(parts)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def tokenizer_name(model: str = "gpt-4o-mini") -> str:
+    return "tiktoken" if _encoding(model) is not None else "chars/4 estimate"
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Prompt tokens for text: exact with tiktoken installed, otherwise ~4 chars per token."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,390 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when the extraction queue is already at its configured depth."""
+
+    def __init__(self, in_flight: int, waiting: int, retry_after: int):
+        super().__init__(f"Extraction queue full ({in_flight} running, {waiting} waiting)")
+        self.in_flight = in_flight
+        self.waiting = waiting
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(QueueFullError):
+    """Raised when a queued request waited max_wait seconds without getting a slot."""
+
+    def __init__(self, waited: float, in_flight: int, waiting: int, retry_after: int):
+        Exception.__init__(self, f"No extraction slot after {waited:g}s ({in_flight} running, {waiting} waiting)")
+        self.in_flight = in_flight
+        self.waiting = waiting
+        self.retry_after = retry_after
+
+
+class ExtractionLimiter:
+    """Caps concurrent extractions and rejects new work once too many requests are queued.
+
+    max_concurrency extractions run at once; up to max_queue more wait for a slot, for at most
+    max_wait seconds (0 = no limit). Anything beyond that is rejected so callers can retry later
+    instead of piling up behind a 10-minute timeout.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after: int = 30, max_wait: float = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.max_wait = max(0.0, max_wait)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue
+
+    def check(self) -> None:
+        """Raise QueueFullError now if a new request would be rejected."""
+        if self.saturated:
+            raise QueueFullError(self.in_flight, self.waiting, self.retry_after)
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait or None)
+        except asyncio.TimeoutError:
+            raise QueueTimeoutError(self.max_wait, self.in_flight, self.waiting - 1, self.retry_after) from None
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+        }
+
+
+def _shared_db(path: str) -> sqlite3.Connection:
+    # The tables only hold live state, so commits are not synced to disk
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    return conn
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedExtractionLimiter:
+    """ExtractionLimiter whose slots and queue are shared by every worker process on the host.
+
+    Running and waiting extractions are rows in a SQLite file (one per request, tagged with the
+    worker's pid), so max_concurrency and max_queue are totals for the whole service rather than
+    per worker. A waiter checks whether it is among the oldest waiters that fit in the free slots,
+    first after poll_interval seconds and then backing off up to max_poll_interval. Rows of a worker
+    that died are dropped on the next reap.
+
+    Taking, polling and releasing a slot are short transactions on a local file, run in a thread:
+    with BEGIN IMMEDIATE they can wait up to the 10s busy timeout for another worker's write.
+    """
+
+    REAP_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        path: str,
+        max_concurrency: int,
+        max_queue: int,
+        retry_after: int = 30,
+        max_wait: float = 0,
+        poll_interval: float = 0.05,
+        max_poll_interval: float = 1.0,
+    ):
+        self.path = path
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.max_wait = max(0.0, max_wait)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+        self._lock = threading.Lock()
+        self._conn = _shared_db(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_slots ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, pid INTEGER NOT NULL, running INTEGER NOT NULL, since REAL NOT NULL)"
+        )
+        self._last_reap = 0.0
+
+    def _reap(self) -> None:
+        """Drop the rows of worker processes that no longer exist (inside a transaction)."""
+        now = time.monotonic()
+        if now - self._last_reap < self.REAP_INTERVAL:
+            return
+        self._last_reap = now
+        pids = [pid for (pid,) in self._conn.execute("SELECT DISTINCT pid FROM extraction_slots")]
+        dead = [pid for pid in pids if pid != os.getpid() and not _pid_alive(pid)]
+        if dead:
+            self._conn.execute(
+                f"DELETE FROM extraction_slots WHERE pid IN ({','.join('?' * len(dead))})", dead
+            )
+            print(f"[FastAPI] Released extraction slots of exited workers {dead}")
+
+    def _counts(self) -> tuple[int, int]:
+        running, waiting = self._conn.execute(
+            "SELECT COALESCE(SUM(running), 0), COALESCE(SUM(1 - running), 0) FROM extraction_slots"
+        ).fetchone()
+        return running, waiting
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _enter(self) -> tuple[int, bool]:
+        """Take a slot, or a place in the queue: (row id, running). Raises QueueFullError when neither is free."""
+
+        def enter():
+            self._reap()
+            running, waiting = self._counts()
+            if running + waiting < self.max_concurrency:
+                state = 1
+            elif waiting < self.max_queue:
+                state = 0
+            else:
+                raise QueueFullError(running, waiting, self.retry_after)
+            cursor = self._conn.execute(
+                "INSERT INTO extraction_slots (pid, running, since) VALUES (?, ?, ?)", (os.getpid(), state, time.time())
+            )
+            return cursor.lastrowid, bool(state)
+
+        return self._transaction(enter)
+
+    def _promote(self, row_id: int) -> bool:
+        """Start a queued row if it is among the oldest waiters that fit in the free slots."""
+
+        def promote():
+            self._reap()
+            running, _ = self._counts()
+            ahead = self._conn.execute(
+                "SELECT COUNT(*) FROM extraction_slots WHERE running = 0 AND id < ?", (row_id,)
+            ).fetchone()[0]
+            if running + ahead >= self.max_concurrency:
+                return False
+            self._conn.execute("UPDATE extraction_slots SET running = 1, since = ? WHERE id = ?", (time.time(), row_id))
+            return True
+
+        return self._transaction(promote)
+
+    def _leave(self, row_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM extraction_slots WHERE id = ?", (row_id,))
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._counts()[0]
+
+    @property
+    def waiting(self) -> int:
+        with self._lock:
+            return self._counts()[1]
+
+    @property
+    def saturated(self) -> bool:
+        with self._lock:
+            running, waiting = self._counts()
+        return running >= self.max_concurrency and waiting >= self.max_queue
+
+    def check(self) -> None:
+        """Raise QueueFullError now if a new request would be rejected."""
+        with self._lock:
+            running, waiting = self._counts()
+        if running >= self.max_concurrency and waiting >= self.max_queue:
+            raise QueueFullError(running, waiting, self.retry_after)
+
+    async def _enter_async(self) -> tuple[int, bool]:
+        entering = asyncio.ensure_future(asyncio.to_thread(self._enter))
+        try:
+            return await asyncio.shield(entering)
+        except asyncio.CancelledError:
+            # The insert still completes in its thread; drop its row once it has
+            def leave(task: asyncio.Future) -> None:
+                if not task.cancelled() and task.exception() is None:
+                    self._leave(task.result()[0])
+
+            entering.add_done_callback(leave)
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        row_id, running = await self._enter_async()
+        try:
+            deadline = time.monotonic() + self.max_wait if self.max_wait else None
+            delay = self.poll_interval
+            while not running:
+                if deadline is not None and time.monotonic() >= deadline:
+                    in_flight, waiting = await asyncio.to_thread(self._locked_counts)
+                    raise QueueTimeoutError(self.max_wait, in_flight, waiting - 1, self.retry_after)
+                await asyncio.sleep(delay if deadline is None else max(0.0, min(delay, deadline - time.monotonic())))
+                delay = min(delay * 2, self.max_poll_interval)
+                running = await asyncio.to_thread(self._promote, row_id)
+            yield
+        finally:
+            await asyncio.to_thread(self._leave, row_id)
+
+    def _locked_counts(self) -> tuple[int, int]:
+        with self._lock:
+            return self._counts()
+
+    def stats(self) -> dict:
+        with self._lock:
+            running, waiting = self._counts()
+            workers = self._conn.execute("SELECT COUNT(DISTINCT pid) FROM extraction_slots").fetchone()[0]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": running,
+            "waiting": waiting,
+            "shared": self.path,
+            "workers_busy": workers,
+        }
+
+
+def shared_state_path() -> str | None:
+    """File the worker processes share limits through, or None when there is only one worker.
+
+    SHARED_STATE=auto (default) shares them when WEB_CONCURRENCY > 1 (set by gunicorn.conf.py and
+    read by uvicorn --workers); 1 forces it on, 0 off. SHARED_STATE_PATH picks the file.
+    """
+    setting = os.getenv("SHARED_STATE", "auto").strip().lower()
+    if setting in ("0", "false", "off"):
+        return None
+    if setting == "auto" and int(os.getenv("WEB_CONCURRENCY", "1") or 1) <= 1:
+        return None
+    return os.getenv("SHARED_STATE_PATH") or os.path.join(tempfile.gettempdir(), "invoice_api_shared_state.sqlite3")
+
+
+def limiter_from_env() -> ExtractionLimiter | SharedExtractionLimiter:
+    """EXTRACTION_CONCURRENCY / EXTRACTION_MAX_QUEUE are per process, or service totals with shared state."""
+    settings = dict(
+        max_concurrency=int(os.getenv("EXTRACTION_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("EXTRACTION_MAX_QUEUE", "16")),
+        retry_after=int(os.getenv("EXTRACTION_RETRY_AFTER", "30")),
+        max_wait=float(os.getenv("EXTRACTION_MAX_WAIT", "120")),
+    )
+    path = shared_state_path()
+    if path:
+        return SharedExtractionLimiter(path, **settings)
+    return ExtractionLimiter(**settings)
+
+
+class ProviderRateLimiter:
+    """Per-provider request rate limit (requests per minute), shared by every extraction call.
+
+    Token bucket with a burst of one call: acquire() waits until the provider's next slot is due.
+    A provider with no configured limit (or 0) is never throttled.
+    """
+
+    def __init__(self, rpm: dict[str, float]):
+        self._interval = {provider: 60.0 / limit for provider, limit in rpm.items() if limit and limit > 0}
+        self._next_slot: dict[str, float] = {}
+        self._lock = asyncio.Lock()
+        self.throttled = 0
+
+    async def acquire(self, provider: str) -> None:
+        interval = self._interval.get(provider)
+        if interval is None:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            slot = max(now, self._next_slot.get(provider, now))
+            self._next_slot[provider] = slot + interval
+        if slot > now:
+            self.throttled += 1
+            await asyncio.sleep(slot - now)
+
+    def stats(self) -> dict:
+        return {
+            "rpm": {provider: round(60.0 / interval, 2) for provider, interval in self._interval.items()},
+            "throttled": self.throttled,
+        }
+
+
+class SharedProviderRateLimiter(ProviderRateLimiter):
+    """ProviderRateLimiter whose per-provider next slot lives in a SQLite file shared by every worker."""
+
+    def __init__(self, path: str, rpm: dict[str, float]):
+        super().__init__(rpm)
+        self.path = path
+        self._db_lock = threading.Lock()
+        self._conn = _shared_db(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS provider_slots (provider TEXT PRIMARY KEY, next_slot REAL NOT NULL)")
+
+    def _reserve(self, provider: str, interval: float) -> tuple[float, float]:
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT next_slot FROM provider_slots WHERE provider = ?", (provider,)).fetchone()
+                slot = max(now, row[0]) if row else now
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO provider_slots (provider, next_slot) VALUES (?, ?)", (provider, slot + interval)
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return now, slot
+
+    async def acquire(self, provider: str) -> None:
+        interval = self._interval.get(provider)
+        if interval is None:
+            return
+        now, slot = await asyncio.to_thread(self._reserve, provider, interval)
+        if slot > now:
+            self.throttled += 1
+            await asyncio.sleep(slot - now)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "shared": self.path}
+
+
+def rate_limiter_from_env() -> ProviderRateLimiter:
+    """OPENAI_RPM / GEMINI_RPM: max provider calls per minute (unset or 0 = unlimited), for the whole service."""
+    rpm = {
+        "openai": float(os.getenv("OPENAI_RPM", "0")),
+        "gemini": float(os.getenv("GEMINI_RPM", "0")),
+    }
+    path = shared_state_path()
+    if path:
+        return SharedProviderRateLimiter(path, rpm)
+    return ProviderRateLimiter(rpm)
@@ -0,0 +1,122 @@
+"""Uploaded documents kept in memory instead of temp files.
+
+The PDF and Excel readers (pypdf, pandas/openpyxl/xlrd) all accept a seekable binary stream, so an
+upload is read once and every reader gets its own stream over the same buffer:
+
+- small uploads are read into bytes; io.BytesIO over bytes shares the buffer rather than copying it
+- uploads of at least UPLOAD_MMAP_THRESHOLD bytes have already been spooled to disk by the
+  multipart parser, so the spooled file is memory-mapped read-only instead of being read into RAM
+
+Nothing is written to disk by the extraction pipeline itself, so there is nothing to clean up if
+the process is killed mid-request.
+"""
+import asyncio
+import io
+import mmap
+import os
+
+# Starlette spools uploads above 1 MB to disk; map anything this large instead of copying it into memory
+UPLOAD_MMAP_THRESHOLD = int(os.getenv("UPLOAD_MMAP_THRESHOLD", str(8 * 1024 * 1024)))
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".xls": "application/vnd.ms-excel",
+}
+
+
+class _BufferStream(io.RawIOBase):
+    """Read-only seekable stream over a buffer (e.g. an mmap) with its own position; no copy."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer  # for readers that take the whole file as a buffer (xlrd)
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+            self.buffer = None
+        super().close()
+
+
+def open_stream(data) -> io.BufferedIOBase:
+    """A fresh binary stream over the document bytes (bytes or mmap)."""
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return io.BufferedReader(_BufferStream(data))
+
+
+async def read_upload(file) -> bytes | mmap.mmap:
+    """Read an UploadFile, memory-mapping its spooled file when it is large."""
+    size = file.size
+    if size is not None and size >= UPLOAD_MMAP_THRESHOLD:
+        try:
+            spool = file.file
+            spool.flush()
+            return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            pass
+    return await file.read()
+
+
+def release(data) -> None:
+    """Unmap an mmap-backed document; bytes need no cleanup."""
+    if isinstance(data, mmap.mmap):
+        try:
+            data.close()
+        except BufferError:
+            # A reader still holds a view; the mapping is released when it is garbage collected
+            pass
+
+
+def pdf_pages(data, pages: list[int]) -> bytes:
+    """A new PDF holding the given pages (0-indexed, in order) of a PDF document (bytes or mmap)."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(open_stream(data))
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(reader.pages[page])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class UploadedDocument:
+    """A document uploaded to Gemini, plus the same request as a text prompt for the other providers.
+
+    text_prompt() is built on first use, so the PDF text is only extracted when a call actually
+    fails over (or is hedged) to a provider that cannot read the file.
+    """
+
+    def __init__(self, file, build_text_prompt):
+        self.file = file
+        self._build_text_prompt = build_text_prompt
+        self._text_prompt = None
+
+    async def text_prompt(self) -> str:
+        if self._text_prompt is None:
+            self._text_prompt = asyncio.ensure_future(self._build_text_prompt())
+        # Shielded: a hedged call that is cancelled does not cancel the extraction another call awaits
+        return await asyncio.shield(self._text_prompt)
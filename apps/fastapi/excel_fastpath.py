@@ -0,0 +1,424 @@
+"""Rule-driven extraction for Excel POs when the client's mapping is known.
+
+The client mapping ("OurField -> Client column (instruction)") is resolved against the sheet's
+header row; mapped columns are copied and enum fields normalised with vectorised pandas
+operations. Only what the rules cannot resolve is left for the LLM:
+
+- header fields (PO number / date / buyer) that are not found next to a known label, and
+- item fields whose mapping is a free-form instruction, or rows without a style code that
+  still look like data.
+
+plan_excel_extraction() returns None when no sheet has a recognisable header row; the caller
+then falls back to the regular whole-workbook LLM path. Sheets are read row by row
+(excel_reader.py): only the first HEADER_SCAN_ROWS rows of a sheet are read until it turns out to
+have a header row with the mapped style column, so a workbook the fast path cannot use costs
+little before the fallback reads it again.
+"""
+import datetime
+import itertools
+import json
+import re
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from normalize import NORMALIZERS, normalize_category, normalize_metal, normalize_tone, to_quantity
+from postprocess import ENUM_FIELDS, ITEM_FIELDS, NULLABLE_FIELDS
+from prompt_cache import PREFIX_END
+
+# Names used in client mappings that differ from the canonical schema
+FIELD_ALIASES = {
+    "stylecode": "VendorStyleCode",
+    "designproductioninstructions": "DesignProductionInstruction",
+    "stampinstructions": "StampInstruction",
+}
+
+INVOICE_NUMBER_LABELS = [
+    "purchase order number", "purchase order no", "purchase order #", "purchase order",
+    "p.o. number", "p.o. no", "p.o. #", "po number", "po no", "po #", "order number", "order no", "order #",
+]
+INVOICE_DATE_LABELS = ["po date", "p.o. date", "order date", "date"]
+HEADER_SCAN_ROWS = 40
+ASSIST_BATCH_ROWS = 200
+
+_BLANK_RULE = re.compile(r"^\(?\s*blank( if not present)?\s*\)?$", re.IGNORECASE)
+_MAPPING_LINE = re.compile(r"^\s*([A-Za-z]+)\s*->\s*(.*?)\s*$")
+
+
+def _norm(text) -> str:
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+@dataclass
+class FieldRule:
+    field: str
+    kind: str  # "column" | "enum_column" | "enum_description" | "header" | "blank" | "instruction"
+    rule: str
+    column: str | None = None
+
+
+@dataclass
+class ExcelPlan:
+    """Deterministic result plus whatever still needs the LLM."""
+
+    header: dict
+    items: pd.DataFrame
+    header_text: str
+    header_missing: list[str]
+    instruction_rules: list[FieldRule]
+    assist_rows: list[int]
+    rows_text: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def needs_llm(self) -> bool:
+        return bool(self.header_missing or self.instruction_rules or self.assist_rows)
+
+
+def parse_mapping(mapping_text: str) -> dict[str, str]:
+    """{canonical field: right-hand side} from "OurField -> rule" lines."""
+    rules = {}
+    for line in mapping_text.splitlines():
+        match = _MAPPING_LINE.match(line)
+        if not match:
+            continue
+        name, rhs = match.groups()
+        canonical = FIELD_ALIASES.get(name.lower()) or next((f for f in ITEM_FIELDS if f.lower() == name.lower()), None)
+        if canonical and canonical not in rules:
+            rules[canonical] = rhs
+    return rules
+
+
+def _match_column(rhs: str, columns: dict[str, str]) -> str | None:
+    """Longest table column that the rule names, either exactly or as its leading words."""
+    text = _norm(rhs)
+    best = None
+    for key, column in columns.items():
+        if text == key or (text.startswith(key + " ") and len(key) > 2):
+            if best is None or len(key) > len(_norm(best)):
+                best = column
+    return best
+
+
+def _description_columns(columns: dict[str, str]) -> list[str]:
+    return [col for key, col in columns.items() if "desc" in key or key in ("category", "item type", "product type")]
+
+
+def classify_rules(mapping: dict[str, str], columns: list[str]) -> list[FieldRule]:
+    by_key = {_norm(c): c for c in columns}
+    rules = []
+    for name, rhs in mapping.items():
+        if rhs.lower().startswith("[header]"):
+            rules.append(FieldRule(name, "header", rhs, rhs[len("[header]"):].strip()))
+            continue
+        if not rhs or _BLANK_RULE.match(rhs):
+            rules.append(FieldRule(name, "blank", rhs))
+            continue
+        column = _match_column(rhs, by_key)
+        if name in ENUM_FIELDS:
+            if column is not None:
+                rules.append(FieldRule(name, "enum_column", rhs, column))
+            elif "description" in rhs.lower() or "category" in rhs.lower():
+                rules.append(FieldRule(name, "enum_description", rhs))
+            else:
+                rules.append(FieldRule(name, "instruction", rhs))
+        elif column is not None and _norm(rhs) == _norm(column):
+            rules.append(FieldRule(name, "column", rhs, column))
+        elif name == "ItemPoNo":
+            rules.append(FieldRule(name, "header", rhs, rhs))
+        else:
+            rules.append(FieldRule(name, "instruction", rhs))
+    return rules
+
+
+def _header_candidates(mapping: dict[str, str]) -> set[str]:
+    candidates = {"description", "sr no", "sr. no.", "s.no", "s. no.", "sl no", "qty", "quantity", "size"}
+    for rhs in mapping.values():
+        if rhs.lower().startswith("[header]") or _BLANK_RULE.match(rhs or ""):
+            continue
+        candidates.add(_norm(rhs))
+    return candidates
+
+
+def _find_header_row(raw: pd.DataFrame, candidates: set[str]) -> int | None:
+    best_row, best_score = None, 1
+    for idx in range(min(HEADER_SCAN_ROWS, len(raw))):
+        cells = [_norm(v) for v in raw.iloc[idx].tolist() if isinstance(v, str) and v.strip()]
+        score = sum(
+            1 for cell in cells if cell in candidates or any(c.startswith(cell + " ") for c in candidates if len(cell) > 2)
+        )
+        if score > best_score:
+            best_row, best_score = idx, score
+    return best_row
+
+
+def _cell_text(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def find_labelled_value(region: pd.DataFrame, labels: list[str]) -> str:
+    """Value for the first label found: after the label in the same cell, else the next non-empty cell to the right.
+
+    Longer labels are tried first, and a label must end the cell or be followed by ':', '#' or '-'
+    (after an optional abbreviation dot), so "Purchase Order Date: 12/01" is not read as the
+    value of "purchase order".
+    """
+    rows = [[re.sub(r"\s+", " ", _cell_text(v)) for v in row] for row in region.itertuples(index=False)]
+    for label in sorted(dict.fromkeys(labels), key=len, reverse=True):
+        for row in rows:
+            for col, cell in enumerate(row):
+                text = cell.lower()
+                if not text.startswith(label):
+                    continue
+                rest = cell[len(label):]
+                if label[-1] not in ":#-":
+                    separated = rest.removeprefix(".").lstrip()
+                    if separated and separated[0] not in ":#-":
+                        continue
+                value = rest.lstrip(" :#.-").strip()
+                if value:
+                    return value
+                for neighbour in row[col + 1:]:
+                    if neighbour:
+                        return neighbour
+    return ""
+
+
+def _sheet_items(raw: pd.DataFrame, header_row: int, mapping: dict[str, str]):
+    header_cells = [_cell_text(v) or f"Column {i + 1}" for i, v in enumerate(raw.iloc[header_row].tolist())]
+    body = raw.iloc[header_row + 1:].copy()
+    body.columns = header_cells
+    body = body.loc[:, ~pd.Index(header_cells).duplicated()]
+    body = body.dropna(how="all")
+    rules = classify_rules(mapping, list(body.columns))
+    return body, rules
+
+
+def _has_style_column(raw: pd.DataFrame, header_row: int, mapping: dict[str, str]) -> bool:
+    header_cells = [_cell_text(v) for v in raw.iloc[header_row].tolist()]
+    return any(r.field == "VendorStyleCode" and r.kind == "column" for r in classify_rules(mapping, header_cells))
+
+
+def plan_excel_extraction(source, mapping_text: str, client_name_hint: str | None = None) -> ExcelPlan | None:
+    mapping = parse_mapping(mapping_text or "")
+    if "VendorStyleCode" not in mapping:
+        return None
+    candidates = _header_candidates(mapping)
+
+    from excel_reader import iter_sheets
+
+    frames = []
+    header_region = None
+    rules = None
+    for _, sheet_rows in iter_sheets(source):
+        # Only the first HEADER_SCAN_ROWS rows are read unless the sheet has a header row with the style column
+        head = list(itertools.islice(sheet_rows, HEADER_SCAN_ROWS))
+        head_frame = pd.DataFrame(head)
+        if head_frame.empty:
+            continue
+        header_row = _find_header_row(head_frame, candidates)
+        if header_row is None or not _has_style_column(head_frame, header_row, mapping):
+            continue
+        # One object per distinct string, as pandas' own reader does: PO columns repeat the same
+        # metal/tone/description values thousands of times
+        strings = {}
+        head.extend(tuple(strings.setdefault(v, v) if isinstance(v, str) else v for v in row) for row in sheet_rows)
+        raw = pd.DataFrame(head)
+        del head, strings
+        body, sheet_rules = _sheet_items(raw, header_row, mapping)
+        style_rule = next((r for r in sheet_rules if r.field == "VendorStyleCode"), None)
+        if style_rule is None or style_rule.kind != "column":
+            continue
+        if rules is None:
+            rules = sheet_rules
+            header_region = raw.iloc[:header_row]
+        frames.append(body)
+    if not frames or rules is None:
+        return None
+
+    # Align every sheet on the first sheet's columns so one vectorised pass covers all rows
+    table = pd.concat(frames, ignore_index=True, sort=False)
+    rules_by_field = {r.field: r for r in rules}
+    text = table.astype(object).where(table.notna(), None)
+
+    def column_text(column: str) -> pd.Series:
+        return text[column].map(_cell_text)
+
+    items = pd.DataFrame(index=table.index)
+    description_cols = _description_columns({_norm(c): c for c in table.columns})
+    description = (
+        pd.Series(" ", index=table.index).str.cat([column_text(c) for c in description_cols], sep=" ")
+        if description_cols
+        else pd.Series("", index=table.index)
+    )
+    instruction_rules = []
+    for name in ITEM_FIELDS:
+        rule = rules_by_field.get(name)
+        default = None if name in NULLABLE_FIELDS else ""
+        if rule is None or rule.kind in ("blank", "header"):
+            items[name] = default
+        elif rule.kind == "column":
+            values = column_text(rule.column)
+            items[name] = values if default == "" else values.where(values != "", None)
+        elif rule.kind == "enum_column":
+            values = column_text(rule.column)
+            if name in ("Category", "Metal", "Tone"):
+                items[name] = {"Category": normalize_category, "Metal": normalize_metal, "Tone": normalize_tone}[name](
+                    values, keep_unmatched=True
+                )
+            else:
+                items[name] = NORMALIZERS[name](values)
+        elif rule.kind == "enum_description":
+            items[name] = NORMALIZERS[name](description)
+        else:
+            items[name] = default
+            instruction_rules.append(rule)
+
+    # Category is usually unmapped but always derivable from the description
+    if "Category" not in rules_by_field:
+        category_col = next((c for c in table.columns if _norm(c) == "category"), None)
+        items["Category"] = normalize_category(column_text(category_col) if category_col else description)
+    if "OrderQty" in rules_by_field and rules_by_field["OrderQty"].kind == "column":
+        items["OrderQty"] = to_quantity(table[rules_by_field["OrderQty"].column])
+    else:
+        items["OrderQty"] = 0
+
+    style = items["VendorStyleCode"]
+    filled = text.notna().sum(axis=1)
+    cells = [column_text(c) for c in table.columns]
+    joined = cells[0].str.cat(cells[1:], sep="\x1f") if len(cells) > 1 else cells[0]
+    row_text = joined.str.replace(r"\x1f+", " | ", regex=True).str.strip(" |")
+    is_total = row_text.str.contains(r"\btotal\b", case=False, regex=True)
+    is_item = style != ""
+    # Rows with no style code: drop obvious totals/notes, ask the LLM about anything that still looks like data
+    needs_assist = ~is_item & ~is_total & (filled >= 3)
+    items = items[is_item | needs_assist].astype(object)
+
+    header = {"client_name": client_name_hint or "", "invoice_number": "", "invoice_date": "", "total_value": None}
+    header_text = ""
+    if header_region is not None and len(header_region):
+        po_rule = rules_by_field.get("ItemPoNo")
+        labels = ([_norm(po_rule.column)] if po_rule is not None and po_rule.kind == "header" else []) + INVOICE_NUMBER_LABELS
+        header["invoice_number"] = find_labelled_value(header_region, labels)
+        header["invoice_date"] = find_labelled_value(header_region, INVOICE_DATE_LABELS)
+        header_text = "\n".join(
+            " | ".join(_cell_text(v) for v in row if _cell_text(v))
+            for row in header_region.itertuples(index=False)
+        ).strip()
+    po_rule = rules_by_field.get("ItemPoNo")
+    if po_rule is None or po_rule.kind == "header":
+        items["ItemPoNo"] = header["invoice_number"]
+
+    header_missing = [name for name in ("client_name", "invoice_number") if not header[name]]
+    if header_missing and not header_text:
+        # Nothing above the table to look at; leave the fields empty rather than calling the LLM
+        header_missing = []
+
+    assist_rows = list(needs_assist[needs_assist].index)
+    rows_for_llm = items.index if instruction_rules else pd.Index(assist_rows)
+    return ExcelPlan(
+        header=header,
+        items=items,
+        header_text=header_text,
+        header_missing=header_missing,
+        instruction_rules=instruction_rules,
+        assist_rows=assist_rows,
+        rows_text={int(i): row_text[i] for i in rows_for_llm},
+    )
+
+
+def header_prompt(plan: ExcelPlan) -> str:
+    return (
+        "Below are the header rows of a client's Purchase Order spreadsheet sent to Chandra Jewels (vendor). "
+        "Return JSON only with keys client_name (the buyer, never Chandra Jewels), invoice_number (PO/Order number), "
+        'invoice_date (yyyy-mm-dd or ""), total_value (number or null). Use "" when not present.\n\n'
+        f"Header rows:\n{plan.header_text}"
+    )
+
+
+def row_prompts(plan: ExcelPlan, prompt_base: str, mapping_text: str) -> list[str]:
+    """Compact prompts for rows/fields the rules could not resolve, ASSIST_BATCH_ROWS rows per prompt.
+
+    The full schema and client mapping are only included when whole rows need extracting.
+    """
+    if not plan.rows_text:
+        return []
+    # Rules and mapping first, up to PREFIX_END, so the provider can cache them across batches and requests
+    context = f"{prompt_base.strip()}\n\nClient mapping:\n{mapping_text.strip()}{PREFIX_END}" if plan.assist_rows else ""
+    field_lines = "\n".join(f"- {r.field}: {r.rule}" for r in plan.instruction_rules)
+    assist = set(plan.assist_rows)
+    prompts = []
+    row_ids = list(plan.rows_text)
+    for start in range(0, len(row_ids), ASSIST_BATCH_ROWS):
+        batch = row_ids[start:start + ASSIST_BATCH_ROWS]
+        lines = "\n".join(
+            json.dumps({"row": i, "full_item": i in assist, "cells": plan.rows_text[i]}, ensure_ascii=False)
+            for i in batch
+        )
+        prompts.append(
+            context
+            + "You are only filling gaps for rows of a spreadsheet that have already been parsed. "
+            'Return JSON only: {"rows": [{"row": <row id>, ...fields}]}, one entry per input row, same order.\n'
+            + (f"For every row fill these fields using the client's rules:\n{field_lines}\n" if field_lines else "")
+            + (
+                'Rows with "full_item": true have no style code; if the row is a real item return ALL item fields '
+                'for it, otherwise return {"row": <row id>, "skip": true}.\n'
+                if any(i in assist for i in batch)
+                else ""
+            )
+            + "\n"
+            f"Rows (cells joined with ' | '):\n{lines}"
+        )
+    return prompts
+
+
+def finish_plan(plan: ExcelPlan, header_result: dict | None, row_results: list[dict]) -> dict:
+    """Merge LLM-filled header fields and rows into the deterministic result."""
+    header = dict(plan.header)
+    if header_result:
+        for name in ("client_name", "invoice_number", "invoice_date", "total_value"):
+            if not header.get(name) and header_result.get(name) not in (None, ""):
+                header[name] = header_result[name]
+
+    items = plan.items.copy()
+    skipped = set()
+    assist = set(plan.assist_rows)
+    unmatched = 0
+    for result in row_results:
+        for entry in result.get("rows") or []:
+            # Models sometimes echo the row number as a string
+            try:
+                row = int(entry.get("row"))
+            except (TypeError, ValueError):
+                row = None
+            if row not in items.index:
+                unmatched += 1
+                continue
+            if entry.get("skip"):
+                skipped.add(row)
+                continue
+            for name in ITEM_FIELDS:
+                if name in entry and (row in assist or any(r.field == name for r in plan.instruction_rules)):
+                    items.at[row, name] = entry[name]
+    if unmatched:
+        print(f"[FastAPI] Excel fast path: ignored {unmatched} LLM row answers with no matching row number")
+    # Assist rows the LLM never answered stay out rather than becoming empty items
+    unanswered = {r for r in assist if r not in skipped and items.at[r, "VendorStyleCode"] in ("", None)}
+    items = items.drop(index=list(skipped | unanswered))
+    if plan.header.get("invoice_number") == "" and header.get("invoice_number"):
+        items["ItemPoNo"] = items["ItemPoNo"].where(items["ItemPoNo"] != "", header["invoice_number"])
+
+    records = items.astype(object).where(items.notna(), None).to_dict("records")
+    return {
+        "total_value": header.get("total_value"),
+        "client_name": header.get("client_name") or "",
+        "invoice_number": header.get("invoice_number") or "",
+        "invoice_date": header.get("invoice_date") or "",
+        "total_entries": len(records),
+        "items": records,
+    }
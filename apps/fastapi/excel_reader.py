@@ -0,0 +1,160 @@
+"""Streaming Excel reading: one row at a time, one sheet at a time.
+
+iter_sheets() yields (sheet name, rows) for every worksheet, where rows is an iterator of tuples of
+cell values with trailing empty cells removed. Rows are produced as they are read:
+
+- .xlsx: openpyxl in read-only mode parses the sheet XML as it is iterated. The size the file
+  declares is ignored (it is often far larger than the data, e.g. after a column was formatted),
+  so only rows and cells that exist in the file are visited.
+- .xls: not streamed. xlrd opens the workbook on demand and parses one sheet at a time, but each
+  sheet in full, and unloads it before the next one. The file itself is not copied: xlrd reads
+  the mmap behind a large upload (documents.open_stream) or a BytesIO's bytes in place.
+
+A sheet ends at its last non-empty row, or after EXCEL_MAX_EMPTY_ROWS empty rows in a row
+(formatted but blank regions below the data), whichever comes first. Empty rows in between are
+yielded as ().
+
+Callers build their text with a writer or a single join, so for .xlsx the only copy of a workbook
+held in memory is the text that goes into the prompt.
+"""
+import csv
+import io
+import os
+
+EXCEL_MAX_EMPTY_ROWS = int(os.getenv("EXCEL_MAX_EMPTY_ROWS", "1000"))
+
+_XLS_SIGNATURE = b"\xd0\xcf\x11\xe0"
+
+
+def _trim(row) -> tuple:
+    end = len(row)
+    while end and (row[end - 1] is None or row[end - 1] == ""):
+        end -= 1
+    return tuple(row[:end])
+
+
+def _bounded(rows, max_empty_rows: int):
+    """Rows without trailing empty cells, ending at the last non-empty row or at a long empty run."""
+    empty = 0
+    for row in rows:
+        row = _trim(row)
+        if not row:
+            empty += 1
+            if empty > max_empty_rows:
+                return
+            continue
+        # Blank rows between data rows are kept (as empty tuples) so row positions are preserved
+        for _ in range(empty):
+            yield ()
+        empty = 0
+        yield row
+
+
+def _is_xls(source) -> bool:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read(4) == _XLS_SIGNATURE
+    position = source.tell()
+    signature = source.read(4)
+    source.seek(position)
+    return signature == _XLS_SIGNATURE
+
+
+def _xlsx_sheets(source):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        for worksheet in workbook.worksheets:
+            if hasattr(worksheet, "reset_dimensions"):
+                worksheet.reset_dimensions()
+            yield worksheet.title, worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _xls_value(cell, datemode: int):
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+            return cell.value
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    # .xls stores every number as a float; whole numbers come back as int, as openpyxl returns them
+    if cell.ctype == xlrd.XL_CELL_NUMBER and cell.value.is_integer():
+        return int(cell.value)
+    return cell.value
+
+
+def _xls_rows(sheet, datemode: int):
+    for i in range(sheet.nrows):
+        yield [_xls_value(cell, datemode) for cell in sheet.row(i)]
+
+
+class _Slices:
+    """A buffer as xlrd uses file contents: len() and slices (returned as bytes).
+
+    It has no close(), which Book.release_resources() would otherwise call on a buffer the caller
+    still owns (the upload's mmap).
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __getitem__(self, key) -> bytes:
+        return bytes(self._buffer[key])
+
+
+def _xls_contents(source):
+    """The whole .xls file for xlrd, without a copy where the stream can hand over its buffer."""
+    buffer = getattr(getattr(source, "raw", None), "buffer", None)
+    if buffer is not None:
+        return _Slices(buffer)
+    if isinstance(source, io.BytesIO):
+        # Shares the bytes the BytesIO was created from
+        return source.getvalue()
+    return source.read()
+
+
+def _xls_sheets(source):
+    import xlrd
+
+    if isinstance(source, str):
+        book = xlrd.open_workbook(source, on_demand=True)
+    else:
+        book = xlrd.open_workbook(file_contents=_xls_contents(source), on_demand=True)
+    try:
+        for name in book.sheet_names():
+            sheet = book.sheet_by_name(name)
+            yield name, _xls_rows(sheet, book.datemode)
+            book.unload_sheet(name)
+    finally:
+        book.release_resources()
+
+
+def iter_sheets(source, max_empty_rows: int = EXCEL_MAX_EMPTY_ROWS):
+    """(sheet name, row iterator) per worksheet of an Excel file (path or seekable binary stream).
+
+    Each sheet's rows must be consumed before moving to the next sheet.
+    """
+    sheets = _xls_sheets(source) if _is_xls(source) else _xlsx_sheets(source)
+    for name, rows in sheets:
+        yield name, _bounded(rows, max_empty_rows)
+
+
+def excel_csv_text(source) -> str:
+    """Every worksheet as "=== Sheet: name ===" followed by its non-empty rows as CSV, written in one pass."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    for name, rows in iter_sheets(source):
+        out.write(f"\n\n=== Sheet: {name} ===\n")
+        writer.writerows(["" if value is None else value for value in row] for row in rows if row)
+    return out.getvalue()
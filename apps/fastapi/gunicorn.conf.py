@@ -0,0 +1,75 @@
+"""gunicorn settings for running the API with several uvicorn worker processes.
+
+    gunicorn main:app -c gunicorn.conf.py
+
+Extraction is mostly waiting on the provider, which one async worker handles well; the CPU
+work (PDF text, Excel parsing, JSON repair) is what more workers add capacity for, so the
+default is one worker per CPU available to the process (the cgroup CPU quota counts, so a
+container limited to one CPU gets one worker), at most MAX_WORKERS (default 4; every worker holds
+its own pandas/pypdf/provider clients, roughly 150 MB). WEB_CONCURRENCY overrides it.
+
+The worker processes share their extraction slots and provider rate limits through a SQLite
+file (see concurrency.SharedExtractionLimiter), so EXTRACTION_CONCURRENCY, EXTRACTION_MAX_QUEUE
+and OPENAI_RPM / GEMINI_RPM stay limits for the whole service. The result cache defaults to
+SQLite for the same reason, and /metrics series carry a worker label.
+"""
+import math
+import os
+
+from concurrency import shared_state_path
+
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity mask, capped by a cgroup CPU quota when there is one.
+
+    Containers limited by a quota (cgroup v2 cpu.max, v1 cpu.cfs_quota_us) rather than a cpuset
+    still see every host core in their affinity mask.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    for quota_file, period_file in (
+        ("/sys/fs/cgroup/cpu.max", None),
+        ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "/sys/fs/cgroup/cpu/cpu.cfs_period_us"),
+    ):
+        try:
+            with open(quota_file) as f:
+                values = f.read().split()
+            if period_file is not None:
+                with open(period_file) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+        except (OSError, IndexError):
+            continue
+        if quota not in ("max", "-1") and int(period) > 0:
+            return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+        break
+    return cpus
+
+
+cpus = available_cpus()
+workers = int(os.getenv("WEB_CONCURRENCY") or min(cpus, int(os.getenv("MAX_WORKERS", "4"))))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# A worker whose event loop has not checked in for this long is restarted (requests may run longer)
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 10
+keepalive = 75
+loglevel = "info"
+
+# Read by the workers when they import main
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# Each worker would otherwise start a PDF process pool sized for the whole machine
+os.environ.setdefault("PDF_TEXT_WORKERS", str(cpus // workers if cpus // workers > 1 else 0))
+
+
+def on_starting(server):
+    """Start from an empty shared state file; rows left by a previous run are stale."""
+    path = shared_state_path()
+    if path:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+        server.log.info(f"Sharing extraction limits between {workers} workers through {path}")
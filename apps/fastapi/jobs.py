@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """Raised when the number of unfinished jobs is already at JOBS_MAX_PENDING."""
+
+    def __init__(self, pending: int):
+        super().__init__(f"Job queue full ({pending} pending)")
+        self.pending = pending
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures a retry cannot fix (bad upload, unreadable file)."""
+
+
+class JobStore:
+    """SQLite-backed persistent job queue.
+
+    Uploads are stored with the job so a queued or running job survives a restart. Workers claim a
+    job by taking a lease; the lease is renewed while the job runs, and a job whose lease expires
+    (the worker crashed) goes back to the queue. A worker shutting down hands its job back
+    with release(). The file blob is dropped once
+    a job finishes; finished jobs are purged after retention_seconds.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60, retention_seconds: float = 7 * 86400):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT NOT NULL, file BLOB,"
+            " params TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,"
+            " run_after REAL NOT NULL, lease_until REAL, result TEXT, error TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extraction_jobs_status ON extraction_jobs(status, run_after)")
+
+    def enqueue(
+        self, filename: str, file_bytes: bytes, params: dict, max_attempts: int = 3, max_pending: int | None = None
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            # Count and insert in one write transaction so workers enqueueing at once cannot overshoot max_pending
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_pending is not None:
+                    pending = self._pending()
+                    if pending >= max_pending:
+                        raise JobQueueFullError(pending)
+                self._conn.execute(
+                    "INSERT INTO extraction_jobs (id, status, filename, file, params, max_attempts, run_after, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, filename, file_bytes, json.dumps(params), max(1, max_attempts), now, now),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return job_id
+
+    def claim(self) -> dict | None:
+        """Take the oldest runnable job (queued and due, or running with an expired lease).
+
+        An expired lease counts as a failed attempt: a job that has used all its attempts (e.g. it
+        crashes the worker every time) is marked failed instead of being claimed again.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE extraction_jobs SET status = ?, error = ?, file = NULL, lease_until = NULL, finished = ?"
+                    " WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                    (FAILED, "Worker stopped during the last attempt (lease expired)", now, RUNNING, now),
+                )
+                row = self._conn.execute(
+                    "SELECT id FROM extraction_jobs"
+                    " WHERE (status = ? AND run_after <= ?)"
+                    " OR (status = ? AND lease_until < ? AND attempts < max_attempts)"
+                    " ORDER BY created LIMIT 1",
+                    (QUEUED, now, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE extraction_jobs SET status = ?, attempts = attempts + 1, lease_until = ?,"
+                    " started = COALESCE(started, ?) WHERE id = ?",
+                    (RUNNING, now + self.lease_seconds, now, row[0]),
+                )
+                job = self._conn.execute(
+                    "SELECT id, filename, file, params, attempts, max_attempts FROM extraction_jobs WHERE id = ?",
+                    (row[0],),
+                ).fetchone()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        job_id, filename, file_bytes, params, attempts, max_attempts = job
+        return {
+            "id": job_id,
+            "filename": filename,
+            "file": file_bytes,
+            "params": json.loads(params),
+            "attempts": attempts,
+            "max_attempts": max_attempts,
+        }
+
+    def renew(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, RUNNING),
+            )
+
+    def release(self, job_id: str) -> None:
+        """Put a running job back on the queue without counting its attempt (the worker is shutting down)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_until = NULL,"
+                " run_after = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, RUNNING),
+            )
+
+    def succeed(self, job_id: str, result: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE extraction_jobs SET status = ?, result = ?, error = NULL, file = NULL,"
+                " lease_until = NULL, finished = ? WHERE id = ?",
+                (SUCCEEDED, json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str, retry_in: float | None = None) -> None:
+        """Record a failed attempt: back to the queue after retry_in seconds, or failed for good."""
+        now = time.time()
+        with self._lock:
+            if retry_in is not None:
+                self._conn.execute(
+                    "UPDATE extraction_jobs SET status = ?, error = ?, run_after = ?, lease_until = NULL"
+                    " WHERE id = ? AND attempts < max_attempts",
+                    (QUEUED, error, now + retry_in, job_id),
+                )
+            self._conn.execute(
+                "UPDATE extraction_jobs SET status = ?, error = ?, file = NULL, lease_until = NULL, finished = ?"
+                " WHERE id = ? AND status = ?",
+                (FAILED, error, now, job_id, RUNNING),
+            )
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, filename, attempts, max_attempts, result, error, created, started, finished"
+                " FROM extraction_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, status, filename, attempts, max_attempts, result, error, created, started, finished = row
+        job = {
+            "job_id": job_id,
+            "status": status,
+            "filename": filename,
+            "attempts": attempts,
+            "max_attempts": max_attempts,
+            "created_at": created,
+            "started_at": started,
+            "finished_at": finished,
+        }
+        if error is not None:
+            job["error"] = error
+        if result is not None:
+            job["result"] = json.loads(result)
+        return job
+
+    def _pending(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM extraction_jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchone()[0]
+
+    def purge(self) -> int:
+        """Delete finished jobs older than the retention window."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM extraction_jobs WHERE status IN (?, ?) AND finished < ?",
+                (SUCCEEDED, FAILED, time.time() - self.retention_seconds),
+            )
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM extraction_jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+class JobWorkerPool:
+    """Runs `workers` asyncio tasks that claim jobs from a JobStore and pass them to handler(job).
+
+    handler returns the result dict. PermanentJobError fails the job immediately; any other
+    exception puts it back on the queue with exponential backoff until max_attempts is reached.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler,
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        retry_backoff: float = 10.0,
+    ):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.busy = 0
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except Exception as e:
+                print(f"[Jobs] Worker {n}: failed to claim job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.busy += 1
+            try:
+                await self._run(n, job)
+            finally:
+                self.busy -= 1
+
+    async def _run(self, n: int, job: dict) -> None:
+        job_id = job["id"]
+        print(f"[Jobs] Worker {n}: {job_id} ({job['filename']}) attempt {job['attempts']}/{job['max_attempts']}")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self.handler(job)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back with its attempt returned, so a deploy does not use up attempts
+            try:
+                await asyncio.shield(asyncio.to_thread(self.store.release, job_id))
+            except asyncio.CancelledError:
+                pass
+            print(f"[Jobs] {job_id} released for another worker (shutting down)")
+            raise
+        except PermanentJobError as e:
+            print(f"[Jobs] {job_id} failed: {e}")
+            await asyncio.to_thread(self.store.fail, job_id, str(e))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            retry_in = self.retry_backoff * 2 ** (job["attempts"] - 1)
+            if job["attempts"] < job["max_attempts"]:
+                print(f"[Jobs] {job_id} attempt {job['attempts']} failed, retrying in {retry_in:.0f}s: {error}")
+            else:
+                print(f"[Jobs] {job_id} failed after {job['attempts']} attempts: {error}")
+            await asyncio.to_thread(self.store.fail, job_id, error, retry_in)
+        else:
+            await asyncio.to_thread(self.store.succeed, job_id, result)
+            print(f"[Jobs] {job_id} succeeded")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            await asyncio.to_thread(self.store.renew, job_id)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "busy": self.busy, **self.store.stats()}
+
+
+def job_store_from_env() -> JobStore:
+    return JobStore(
+        os.getenv("JOBS_DB_PATH", "extraction_jobs.sqlite3"),
+        lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", "60")),
+        retention_seconds=float(os.getenv("JOBS_RETENTION_SECONDS", str(7 * 86400))),
+    )
@@ -0,0 +1,338 @@
+"""Single-pass tolerant JSON parsing for model output.
+
+loads_tolerant() first tries json.loads on the raw text (and a direct decode from the first
+bracket when the text only has fences or prose around it). If that fails it makes one linear scan
+that tokenises the text and repairs it on the fly, then hands the rebuilt text back to json.loads.
+Repairs applied (reported by name):
+
+- fences_or_prose: text before the first '{' / '[' (markdown fences, explanations) or after the
+  top-level value closes
+- control_chars: raw newlines/tabs inside strings escaped, other control characters dropped
+- unterminated_strings: a string that runs into a line break followed by a key or closing bracket
+- invalid_escapes: backslashes that do not start a valid JSON escape
+- single_quotes: 'strings' and 'keys'
+- unquoted_keys / unquoted_values: bare words used as keys or string values
+- python_literals: True / False / None
+- missing_colons, missing_commas, extra_commas (trailing or doubled), missing_values
+- mismatched_brackets, truncated (open strings/containers closed at end of text)
+- skipped_chars: stray characters that cannot start a token
+"""
+import json
+import re
+
+_WS = re.compile(r"[ \t\r\n]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.])")
+_LOOSE_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_BARE_KEY = re.compile(r"[\w$][\w$\-. ]*?(?=[ \t]*:)|[\w$][\w$\-.]*")
+_UNQUOTED_VALUE = re.compile(r'[^,}\]\n"]+')
+_DOUBLE_CHUNK = re.compile(r'[^"\\\x00-\x1f]*')
+_SINGLE_CHUNK = re.compile(r"[^'\\\x00-\x1f]*")
+_FENCE_ONLY = re.compile(r"\s*(?:```[A-Za-z]*\s*)?")
+_HEX4 = re.compile(r"[0-9a-fA-F]{4}")
+# After a raw line break inside a string: does the text continue like JSON structure?
+_STRUCTURE_AFTER_BREAK = re.compile(r'[ \t\r\n]*(?:"[^"\n]*"[ \t]*:|[}\]])')
+
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_ESCAPES = set('"\\/bfnrtu')
+
+# Parser states
+_KEY, _COLON, _VALUE, _AFTER = range(4)
+
+
+_DECODER = json.JSONDecoder()
+
+
+class JSONRepairError(ValueError):
+    pass
+
+
+def _value_start(text: str) -> int:
+    """Index of the top-level value: the first '{', or a leading '[' (bare array, possibly fenced)."""
+    start = text.find("{")
+    array_start = text.find("[")
+    if array_start != -1 and (start == -1 or array_start < start) and _FENCE_ONLY.fullmatch(text[:array_start]):
+        start = array_start
+    return start
+
+
+def loads_tolerant(text: str):
+    """Parse model output as JSON, repairing it if needed. Returns (value, repairs applied)."""
+    try:
+        return json.loads(text), []
+    except (json.JSONDecodeError, TypeError):
+        pass
+    start = _value_start(text)
+    if start == -1:
+        raise JSONRepairError("No JSON object or array found in model output")
+    if start > 0 or text.rstrip()[-1:] not in ("}", "]"):
+        # Only surrounding fences/prose? Decode in place at C speed before falling back to the scan.
+        try:
+            return _DECODER.raw_decode(text, start)[0], ["fences_or_prose"]
+        except json.JSONDecodeError:
+            pass
+    repaired, repairs = repair_json(text)
+    try:
+        return json.loads(repaired), repairs
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"{e} (after repairs: {', '.join(repairs) or 'none'})") from e
+
+
+def repair_json(text: str) -> tuple[str, list[str]]:
+    """Rebuild text as valid JSON in a single pass. Returns (json_text, repairs applied in order)."""
+    repairs: dict[str, None] = {}
+    start = _value_start(text)
+    if start == -1:
+        raise JSONRepairError("No JSON object or array found in model output")
+    if text[:start].strip():
+        repairs["fences_or_prose"] = None
+
+    n = len(text)
+    out: list[str] = []
+    stack: list[list] = []  # [bracket, state, position in out of the current key]
+    i = start
+
+    def close_string(content: list[str]) -> None:
+        out.append('"')
+        out.extend(content)
+        out.append('"')
+
+    def read_string(pos: int, quote: str) -> int:
+        """Read a string starting at pos (on the opening quote); emits it as a JSON string."""
+        chunk_re = _DOUBLE_CHUNK if quote == '"' else _SINGLE_CHUNK
+        content: list[str] = []
+        j = pos + 1
+        while True:
+            m = chunk_re.match(text, j)
+            piece = m.group()
+            if quote == "'" and '"' in piece:
+                piece = piece.replace('"', '\\"')
+            content.append(piece)
+            j = m.end()
+            if j >= n:
+                repairs["truncated"] = None
+                close_string(content)
+                return j
+            c = text[j]
+            if c == quote:
+                close_string(content)
+                return j + 1
+            if c == "\\":
+                nxt = text[j + 1] if j + 1 < n else ""
+                if nxt == "u" and _HEX4.match(text, j + 2):
+                    content.append(text[j : j + 6])
+                    j += 6
+                elif nxt in _ESCAPES and nxt not in ("u", ""):
+                    content.append(text[j : j + 2])
+                    j += 2
+                elif quote == "'" and nxt == "'":
+                    content.append("'")
+                    j += 2
+                else:
+                    repairs["invalid_escapes"] = None
+                    content.append("\\\\")
+                    j += 1
+                continue
+            if c == '"':  # only reachable for single-quoted strings
+                content.append('\\"')
+                j += 1
+                continue
+            # Control character inside a string
+            if c in "\r\n" and _STRUCTURE_AFTER_BREAK.match(text, j):
+                repairs["unterminated_strings"] = None
+                close_string(content)
+                return j
+            repairs["control_chars"] = None
+            if c == "\n":
+                content.append("\\n")
+            elif c == "\t":
+                content.append("\\t")
+            elif c == "\r":
+                content.append("\\r")
+            j += 1
+
+    def set_state(state: int) -> None:
+        if stack:
+            stack[-1][1] = state
+
+    def after_value() -> None:
+        set_state(_AFTER)
+
+    done = False
+    while i < n and not done:
+        i = _WS.match(text, i).end()
+        if i >= n:
+            break
+        ch = text[i]
+        state = stack[-1][1] if stack else _VALUE
+        in_object = bool(stack) and stack[-1][0] == "{"
+
+        if state == _AFTER:
+            if ch == ",":
+                j = i + 1
+                while True:
+                    j = _WS.match(text, j).end()
+                    if j < n and text[j] == ",":
+                        repairs["extra_commas"] = None
+                        j += 1
+                        continue
+                    break
+                if j < n and text[j] in "}]":
+                    repairs["extra_commas"] = None
+                else:
+                    out.append(",")
+                    set_state(_KEY if in_object else _VALUE)
+                i = j
+                continue
+            if ch in "}]":
+                if ch != ("}" if in_object else "]"):
+                    repairs["mismatched_brackets"] = None
+                out.append("}" if in_object else "]")
+                stack.pop()
+                after_value()
+                done = not stack
+                i += 1
+                continue
+            if ch == ":" and in_object:
+                repairs["skipped_chars"] = None
+                i += 1
+                continue
+            if ch in "\"'{[-0123456789" or ch.isalpha() or ch == "_":
+                repairs["missing_commas"] = None
+                out.append(",")
+                set_state(_KEY if in_object else _VALUE)
+                continue
+            repairs["skipped_chars"] = None
+            i += 1
+            continue
+
+        if state == _KEY:
+            if ch == "}":
+                out.append("}")
+                stack.pop()
+                after_value()
+                done = not stack
+                i += 1
+            elif ch == "]":
+                repairs["mismatched_brackets"] = None
+                out.append("}")
+                stack.pop()
+                after_value()
+                done = not stack
+                i += 1
+            elif ch in "\"'":
+                if ch == "'":
+                    repairs["single_quotes"] = None
+                stack[-1][2] = len(out)
+                i = read_string(i, ch)
+                set_state(_COLON)
+            elif ch == ",":
+                repairs["extra_commas"] = None
+                i += 1
+            else:
+                m = _BARE_KEY.match(text, i)
+                if m:
+                    repairs["unquoted_keys"] = None
+                    stack[-1][2] = len(out)
+                    out.append(json.dumps(m.group()))
+                    set_state(_COLON)
+                    i = m.end()
+                else:
+                    repairs["skipped_chars"] = None
+                    i += 1
+            continue
+
+        if state == _COLON:
+            if ch == ":":
+                out.append(":")
+                i += 1
+            else:
+                repairs["missing_colons"] = None
+                out.append(":")
+            set_state(_VALUE)
+            continue
+
+        # state == _VALUE
+        if ch == "{":
+            after_value()
+            stack.append(["{", _KEY, -1])
+            out.append("{")
+            i += 1
+        elif ch == "[":
+            after_value()
+            stack.append(["[", _VALUE, -1])
+            out.append("[")
+            i += 1
+        elif ch == '"':
+            i = read_string(i, '"')
+            after_value()
+        elif ch == "'":
+            repairs["single_quotes"] = None
+            i = read_string(i, "'")
+            after_value()
+        elif ch in "}]":
+            if in_object:
+                # "key": } -> fill the missing value
+                repairs["missing_values"] = None
+                out.append("null")
+                set_state(_AFTER)
+            elif stack:
+                # [ ... , ] or [] -> drop the pending comma if one was written
+                if out and out[-1] == ",":
+                    out.pop()
+                    repairs["extra_commas"] = None
+                set_state(_AFTER)
+            else:
+                repairs["skipped_chars"] = None
+                i += 1
+        elif ch == ",":
+            if in_object:
+                repairs["missing_values"] = None
+                out.append("null")
+                set_state(_AFTER)
+            else:
+                repairs["extra_commas"] = None
+                i += 1
+        else:
+            m = _NUMBER.match(text, i)
+            if m:
+                out.append(m.group())
+                i = m.end()
+                after_value()
+                continue
+            m = _UNQUOTED_VALUE.match(text, i)
+            word = m.group().rstrip()
+            literal = _LITERALS.get(word)
+            if literal is not None:
+                if literal != word:
+                    repairs["python_literals"] = None
+                out.append(literal)
+            elif _LOOSE_NUMBER.fullmatch(word):
+                # +5 / .5 / 05 style numbers -> keep the numeric value
+                repairs["unquoted_values"] = None
+                out.append(repr(float(word)) if any(c in word for c in ".eE") else str(int(word)))
+            else:
+                repairs["unquoted_values"] = None
+                out.append(json.dumps(word))
+            i += len(word)
+            after_value()
+
+    if i < n and text[i:].strip():
+        repairs["fences_or_prose"] = None
+
+    if stack:
+        # Output stopped early: drop a dangling key or comma, then close every open container
+        repairs["truncated"] = None
+        state = stack[-1][1]
+        if stack[-1][0] == "{" and state == _COLON:
+            # "key" without a value
+            del out[stack[-1][2]:]
+            if out and out[-1] == ",":
+                out.pop()
+        elif state == _VALUE and stack[-1][0] == "{":
+            out.append("null")
+        elif out and out[-1] == ",":
+            out.pop()
+        for bracket, _, _ in reversed(stack):
+            out.append("}" if bracket == "{" else "]")
+
+    return "".join(out), list(repairs)
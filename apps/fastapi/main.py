@@ -1,12 +1,45 @@
 import os
 import json
-import re
-import tempfile
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+import asyncio
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-import pandas as pd
+
+from concurrency import QueueFullError, limiter_from_env, rate_limiter_from_env
+from result_cache import cache_from_env, cache_key
+from pdf_chunks import chunk_instructions, header_context, merge_chunk_results, plan_page_windows, window_pages
+from json_repair import JSONRepairError, loads_tolerant
+from stream_parser import IncrementalItemParser
+from jobs import JobQueueFullError, JobWorkerPool, PermanentJobError, job_store_from_env
+from compaction import compact_excel_text, compact_pdf_pages, count_tokens
+from pdf_text import pdf_extractor_from_env
+from postprocess import normalize_items, normalize_result
+from documents import MIME_TYPES, UploadedDocument, open_stream, pdf_pages, read_upload, release
+from provider_batch import ProviderBatchStore, batch_request_line, parse_batch_output
+from provider_router import ProviderCalls, ProviderRouter
+from prompt_cache import PREFIX_END, GeminiPrefixCache, chat_messages, split_prompt
+from metrics import (
+    ServerTimingMiddleware,
+    add_collector,
+    extraction_results,
+    item_count_mismatches,
+    json_parses,
+    live_lines,
+    prompt_chars,
+    prompt_tokens_estimate,
+    provider_calls,
+    provider_first_token_seconds,
+    provider_tokens,
+    render as render_metrics,
+    response_chars,
+    span,
+    unresolved_fields,
+)
 
 load_dotenv()
 
@@ -14,21 +47,207 @@ load_dotenv()
 EXTRACTION_PROVIDER = os.getenv("EXTRACTION_PROVIDER", "openai").strip().lower()
 if EXTRACTION_PROVIDER not in ("openai", "gemini"):
     EXTRACTION_PROVIDER = "openai"
+OPENAI_MODEL = "gpt-4o-mini"
+GEMINI_MODEL = "gemini-2.5-flash"
+EXTRACTION_MODEL = OPENAI_MODEL if EXTRACTION_PROVIDER == "openai" else GEMINI_MODEL
+
+PROVIDER_MODELS = {"openai": OPENAI_MODEL, "gemini": GEMINI_MODEL}
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+PROVIDER_KEYS = {"openai": OPENAI_API_KEY, "gemini": GOOGLE_API_KEY}
+if not PROVIDER_KEYS[EXTRACTION_PROVIDER]:
+    # Start anyway so /health answers; extractions fail with 503 until a key is configured
+    key_name = "OPENAI_API_KEY" if EXTRACTION_PROVIDER == "openai" else "GOOGLE_API_KEY"
+    print(f"[FastAPI] Warning: EXTRACTION_PROVIDER={EXTRACTION_PROVIDER} requires {key_name} in .env")
+
+# One long-lived client per provider with a key (connection pools are reused across requests), created
+# on first use or by the startup warm-up rather than at import: the SDKs, google.generativeai in
+# particular, are slow to import. Retries are left to the provider router, so the OpenAI SDK's are off.
+openai_client = None
+gemini_model = None
+genai = None
+
+
+def _openai_client():
+    """The OpenAI client; the first call imports the SDK, so async code should go through _openai()."""
+    global openai_client
+    if openai_client is None:
+        from openai import AsyncOpenAI
+        openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+    return openai_client
+
+
+def _genai():
+    """The configured google.generativeai module."""
+    global genai, gemini_model
+    if genai is None:
+        import google.generativeai as sdk
+        sdk.configure(api_key=GOOGLE_API_KEY)
+        gemini_model = sdk.GenerativeModel(GEMINI_MODEL)
+        genai = sdk
+    return genai
+
+
+def _gemini_model():
+    _genai()
+    return gemini_model
+
+
+async def _openai():
+    return openai_client or await asyncio.to_thread(_openai_client)
+
+
+async def _gemini():
+    return gemini_model or await asyncio.to_thread(_gemini_model)
+
+
+# Bounded concurrency for extractions: EXTRACTION_CONCURRENCY run at once, EXTRACTION_MAX_QUEUE wait (at most
+# EXTRACTION_MAX_WAIT seconds), anything beyond is rejected with 429 + Retry-After so /health stays responsive
+# under load. With several worker processes (WEB_CONCURRENCY > 1) the counts are shared through SHARED_STATE_PATH.
+extraction_limiter = limiter_from_env()
+
+# Per-provider call rate limits (OPENAI_RPM / GEMINI_RPM), applied to every provider call (shared like the above)
+provider_rate_limiter = rate_limiter_from_env()
+
+# Provider router: retries 429/5xx/connection errors EXTRACTION_RETRIES times with exponential backoff
+# (EXTRACTION_RETRY_BACKOFF seconds, doubling), then fails over to the other configured provider
+# (EXTRACTION_FALLBACK=0 disables). With EXTRACTION_HEDGE on, a call still running after the primary's
+# rolling p95 latency is raced against the other provider. A request's provider field pins one provider.
+EXTRACTION_FALLBACK = os.getenv("EXTRACTION_FALLBACK", "1").strip().lower() not in ("0", "false", "off")
+EXTRACTION_HEDGE = os.getenv("EXTRACTION_HEDGE", "1").strip().lower() not in ("0", "false", "off")
+EXTRACTION_RETRIES = int(os.getenv("EXTRACTION_RETRIES", "2"))
+EXTRACTION_RETRY_BACKOFF = float(os.getenv("EXTRACTION_RETRY_BACKOFF", "1.0"))
+_provider_calls = {
+    "openai": ProviderCalls(
+        complete=lambda prompt, attachment: _openai_complete(prompt, attachment),
+        stream=lambda prompt, attachment: _openai_stream(prompt, attachment),
+        model=OPENAI_MODEL,
+    ),
+    "gemini": ProviderCalls(
+        complete=lambda prompt, attachment: _run_extraction_gemini(prompt, attachment and attachment.file),
+        stream=lambda prompt, attachment: _stream_extraction_gemini(prompt, attachment and attachment.file),
+        model=GEMINI_MODEL,
+    ),
+}
+provider_router = ProviderRouter(
+    {name: calls for name, calls in _provider_calls.items() if PROVIDER_KEYS[name]},
+    rate_limiter=provider_rate_limiter,
+    retries=EXTRACTION_RETRIES,
+    retry_backoff=EXTRACTION_RETRY_BACKOFF,
+    hedge=EXTRACTION_HEDGE,
+)
+
+# Prompt prefix caching: prompts start with the rules and the client's mapping (up to PREFIX_END), which
+# OpenAI gets as the system message (cached by OpenAI once 1024+ tokens) and Gemini as explicit cached
+# content kept GEMINI_CACHE_TTL seconds (at most GEMINI_CACHE_MAX_ENTRIES prefixes). GEMINI_PREFIX_CACHE=0
+# sends the whole prompt inline.
+GEMINI_PREFIX_CACHE = os.getenv("GEMINI_PREFIX_CACHE", "1").strip().lower() not in ("0", "false", "off")
+gemini_prefix_cache = (
+    GeminiPrefixCache(
+        _genai,
+        GEMINI_MODEL,
+        ttl=float(os.getenv("GEMINI_CACHE_TTL", "3600")),
+        max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "32")),
+        min_tokens=int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "1024")),
+    )
+    if GOOGLE_API_KEY and GEMINI_PREFIX_CACHE
+    else None
+)
+
+# Extraction result cache keyed on file hash + prompt + provider/model (EXTRACTION_CACHE=memory|sqlite|off)
+result_cache = cache_from_env()
+# Providers that answered the calls of the current extraction. The cache key names the primary, so a
+# result is only stored when no call failed over or was won by a hedge on another provider.
+_answered_by: ContextVar[set | None] = ContextVar("answered_by", default=None)
+
+# PDF page text: PDF_TEXT_MODE=plain|layout, per-page cache (PDF_PAGE_CACHE_ENTRIES) and, for PDFs with
+# at least PDF_PARALLEL_MIN_PAGES uncached pages, a pool of PDF_TEXT_WORKERS processes
+pdf_extractor = pdf_extractor_from_env()
+
+# Chunked PDF extraction: PDFs with at least PDF_CHUNK_MIN_PAGES pages (or chunked=true) are split into
+# PDF_CHUNK_PAGES-page windows and up to PDF_CHUNK_FANOUT windows are extracted concurrently.
+PDF_CHUNK_PAGES = int(os.getenv("PDF_CHUNK_PAGES", "5"))
+PDF_CHUNK_FANOUT = max(1, int(os.getenv("PDF_CHUNK_FANOUT", "4")))
+PDF_CHUNK_MIN_PAGES = int(os.getenv("PDF_CHUNK_MIN_PAGES", "20"))
+PDF_CHUNK_HEADER_LINES = int(os.getenv("PDF_CHUNK_HEADER_LINES", "15"))
+
+# Excel fast path: when a client mapping is supplied, map columns and normalise enums with pandas and
+# only call the LLM for header fields or rows/fields the rules cannot resolve. EXCEL_FASTPATH=0 disables.
+EXCEL_FASTPATH = os.getenv("EXCEL_FASTPATH", "1").strip().lower() not in ("0", "false", "off")
+# Row prompts for mapping instructions the rules cannot resolve: at most EXCEL_ASSIST_FANOUT calls at once per request
+EXCEL_ASSIST_FANOUT = max(1, int(os.getenv("EXCEL_ASSIST_FANOUT", "4")))
+
+# Prompt compaction: drop empty rows/columns and layout whitespace and send repeated header blocks once
+# before a document goes into the prompt. PROMPT_TABLE_FORMAT=auto|csv|tsv for Excel sheets; PROMPT_COMPACTION=0 disables.
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1").strip().lower() not in ("0", "false", "off")
+PROMPT_TABLE_FORMAT = os.getenv("PROMPT_TABLE_FORMAT", "auto").strip().lower()
+
+# Batch extraction: up to BATCH_MAX_FILES files per request. Files share the extraction limiter with
+# single uploads; at most BATCH_FANOUT of a batch's files wait on it at once so one batch cannot fill the queue.
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+BATCH_FANOUT = max(1, int(os.getenv("BATCH_FANOUT", "0")) or extraction_limiter.max_concurrency)
+BATCH_OPTION_FIELDS = ("client_name", "mapping_text", "expected_items", "chunked", "pages_per_chunk", "provider")
+_provider_batch_store = None
+
+# Job API: POST /jobs stores the upload in a SQLite queue (JOBS_DB_PATH) and returns at once; JOBS_WORKERS
+# extraction workers drain it with up to JOBS_MAX_ATTEMPTS attempts per job. JOBS_WORKERS=0 disables.
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "500"))
+JOBS_RETRY_BACKOFF = float(os.getenv("JOBS_RETRY_BACKOFF", "10"))
+job_store = job_store_from_env() if JOBS_WORKERS > 0 else None
+job_pool = None
+
+# Startup warm-up: pandas/openpyxl/xlrd, pypdf and the provider SDKs are imported on first use. Once the
+# app has started, a background thread imports them (and creates the provider clients) so the first
+# extraction does not pay for it either. WARM_IMPORTS=0 leaves everything to first use.
+WARM_IMPORTS = os.getenv("WARM_IMPORTS", "1").strip().lower() not in ("0", "false", "off")
+
+
+def _warm_up() -> None:
+    start = time.perf_counter()
+    try:
+        import pandas  # noqa: F401
+        import openpyxl  # noqa: F401
+        import pypdf  # noqa: F401
+        import excel_fastpath  # noqa: F401
+        count_tokens("warm-up", EXTRACTION_MODEL)
+        if OPENAI_API_KEY:
+            _openai_client()
+        if GOOGLE_API_KEY:
+            _genai()
+    except Exception as e:
+        print(f"[FastAPI] Warning: warm-up failed, loading on first use instead: {type(e).__name__}: {e}")
+        return
+    print(f"[FastAPI] Warm-up done in {time.perf_counter() - start:.2f}s")
 
-if EXTRACTION_PROVIDER == "gemini":
-    import google.generativeai as genai
-    API_KEY = os.getenv("GOOGLE_API_KEY")
-    if not API_KEY:
-        raise RuntimeError("EXTRACTION_PROVIDER=gemini requires GOOGLE_API_KEY in .env")
-    genai.configure(api_key=API_KEY)
-else:
-    from openai import OpenAI
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    if not OPENAI_API_KEY:
-        raise RuntimeError("EXTRACTION_PROVIDER=openai requires OPENAI_API_KEY in .env")
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-app = FastAPI(title="Invoice Extraction API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_pool
+    if job_store is not None:
+        purged = await asyncio.to_thread(job_store.purge)
+        if purged:
+            print(f"[Jobs] Purged {purged} finished jobs past retention")
+        job_pool = JobWorkerPool(
+            job_store, _run_job, workers=JOBS_WORKERS, retry_backoff=JOBS_RETRY_BACKOFF
+        )
+        job_pool.start()
+        print(f"[Jobs] {JOBS_WORKERS} workers started ({job_store.stats()})")
+    # Held until shutdown so the task is not garbage collected while it runs
+    warm_up = asyncio.create_task(asyncio.to_thread(_warm_up)) if WARM_IMPORTS else None
+    try:
+        yield
+    finally:
+        if job_pool is not None:
+            await job_pool.stop()
+        pdf_extractor.close()
+        if gemini_prefix_cache is not None:
+            await asyncio.to_thread(gemini_prefix_cache.close)
+
+
+app = FastAPI(title="Invoice Extraction API", version="1.0", lifespan=lifespan)
 
 # CORS configuration - allow specific origins or all in development
 cors_origins = os.getenv("CORS_ORIGIN", "*")
@@ -45,6 +264,29 @@ app.add_middleware(
     allow_credentials=True,
 )
 
+# Per-stage timings for /metrics and the optional Server-Timing header (SERVER_TIMING=1 or X-Server-Timing: 1)
+app.add_middleware(ServerTimingMiddleware)
+
+# ITEM_NORMALIZATION (default on): items are validated and their enum fields normalised after parsing
+# (postprocess.py), so the prompt only asks for the enum text as written; 0 restores the full rules.
+ITEM_NORMALIZATION = os.getenv("ITEM_NORMALIZATION", "1").strip().lower() not in ("0", "false", "off")
+
+ENUM_RULES_FULL = """
+Enum field constraints (CRITICAL - these enum values MUST be extracted primarily from Description field and matched to exact options):
+- Category: MUST extract from Description field or dedicated Category column if present. Look for jewelry type keywords. Must be one of: "Ring", "Band", "Pendant", "Necklace", "Bracelet", "Earring", "Bangle". Match extracted values case-insensitively to these exact options (e.g., "ring" -> "Ring", "EARRING" or "EARRINGS" -> "Earring", "bangle" -> "Bangle"). If no match is found, use the extracted value as-is or "" if not present.
+- Metal: MUST extract from Description field (or Category if available). Must be one of: "G09KT", "G10KT", "G14KT", "G18KT", "PT950", "S925". Look for metal information in descriptions (e.g., "9KT", "10KT", "14K", "18K", "Platinum", "PT950", "Silver", "925"). Map variations: "9KT" -> "G09KT", "10KT" -> "G10KT", "14K" -> "G14KT", "18K" -> "G18KT", "Platinum" or "PT950" or "950" -> "PT950", "Silver" or "925" or "SV925" -> "S925". If no match is found, use the extracted value as-is.
+- Tone: MUST extract from Description field (or Category if available). Must be one of: "Y", "R", "W", "YW", "RW", "RY". Look for tone/color information in descriptions. Match case-insensitively: "Yellow" or "Y" -> "Y", "Rose" or "R" -> "R", "White" or "W" -> "W", "Yellow White" or "YW" or "Y/W" -> "YW", "Rose White" or "RW" or "R/W" -> "RW", "Rose Yellow" or "RY" or "R/Y" -> "RY". If no match is found, use the extracted value as-is or "" if not present.
+- StockType: MUST extract from Description field (or Category if available). Look for keywords like "Studded", "Plain", "Gold", "Platinum", "Silver", "Semi Mount", "Mount", "Combination", "Normal" in descriptions. Must be one of: "Normal", "Studded Gold Jewellery IC", "Studded Platinum Jewellery IC", "Plain Gold Jewellery IC", "Plain Platinum Jewellery IC", "Studded Semi Mount Gold Jewellery IC", "Studded Silver Jewellery IC", "Plain Silver Jewellery IC", "Studded Semi Mount Platinum Jewellery IC", "Gold Mount Jewellery IC", "Studded Combination Jewellery IC". Match extracted values to the closest option based on keywords (e.g., "Studded" + "Gold" -> "Studded Gold Jewellery IC", "Plain" + "Platinum" -> "Plain Platinum Jewellery IC", "Normal" -> "Normal"). If no match is found, use null.
+- MakeType: MUST extract from Description field (or Category if available). Look for keywords like "CNC", "HOLLOW", "TUBING", "CAST", "MULTI", "HIP HOP", "1 PC", "2 PC" in descriptions. Must be one of: "CNC", "HOLLOW TUBING", "1 PC CAST", "2 PC CAST", "MULTI CAST", "HIP HOP". Match extracted values case-insensitively to these exact options. If no match is found, use null.
+- CRITICAL: For ALL enum fields (Metal, Tone, StockType, MakeType), the values MUST be extracted primarily from the Description field. These enum values are almost always embedded within item descriptions rather than in dedicated columns. Actively search through Description, Category, and all available text fields in each item row. Parse descriptions carefully to identify metal type, tone/color, stock type, and make type information. Match extracted values to the exact enum options provided above.
+"""
+
+ENUM_RULES_SHORT = """
+Enum fields (Category, Metal, Tone, StockType, MakeType): copy what the item row says, from a dedicated column if there is one, otherwise from the Description; they are mapped to canonical values after extraction.
+- Category: the jewellery type (e.g. "Ring", "Earrings"). Metal: metal and karat (e.g. "14K", "Platinum", "925"). Tone: the gold colour (e.g. "Yellow", "Y/W", "Rose White"). Use "" if the row does not say.
+- StockType: the stock words with the metal (e.g. "Studded Gold", "Plain Platinum", "Semi Mount"). MakeType: the make words (e.g. "CNC", "Hollow", "2 PC Cast"). Use null if the row does not say.
+"""
+
 PROMPT_BASE = """
 You are transforming a client's Purchase Order document (PDF or Excel) into my factory's canonical JSON schema.
 The PO is FROM the client TO Chandra Jewels (vendor). The buyer/client is the sender placing the order.
@@ -85,17 +327,11 @@ Mapping rules (very important):
 - If a target field is not mapped or not present, set "" for strings or null for nullable fields, never invent data.
 - Preserve numeric quantities as numbers (no commas). Treat missing numeric as 0.
 
-Enum field constraints (CRITICAL - these enum values MUST be extracted primarily from Description field and matched to exact options):
-- Category: MUST extract from Description field or dedicated Category column if present. Look for jewelry type keywords. Must be one of: "Ring", "Band", "Pendant", "Necklace", "Bracelet", "Earring", "Bangle". Match extracted values case-insensitively to these exact options (e.g., "ring" -> "Ring", "EARRING" or "EARRINGS" -> "Earring", "bangle" -> "Bangle"). If no match is found, use the extracted value as-is or "" if not present.
-- Metal: MUST extract from Description field (or Category if available). Must be one of: "G09KT", "G10KT", "G14KT", "G18KT", "PT950", "S925". Look for metal information in descriptions (e.g., "9KT", "10KT", "14K", "18K", "Platinum", "PT950", "Silver", "925"). Map variations: "9KT" -> "G09KT", "10KT" -> "G10KT", "14K" -> "G14KT", "18K" -> "G18KT", "Platinum" or "PT950" or "950" -> "PT950", "Silver" or "925" or "SV925" -> "S925". If no match is found, use the extracted value as-is.
-- Tone: MUST extract from Description field (or Category if available). Must be one of: "Y", "R", "W", "YW", "RW", "RY". Look for tone/color information in descriptions. Match case-insensitively: "Yellow" or "Y" -> "Y", "Rose" or "R" -> "R", "White" or "W" -> "W", "Yellow White" or "YW" or "Y/W" -> "YW", "Rose White" or "RW" or "R/W" -> "RW", "Rose Yellow" or "RY" or "R/Y" -> "RY". If no match is found, use the extracted value as-is or "" if not present.
-- StockType: MUST extract from Description field (or Category if available). Look for keywords like "Studded", "Plain", "Gold", "Platinum", "Silver", "Semi Mount", "Mount", "Combination", "Normal" in descriptions. Must be one of: "Normal", "Studded Gold Jewellery IC", "Studded Platinum Jewellery IC", "Plain Gold Jewellery IC", "Plain Platinum Jewellery IC", "Studded Semi Mount Gold Jewellery IC", "Studded Silver Jewellery IC", "Plain Silver Jewellery IC", "Studded Semi Mount Platinum Jewellery IC", "Gold Mount Jewellery IC", "Studded Combination Jewellery IC". Match extracted values to the closest option based on keywords (e.g., "Studded" + "Gold" -> "Studded Gold Jewellery IC", "Plain" + "Platinum" -> "Plain Platinum Jewellery IC", "Normal" -> "Normal"). If no match is found, use null.
-- MakeType: MUST extract from Description field (or Category if available). Look for keywords like "CNC", "HOLLOW", "TUBING", "CAST", "MULTI", "HIP HOP", "1 PC", "2 PC" in descriptions. Must be one of: "CNC", "HOLLOW TUBING", "1 PC CAST", "2 PC CAST", "MULTI CAST", "HIP HOP". Match extracted values case-insensitively to these exact options. If no match is found, use null.
+{enum_rules}
 
 General guidance:
 - For PDF files: Identify the buyer/client name from the PO header (not Chandra Jewels). Extract the PO/Order/Invoice number from the header as invoice_number. Extract the PO/Order date if present; else leave "". Items are presented with serial numbers; extract every serial-numbered row. The count of items MUST match the serial-numbered rows, with no missing or extra items.
 - For Excel files: Read all worksheets if multiple exist. Look for header rows that contain column names. Identify the buyer/client name from the first sheet or header rows. Extract the PO/Order/Invoice number from header cells or a dedicated row. Extract the PO/Order date if present. Extract all data rows (skip empty rows and header rows). Each row represents an item. The count of items MUST match the number of data rows, with no missing or extra items.
-- CRITICAL: For ALL enum fields (Metal, Tone, StockType, MakeType), the values MUST be extracted primarily from the Description field. These enum values are almost always embedded within item descriptions rather than in dedicated columns. Actively search through Description, Category, and all available text fields in each item row. Parse descriptions carefully to identify metal type, tone/color, stock type, and make type information. Match extracted values to the exact enum options provided above.
 - Preserve the serial order of rows in the items array.
 - Do not hallucinate or infer extra items; only output what exists.
 - Return ONLY valid JSON following the schema; do not include prose or markdown.
@@ -114,79 +350,440 @@ Output:
 - Return a single JSON object matching the schema, plus an optional "_debug_serials" array at the top level.
 - Do NOT include any markdown, explanation, or extra top-level keys other than the schema and optional "_debug_serials".
 """
+PROMPT_BASE = PROMPT_BASE.replace("{enum_rules}", (ENUM_RULES_SHORT if ITEM_NORMALIZATION else ENUM_RULES_FULL).strip())
 
-def _pdf_to_text(path: str) -> str:
-    """Extract text from PDF for OpenAI path (no file upload)."""
+def _pdf_page_texts(data) -> list[str]:
+    """Extract text per page from a PDF (bytes, mmap or path); cached per page, many pages go to the process pool."""
+    return pdf_extractor.page_texts(data)
+
+
+def _pdf_page_count(data) -> int:
     from pypdf import PdfReader
-    reader = PdfReader(path)
-    parts = []
-    for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n\n".join(parts)
+    return len(PdfReader(data if isinstance(data, str) else open_stream(data)).pages)
+
 
+def _compact_pdf_pages(page_texts: list[str]) -> list[str]:
+    return compact_pdf_pages(page_texts, columns=pdf_extractor.mode == "layout")
 
-def _run_extraction_openai(full_prompt: str) -> str:
+
+def _pdf_to_text(data) -> str:
+    """Extract text from PDF for OpenAI path (no file upload)."""
+    page_texts = _pdf_page_texts(data)
+    if PROMPT_COMPACTION:
+        page_texts = _compact_pdf_pages(page_texts)
+    return "\n\n".join(page_texts)
+
+
+def _excel_to_text(source) -> str:
+    """Convert every worksheet of an Excel file (path or binary stream) to CSV text for the prompt."""
+    if PROMPT_COMPACTION:
+        return compact_excel_text(source, PROMPT_TABLE_FORMAT)
+    from excel_reader import excel_csv_text
+    return excel_csv_text(source)
+
+
+async def _run_extraction_openai(full_prompt: str) -> str:
     """Run extraction using OpenAI gpt-4o-mini. Prompt should contain document text (PDF extracted or Excel)."""
-    resp = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": full_prompt}],
+    client = await _openai()
+    resp = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=chat_messages(full_prompt),
         temperature=0.1,
         response_format={"type": "json_object"},
     )
+    _record_openai_usage(resp.usage)
     return (resp.choices[0].message.content or "").strip()
 
 
-def _run_extraction_gemini(full_prompt: str, genai_file) -> str:
+async def _gemini_call(full_prompt: str, genai_file):
+    """(model, contents) for a Gemini call: the prompt prefix from the context cache when there is one."""
+    prefix, body = split_prompt(full_prompt)
+    model = await gemini_prefix_cache.model_for(prefix) if gemini_prefix_cache is not None else None
+    if model is None:
+        model, body = await _gemini(), full_prompt
+    return model, body if genai_file is None else [body, genai_file]
+
+
+def _gemini_cache_failed(full_prompt: str, error: Exception) -> bool:
+    """True when the call failed because its prefix cache is gone on Gemini's side (403/404).
+
+    The cache is dropped so the caller can retry once with a fresh one: the router does not retry
+    403/404, so without this every request would fail until the entry aged out here.
+    """
+    if gemini_prefix_cache is None or getattr(error, "code", None) not in (403, 404):
+        return False
+    if not gemini_prefix_cache.discard(split_prompt(full_prompt)[0]):
+        return False
+    print(f"[FastAPI] Gemini prompt cache unavailable ({type(error).__name__}), retrying with a new one")
+    return True
+
+
+async def _run_extraction_gemini(full_prompt: str, genai_file) -> str:
     """Run extraction using Gemini. genai_file is None for Excel (text-only)."""
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    if genai_file is None:
-        response = model.generate_content(
-            full_prompt,
-            generation_config={"response_mime_type": "application/json"},
+    generation_config = {"response_mime_type": "application/json"}
+    if genai_file is not None:
+        generation_config["temperature"] = 0.1
+    for attempt in range(2):
+        model, contents = await _gemini_call(full_prompt, genai_file)
+        try:
+            response = await model.generate_content_async(contents, generation_config=generation_config)
+            break
+        except Exception as e:
+            if attempt > 0 or not _gemini_cache_failed(full_prompt, e):
+                raise
+    _record_gemini_usage(response)
+    return response.text.strip()
+
+
+async def _stream_extraction_openai(full_prompt: str):
+    """Yield response text deltas from OpenAI as they are generated."""
+    client = await _openai()
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=chat_messages(full_prompt),
+        temperature=0.1,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    first = True
+    async for chunk in stream:
+        if chunk.usage:
+            _record_openai_usage(chunk.usage)
+        if chunk.choices and chunk.choices[0].delta.content:
+            if first:
+                first = False
+                _record_first_token("openai", start)
+            yield chunk.choices[0].delta.content
+
+
+async def _stream_extraction_gemini(full_prompt: str, genai_file):
+    """Yield response text deltas from Gemini as they are generated."""
+    start = time.perf_counter()
+    for attempt in range(2):
+        model, contents = await _gemini_call(full_prompt, genai_file)
+        try:
+            response = await model.generate_content_async(
+                contents,
+                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
+                stream=True,
+            )
+            break
+        except Exception as e:
+            if attempt > 0 or not _gemini_cache_failed(full_prompt, e):
+                raise
+    last_chunk = None
+    async for chunk in response:
+        if last_chunk is None:
+            _record_first_token("gemini", start)
+        last_chunk = chunk
+        if chunk.text:
+            yield chunk.text
+    if last_chunk is not None:
+        _record_gemini_usage(last_chunk)
+
+
+async def _openai_complete(prompt: str, attachment) -> str:
+    # A document uploaded to Gemini reaches OpenAI as its text prompt, extracted on first use
+    if attachment is not None:
+        prompt = await attachment.text_prompt()
+    return await _run_extraction_openai(prompt)
+
+
+async def _openai_stream(prompt: str, attachment):
+    if attachment is not None:
+        prompt = await attachment.text_prompt()
+    async for delta in _stream_extraction_openai(prompt):
+        yield delta
+
+
+def _record_first_token(provider: str, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    provider_first_token_seconds.observe(elapsed, provider)
+    print(f"[FastAPI] First token from {provider} after {elapsed:.2f}s")
+
+
+def _record_usage(
+    provider: str, prompt_tokens: int | None, completion_tokens: int | None, cached_tokens: int | None = None
+) -> None:
+    provider_tokens.inc(prompt_tokens or 0, provider, "prompt")
+    provider_tokens.inc(completion_tokens or 0, provider, "completion")
+    provider_tokens.inc(cached_tokens or 0, provider, "cached")
+    if prompt_tokens:
+        print(
+            f"[FastAPI] {provider} usage: {prompt_tokens} prompt tokens, {cached_tokens or 0} cached "
+            f"({(cached_tokens or 0) / prompt_tokens:.0%}), {completion_tokens or 0} completion"
         )
-    else:
-        response = model.generate_content(
-            [full_prompt, genai_file],
-            generation_config={
-                "response_mime_type": "application/json",
-                "temperature": 0.1,
-            },
+
+
+def _record_openai_usage(usage) -> None:
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        _record_usage("openai", usage.prompt_tokens, usage.completion_tokens, cached)
+
+
+def _record_gemini_usage(response) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        _record_usage(
+            "gemini",
+            usage.prompt_token_count,
+            usage.candidates_token_count,
+            getattr(usage, "cached_content_token_count", None),
         )
-    return response.text.strip()
 
 
+def _log_prompt_size(full_prompt: str) -> None:
+    tokens = count_tokens(full_prompt, EXTRACTION_MODEL)
+    prompt_chars.observe(len(full_prompt))
+    prompt_tokens_estimate.observe(tokens)
+    print(f"[FastAPI] Prompt: {len(full_prompt)} chars, {tokens} tokens")
+
+
+def _route(provider: str | None = None) -> list[str]:
+    """Providers to try, in order: the requested one only, or the default then the other configured one."""
+    if provider:
+        provider = provider.strip().lower()
+        if provider not in PROVIDER_MODELS:
+            raise HTTPException(status_code=400, detail=f"Unknown provider: {provider}. Use openai or gemini")
+        if provider not in provider_router.providers:
+            raise HTTPException(status_code=400, detail=f"Provider {provider} is not configured (missing API key)")
+        return [provider]
+    route = [EXTRACTION_PROVIDER] if EXTRACTION_PROVIDER in provider_router.providers else []
+    if EXTRACTION_FALLBACK or not route:
+        route += [name for name in provider_router.providers if name != EXTRACTION_PROVIDER]
+    if not route:
+        raise HTTPException(
+            status_code=503, detail="No extraction provider configured: set OPENAI_API_KEY or GOOGLE_API_KEY"
+        )
+    return route
+
+
+def _record_answer(provider: str) -> None:
+    answered = _answered_by.get()
+    if answered is not None:
+        answered.add(provider)
+
+
+async def _stream_extraction(full_prompt: str, attachment=None, provider: str | None = None):
+    _log_prompt_size(full_prompt)
+    with span("provider_stream"):
+        async for delta in provider_router.stream(_route(provider), full_prompt, attachment, _record_answer):
+            yield delta
+
+
+async def _run_extraction(full_prompt: str, attachment=None, provider: str | None = None) -> str:
+    """Run an extraction through the provider router. attachment: an UploadedDocument or None."""
+    _log_prompt_size(full_prompt)
+    route = _route(provider)
+    with span("provider_call"):
+        raw, answered_by = await provider_router.complete(route, full_prompt, attachment)
+    _record_answer(answered_by)
+    provider_calls.inc(1, answered_by)
+    response_chars.observe(len(raw), answered_by)
+    if answered_by != route[0]:
+        print(f"[FastAPI] Answered by {answered_by} {PROVIDER_MODELS[answered_by]}")
+    return raw
+
+
+async def _extract_pdf_chunked(
+    file_content,
+    page_count: int,
+    client_name: str | None,
+    mapping_text: str | None,
+    expected_items: int | None,
+    pages_per_chunk: int,
+    provider: str | None = None,
+) -> dict:
+    """Extract a PDF as concurrent page windows and merge the per-window items.
+
+    With Gemini first on the route each window is uploaded as its own PDF (page 1 included for header
+    context); the page text is extracted, once for all windows, only if a call goes to another provider.
+    """
+    # The exact-count constraint applies to the whole document, so windows get it as a note instead
+    prompt = build_prompt(client_name, mapping_text, None)
+    route = _route(provider)
+    windows = plan_page_windows(page_count, pages_per_chunk)
+    fanout = asyncio.Semaphore(PDF_CHUNK_FANOUT)
+    print(f"[FastAPI] Chunked PDF extraction: {page_count} pages -> {len(windows)} chunk(s), fan-out {PDF_CHUNK_FANOUT}")
+
+    page_texts_task = None
+
+    async def page_texts_and_header() -> tuple[list[str], str]:
+        nonlocal page_texts_task
+        if page_texts_task is None:
+            page_texts_task = asyncio.ensure_future(_chunk_page_texts(file_content))
+        page_texts = await asyncio.shield(page_texts_task)
+        return page_texts, header_context(page_texts, PDF_CHUNK_HEADER_LINES)
+
+    async def text_prompt(start_page: int, end_page: int) -> str:
+        page_texts, header = await page_texts_and_header()
+        full_prompt = prompt + chunk_instructions(start_page, end_page, page_count, expected_items)
+        if start_page > 1 and header:
+            full_prompt += "\n\nDocument header (from page 1, context only):\n" + header
+        return full_prompt + "\n\nPDF content (extracted text):\n" + "\n\n".join(page_texts[start_page - 1 : end_page])
+
+    async def run_window(index: int, start_page: int, end_page: int) -> dict:
+        async with fanout:
+            gfile = None
+            if provider_router.order(route)[0] == "gemini":
+                window_pdf = await asyncio.to_thread(pdf_pages, file_content, window_pages(start_page, end_page))
+                gfile = await _upload_for_route(window_pdf, ".pdf", f"pages-{start_page}-{end_page}.pdf", route)
+            if gfile is None:
+                raw = await _run_extraction(await text_prompt(start_page, end_page), provider=provider)
+            else:
+                attachment = UploadedDocument(gfile, lambda: text_prompt(start_page, end_page))
+                try:
+                    full_prompt = prompt + chunk_instructions(start_page, end_page, page_count, expected_items, attached=True)
+                    raw = await _run_extraction(full_prompt, attachment, provider)
+                finally:
+                    await _cleanup(attachment)
+        data = parse_model_json(raw)
+        print(f"[FastAPI] Chunk {index + 1}/{len(windows)} (pages {start_page}-{end_page}): {len(data.get('items') or [])} items")
+        return data
+
+    results = await asyncio.gather(
+        *(run_window(i, start_page, end_page) for i, (start_page, end_page) in enumerate(windows))
+    )
+    return merge_chunk_results(list(results))
+
+
+async def _chunk_page_texts(file_content) -> list[str]:
+    with span("pdf_text"):
+        page_texts = await asyncio.to_thread(_pdf_page_texts, file_content)
+        if PROMPT_COMPACTION:
+            page_texts = _compact_pdf_pages(page_texts)
+    return page_texts
+
+
+async def _complete_excel_plan(plan, mapping_text: str, provider: str | None = None) -> dict:
+    """Ask the LLM only for what the Excel rules could not resolve, then merge it in."""
+    from excel_fastpath import finish_plan, header_prompt, row_prompts
+    prompts = row_prompts(plan, PROMPT_BASE if plan.assist_rows else "", mapping_text)
+    print(
+        f"[FastAPI] Excel fast path: {len(plan.items)} rows parsed, "
+        f"header LLM call: {bool(plan.header_missing)}, row LLM calls: {len(prompts)} (fan-out {EXCEL_ASSIST_FANOUT})"
+    )
+
+    fanout = asyncio.Semaphore(EXCEL_ASSIST_FANOUT)
+
+    async def run(prompt: str) -> dict:
+        async with fanout:
+            raw = await _run_extraction(prompt, provider=provider)
+        return parse_model_json(raw)
+
+    header_result = None
+    if plan.header_missing:
+        header_result, *row_results = await asyncio.gather(run(header_prompt(plan)), *(run(p) for p in prompts))
+    else:
+        row_results = list(await asyncio.gather(*(run(p) for p in prompts)))
+    with span("excel_finish"):
+        return await asyncio.to_thread(finish_plan, plan, header_result, row_results)
+
+
+def parse_model_json(raw: str) -> dict:
+    """Parse the model response into a dict, repairing common JSON formatting issues."""
+    try:
+        with span("json_parse"):
+            data, repairs = loads_tolerant(raw)
+    except JSONRepairError as json_error:
+        json_parses.inc(1, "failed")
+        print(f"[FastAPI] JSON parsing error: {json_error}")
+        print(f"[FastAPI] Raw response length: {len(raw)} chars, first 500 chars: {raw[:500]}")
+        raise HTTPException(status_code=500, detail=f"Failed to parse JSON response: {str(json_error)}")
+    for strategy in repairs or ("clean",):
+        json_parses.inc(1, strategy)
+    if repairs:
+        print(f"[FastAPI] Repaired model JSON: {', '.join(repairs)}")
+    if isinstance(data, list):
+        # Bare items array instead of the schema object
+        data = {"items": data}
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=500, detail=f"Failed to parse JSON response: expected an object, got {type(data).__name__}")
+    return data
+
+
+@lru_cache(maxsize=64)
 def build_prompt(client_name_hint: str | None, mapping_text: str | None, expected_items: int | None) -> str:
+    """The prompt up to the document: rules and client context, PREFIX_END, then this request's constraints.
+
+    Everything before PREFIX_END depends only on the client, so it is the same for every PO from
+    that client and the providers can cache it (see prompt_cache.py).
+    """
     prompt_parts = [PROMPT_BASE.strip()]
+    if mapping_text:
+        prompt_parts.append(
+            "Client mapping (apply these rules to populate the canonical fields above):\n"
+            f"{mapping_text.strip()}"
+        )
     if client_name_hint:
         prompt_parts.append(
             f"Client name hint: {client_name_hint}. Use this as client_name if it matches the PO header."
         )
+    prompt_parts.append("Respond with JSON only, no markdown or explanations.")
+    prompt = "\n\n".join(prompt_parts) + PREFIX_END
     if expected_items is not None:
-        prompt_parts.append(
+        prompt += (
             f"CRITICAL: This PO contains exactly {expected_items} items. "
             f'Your "items" array MUST have exactly {expected_items} entries. '
             f'Set "total_entries" to {expected_items}. Count carefully and match this number exactly.'
         )
-    if mapping_text:
-        prompt_parts.append(
-            "Client mapping (apply these rules to populate the canonical fields above):\n"
-            f"{mapping_text.strip()}"
-        )
-    prompt_parts.append("Respond with JSON only, no markdown or explanations.")
-    return "\n\n".join(prompt_parts)
+    return prompt
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Render"""
     return {"status": "healthy", "service": "FastAPI Invoice Extraction"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: stage latency, prompt/response sizes, token usage, JSON repairs, item-count mismatches."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def _live_metrics() -> list[str]:
+    lines = live_lines(
+        "extraction_in_flight", "Extractions holding a concurrency slot", "gauge", {"": extraction_limiter.in_flight}
+    )
+    lines += live_lines(
+        "extraction_waiting", "Extractions queued for a concurrency slot", "gauge", {"": extraction_limiter.waiting}
+    )
+    if result_cache is not None:
+        lines += live_lines(
+            "extraction_cache_requests_total", "Result cache lookups", "counter",
+            {"hit": result_cache.hits, "miss": result_cache.misses}, "result",
+        )
+    router = provider_router.stats()["providers"]
+    lines += live_lines(
+        "provider_attempt_errors_total", "Failed provider attempts (including retried ones)", "counter",
+        {name: stats["errors"] for name, stats in router.items()}, "provider",
+    )
+    lines += live_lines(
+        "provider_hedges_total", "Calls raced against a second provider after exceeding the primary's p95", "counter",
+        {"": provider_router.hedges_started},
+    )
+    return lines
+
+
+add_collector(_live_metrics)
+
+
 @app.get("/")
 def home():
     return {
         "status": "Invoice API running 🚀",
         "version": "1.0",
         "extraction_provider": EXTRACTION_PROVIDER,
-        "model": "gpt-4o-mini" if EXTRACTION_PROVIDER == "openai" else "gemini-2.5-flash",
+        "model": EXTRACTION_MODEL,
+        "concurrency": extraction_limiter.stats(),
+        "cache": result_cache.stats() if result_cache is not None else {"backend": "off"},
+        "rate_limits": provider_rate_limiter.stats(),
+        "providers": provider_router.stats(),
+        "pdf_text": pdf_extractor.stats(),
+        "gemini_prefix_cache": gemini_prefix_cache.stats() if gemini_prefix_cache is not None else None,
+        "jobs": job_pool.stats() if job_pool is not None else {"workers": 0},
     }
 
 @app.post("/extract-invoice")
@@ -195,259 +792,716 @@ async def extract_invoice(
     client_name: str | None = Form(None),
     mapping_text: str | None = Form(None),
     expected_items: int | None = Form(None),
+    chunked: bool | None = Form(None),
+    pages_per_chunk: int | None = Form(None),
+    provider: str | None = Form(None),
+):
+    _route(provider)
+    try:
+        async with extraction_limiter.slot():
+            return await _extract_invoice(
+                file, client_name, mapping_text, expected_items, chunked, pages_per_chunk, provider
+            )
+    except QueueFullError as e:
+        print(f"[FastAPI] Rejecting {file.filename}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {e}. Retry in {e.retry_after}s.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    client_name: str | None = Form(None),
+    mapping_text: str | None = Form(None),
+    expected_items: int | None = Form(None),
+    chunked: bool | None = Form(None),
+    pages_per_chunk: int | None = Form(None),
+    provider: str | None = Form(None),
 ):
-    tmp_path = None
-    gfile = None
-    start_time = os.times().elapsed if hasattr(os.times(), 'elapsed') else None
-    
+    """Queue an extraction and return its id at once; poll GET /jobs/{job_id} for the result."""
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job API disabled (JOBS_WORKERS=0)")
+    suffix = _validate_upload(file)
+    _route(provider)
+    file_content = await file.read()
+    params = {
+        "suffix": suffix,
+        "client_name": client_name,
+        "mapping_text": mapping_text,
+        "expected_items": expected_items,
+        "chunked": chunked,
+        "pages_per_chunk": pages_per_chunk,
+        "provider": provider,
+    }
+    try:
+        job_id = await asyncio.to_thread(
+            job_store.enqueue, file.filename, file_content, params, JOBS_MAX_ATTEMPTS, JOBS_MAX_PENDING
+        )
+    except JobQueueFullError as e:
+        retry_after = extraction_limiter.retry_after
+        print(f"[Jobs] Rejecting {file.filename}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {e}. Retry in {retry_after}s.",
+            headers={"Retry-After": str(retry_after)},
+        )
+    if job_pool is not None:
+        job_pool.notify()
+    print(f"[Jobs] Queued {job_id} for {file.filename} ({len(file_content)} bytes)")
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    if job_store is None:
+        raise HTTPException(status_code=503, detail="Job API disabled (JOBS_WORKERS=0)")
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+async def _run_job(job: dict) -> dict:
+    """JobWorkerPool handler: run one queued extraction. Client errors are not retried.
+
+    Jobs take an extraction slot like requests do, so EXTRACTION_CONCURRENCY stays the limit for the
+    whole service; a full queue is waited out rather than counted as a failed attempt.
+    """
+    params = job["params"]
+    while True:
+        try:
+            async with extraction_limiter.slot():
+                return await _extract_document(
+                    job["filename"],
+                    params["suffix"],
+                    job["file"],
+                    params["client_name"],
+                    params["mapping_text"],
+                    params["expected_items"],
+                    params["chunked"],
+                    params["pages_per_chunk"],
+                    params.get("provider"),
+                )
+        except QueueFullError as e:
+            print(f"[Jobs] {job['id']} waiting {e.retry_after}s for an extraction slot: {e}")
+            await asyncio.sleep(e.retry_after)
+        except HTTPException as e:
+            if 400 <= e.status_code < 500 and e.status_code != 429:
+                raise PermanentJobError(e.detail) from e
+            raise
+
+
+@app.post("/extract-invoices/batch")
+async def extract_invoices_batch(
+    files: list[UploadFile] = File(...),
+    options: str | None = Form(None),
+    client_name: str | None = Form(None),
+    mapping_text: str | None = Form(None),
+    expected_items: int | None = Form(None),
+    provider: str | None = Form(None),
+    mode: str = Form("sync"),
+):
+    """Extract many POs in one request.
+
+    options is JSON: a list with one object per file (upload order) or an object keyed by filename,
+    each with any of client_name / mapping_text / expected_items / chunked / pages_per_chunk / provider. The
+    plain form fields are defaults for every file. mode=sync (default) extracts the files concurrently
+    and returns per-file results and errors; mode=provider_batch submits them to the OpenAI Batch API
+    (cheaper, completes within 24h) and returns a batch id to poll at GET /extract-invoices/batch/{id}.
+    """
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files: {len(files)} (max {BATCH_MAX_FILES})")
+    defaults = {
+        "client_name": client_name,
+        "mapping_text": mapping_text,
+        "expected_items": expected_items,
+        "provider": provider,
+    }
+    per_file = _batch_options(files, options, defaults)
+
+    mode = mode.strip().lower()
+    if mode == "provider_batch":
+        return await _submit_provider_batch(files, per_file)
+    if mode != "sync":
+        raise HTTPException(status_code=400, detail=f"Unknown mode: {mode}. Use sync or provider_batch")
+
+    try:
+        extraction_limiter.check()
+    except QueueFullError as e:
+        print(f"[FastAPI] Rejecting batch of {len(files)} files: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {e}. Retry in {e.retry_after}s.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    print(f"[FastAPI] Batch of {len(files)} files (fan-out {BATCH_FANOUT})")
+    start = time.perf_counter()
+    fanout = asyncio.Semaphore(BATCH_FANOUT)
+    results = await asyncio.gather(
+        *(_extract_batch_file(index, file, opts, fanout) for index, (file, opts) in enumerate(zip(files, per_file)))
+    )
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    print(f"[FastAPI] Batch done in {time.perf_counter() - start:.2f}s: {succeeded}/{len(results)} succeeded")
+    return {
+        "mode": "sync",
+        "total_files": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
+@app.get("/extract-invoices/batch/{batch_id}")
+async def get_provider_batch(batch_id: str):
+    """Status of a provider batch; once it has finished, per-file results in the sync batch shape."""
+    store = _provider_batches()
+    stored = await asyncio.to_thread(store.load, batch_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Batch not found: {batch_id}")
+    manifest, results = stored
+    if results is None:
+        client = await _openai()
+        batch = await client.batches.retrieve(batch_id)
+        counts = batch.request_counts.model_dump() if batch.request_counts else None
+        if batch.status not in ("completed", "failed", "expired", "cancelled"):
+            return {"mode": "provider_batch", "batch_id": batch_id, "status": batch.status, "request_counts": counts}
+        results = await _collect_provider_batch(batch, manifest)
+        await asyncio.to_thread(store.set_results, batch_id, results)
+        print(f"[FastAPI] Provider batch {batch_id} collected ({batch.status})")
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {
+        "mode": "provider_batch",
+        "batch_id": batch_id,
+        "status": "finished",
+        "total_files": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
+
+
+def _batch_options(files: list[UploadFile], options: str | None, defaults: dict) -> list[dict]:
+    """Per-file extraction parameters: defaults overlaid with the matching entry from options."""
+    entries = [{} for _ in files]
+    if options:
+        try:
+            parsed = json.loads(options)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"options is not valid JSON: {e}")
+        if isinstance(parsed, list):
+            if len(parsed) != len(files):
+                raise HTTPException(
+                    status_code=400, detail=f"options has {len(parsed)} entries for {len(files)} files"
+                )
+            entries = parsed
+        elif isinstance(parsed, dict):
+            entries = [parsed.get(file.filename) or {} for file in files]
+        else:
+            raise HTTPException(status_code=400, detail="options must be a JSON list or object")
+
+    per_file = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise HTTPException(status_code=400, detail=f"options[{index}] must be an object")
+        unknown = set(entry) - set(BATCH_OPTION_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"options[{index}]: unknown fields {sorted(unknown)}")
+        opts = {field: None for field in BATCH_OPTION_FIELDS}
+        opts.update({k: v for k, v in defaults.items() if v is not None})
+        opts.update(entry)
+        try:
+            for field in ("expected_items", "pages_per_chunk"):
+                if opts[field] is not None:
+                    opts[field] = int(opts[field])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"options[{index}]: {field} must be an integer")
+        if opts["chunked"] is not None and not isinstance(opts["chunked"], bool):
+            raise HTTPException(status_code=400, detail=f"options[{index}]: chunked must be true or false")
+        if opts["provider"] is not None:
+            try:
+                _route(str(opts["provider"]))
+            except HTTPException as e:
+                raise HTTPException(status_code=400, detail=f"options[{index}]: {e.detail}")
+        per_file.append(opts)
+    return per_file
+
+
+async def _extract_batch_file(index: int, file: UploadFile, opts: dict, fanout: asyncio.Semaphore) -> dict:
+    entry = {"index": index, "filename": file.filename}
     try:
-        print(f"[FastAPI] Starting extraction for file: {file.filename} (size: {file.size} bytes)")
-        
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No filename provided")
-        
-        suffix = os.path.splitext(file.filename)[-1].lower()
-        supported_extensions = ['.pdf', '.xlsx', '.xls']
-        if suffix not in supported_extensions:
+        suffix = _validate_upload(file)
+        async with fanout:
+            async with extraction_limiter.slot():
+                with span("read_upload"):
+                    file_content = await read_upload(file)
+                try:
+                    data = await _extract_document(file.filename, suffix, file_content, **opts)
+                finally:
+                    release(file_content)
+    except QueueFullError as e:
+        entry.update(status="error", status_code=429, error=f"Server busy: {e}")
+    except HTTPException as e:
+        entry.update(status="error", status_code=e.status_code, error=e.detail)
+    except Exception as e:
+        # One bad file (unreadable upload, client gone mid-read) must not fail the rest of the batch
+        print(f"[FastAPI] Batch file {index} ({file.filename}) failed: {type(e).__name__}: {e}")
+        entry.update(status="error", status_code=500, error=f"Extraction failed: {type(e).__name__}: {e}")
+    else:
+        entry.update(status="ok", data=data)
+    return entry
+
+
+def _provider_batches() -> ProviderBatchStore:
+    global _provider_batch_store
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=400, detail="mode=provider_batch requires OPENAI_API_KEY")
+    if _provider_batch_store is None:
+        _provider_batch_store = ProviderBatchStore(os.getenv("JOBS_DB_PATH", "extraction_jobs.sqlite3"))
+    return _provider_batch_store
+
+
+async def _prepare_batch_line(index: int, file: UploadFile, opts: dict) -> tuple[dict, dict | None]:
+    """Manifest entry and batch request line for one file (line is None if the file was rejected)."""
+    entry = {
+        "index": index,
+        "filename": file.filename,
+        "expected_items": opts["expected_items"],
+        "client_name": opts["client_name"],
+    }
+    file_content = None
+    try:
+        suffix = _validate_upload(file)
+        if opts["provider"] not in (None, "openai"):
+            raise HTTPException(status_code=400, detail="mode=provider_batch only supports provider=openai")
+        if opts["chunked"] or opts["pages_per_chunk"] is not None:
+            # Each file is one batch request; page windows would need a merge step the batch API has no place for
             raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file type: {suffix}. Supported types: {', '.join(supported_extensions)}"
+                status_code=400, detail="chunked / pages_per_chunk are not supported with mode=provider_batch; use mode=sync"
             )
-        print(f"[FastAPI] Processing {suffix.upper()} file: {file.filename}")
+        if suffix in (".xlsx", ".xls") and opts["mapping_text"] and EXCEL_FASTPATH:
+            entry["warning"] = "Excel fast path not used in mode=provider_batch: the whole workbook is sent to the model"
+        file_content = await read_upload(file)
+        prompt = build_prompt(opts["client_name"], opts["mapping_text"], opts["expected_items"])
+        full_prompt, _ = await _prepare_document(file_content, suffix, prompt, file.filename, "openai")
+    except HTTPException as e:
+        entry.update(status="error", status_code=e.status_code, error=e.detail)
+        return entry, None
+    except Exception as e:
+        entry.update(status="error", status_code=400, error=f"Failed to read file: {type(e).__name__}: {e}")
+        return entry, None
+    finally:
+        release(file_content)
+    return entry, batch_request_line(str(index), full_prompt, OPENAI_MODEL)
 
-        # Read file content
-        file_content = await file.read()
-        file_size = len(file_content)
-        print(f"[FastAPI] File read successfully: {file_size} bytes")
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(file_content)
-            tmp_path = tmp.name
-        
-        print(f"[FastAPI] Temporary file created: {tmp_path}")
+async def _submit_provider_batch(files: list[UploadFile], per_file: list[dict]) -> JSONResponse:
+    store = _provider_batches()
+    prepared = await asyncio.gather(
+        *(_prepare_batch_line(index, file, opts) for index, (file, opts) in enumerate(zip(files, per_file)))
+    )
+    manifest = [entry for entry, _ in prepared]
+    lines = [line for _, line in prepared if line is not None]
+    if not lines:
+        raise HTTPException(status_code=400, detail={"message": "No valid files in batch", "results": manifest})
 
-        prompt = build_prompt(client_name, mapping_text, expected_items)
+    payload = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+    client = await _openai()
+    input_file = await client.files.create(file=("extraction_batch.jsonl", payload), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"source": "extract-invoices-batch"},
+    )
+    await asyncio.to_thread(store.save, batch.id, manifest)
+    print(f"[FastAPI] Submitted provider batch {batch.id}: {len(lines)}/{len(files)} files")
+    return JSONResponse(
+        status_code=202,
+        content={
+            "mode": "provider_batch",
+            "batch_id": batch.id,
+            "status": batch.status,
+            "status_url": f"/extract-invoices/batch/{batch.id}",
+            "total_files": len(files),
+            "submitted": len(lines),
+            "rejected": [entry for entry in manifest if entry.get("status") == "error"],
+            "warnings": [
+                {"index": entry["index"], "filename": entry["filename"], "warning": entry["warning"]}
+                for entry in manifest
+                if "warning" in entry and entry.get("status") != "error"
+            ],
+        },
+    )
 
-        # Handle Excel: convert to text and include in prompt (same for both providers)
-        if suffix == ".xlsx" or suffix == ".xls":
-            print(f"[FastAPI] Converting Excel file to text format...")
-            excel_content = ""
+
+async def _collect_provider_batch(batch, manifest: list[dict]) -> list[dict]:
+    client = await _openai()
+    outputs = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if file_id:
+            content = await client.files.content(file_id)
+            outputs.update(parse_batch_output(content.text))
+
+    results = []
+    for entry in manifest:
+        result = {"index": entry["index"], "filename": entry["filename"]}
+        if "warning" in entry:
+            result["warning"] = entry["warning"]
+        if entry.get("status") == "error":
+            results.append({**result, **{k: entry[k] for k in ("status", "status_code", "error")}})
+            continue
+        raw, error = outputs.get(str(entry["index"]), (None, f"No result (batch {batch.status})"))
+        if error is None:
             try:
-                excel_file = pd.ExcelFile(tmp_path)
-                for sheet_name in excel_file.sheet_names:
-                    df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    excel_content += f"\n\n=== Sheet: {sheet_name} ===\n"
-                    excel_content += df.to_csv(index=False, na_rep="")
-                print(f"[FastAPI] Excel file converted to text (length: {len(excel_content)} chars)")
-            except Exception as excel_error:
-                print(f"[FastAPI] Error reading Excel file: {excel_error}")
-                raise HTTPException(status_code=400, detail=f"Failed to read Excel file: {str(excel_error)}")
-
-            file_type_context = "\n\nIMPORTANT: This is an Excel file. The file content is provided below as text. Read all worksheets, identify header rows, and extract all data rows as items. Pay special attention to column names and map them according to the mapping rules provided."
-            full_prompt = prompt + file_type_context + "\n\nExcel File Content:\n" + excel_content
-
-            if EXTRACTION_PROVIDER == "openai":
-                print(f"[FastAPI] Generating content with OpenAI gpt-4o-mini...")
-                raw = _run_extraction_openai(full_prompt)
+                data = _finalize_result(parse_model_json(raw), entry["expected_items"], entry["client_name"])
+            except HTTPException as e:
+                error = e.detail
             else:
-                print(f"[FastAPI] Generating content with Gemini...")
-                raw = _run_extraction_gemini(full_prompt, None)
-        else:
-            # PDF
-            file_type_context = "\n\nIMPORTANT: This is a PDF file. Extract text and tables carefully, identifying the client name, PO number, date, and all item rows."
-            if EXTRACTION_PROVIDER == "openai":
-                print(f"[FastAPI] Extracting PDF text for OpenAI...")
-                pdf_text = _pdf_to_text(tmp_path)
-                full_prompt = prompt + file_type_context + "\n\nPDF content (extracted text):\n" + pdf_text
-                print(f"[FastAPI] Generating content with OpenAI gpt-4o-mini...")
-                raw = _run_extraction_openai(full_prompt)
-            else:
-                print(f"[FastAPI] Uploading file to Gemini...")
-                gfile = genai.upload_file(tmp_path)
-                print(f"[FastAPI] File uploaded to Gemini: {gfile.name}")
-                full_prompt = prompt + file_type_context
-                print(f"[FastAPI] Generating content with Gemini...")
-                raw = _run_extraction_gemini(full_prompt, gfile)
-        print(f"[FastAPI] Content generated successfully (length: {len(raw)} chars)")
-
-        # Parse JSON with resilience to markdown/code fences and common formatting issues
-        def strip_fences(text: str) -> str:
-            cleaned = text.strip()
-            cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
-            cleaned = re.sub(r"\s*```$", "", cleaned, flags=re.MULTILINE)
-            return cleaned
-
-        def extract_balanced_json(text: str) -> str:
-            # Find first '{' and parse until matching brace depth returns to 0
-            start = text.find("{")
-            if start == -1:
-                return text
-            depth = 0
-            for idx in range(start, len(text)):
-                ch = text[idx]
-                if ch == "{":
-                    depth += 1
-                elif ch == "}":
-                    depth -= 1
-                    if depth == 0:
-                        return text[start : idx + 1]
-            return text[start:]
-
-        def remove_trailing_commas(text: str) -> str:
-            # Remove trailing commas before } or ]
-            return re.sub(r",(\s*[}\]])", r"\1", text)
-        
-        def fix_missing_commas_in_json(text: str) -> str:
-            """Fix missing commas in JSON structure, especially in arrays and objects"""
-            # Fix missing commas between array/object elements
-            # Pattern: }" or ]" or }" or number" or true" or false" or null" followed by new value
-            result = text
-            # Fix: } followed by " (missing comma between objects)
-            result = re.sub(r'}\s+"', r'}, "', result)
-            # Fix: ] followed by " (missing comma between array elements)
-            result = re.sub(r']\s+"', r'], "', result)
-            # Fix: " followed by { (missing comma between string and object)
-            result = re.sub(r'"\s+{', r'", {', result)
-            # Fix: " followed by [ (missing comma between string and array)
-            result = re.sub(r'"\s+\[', r'", [', result)
-            # Fix: number followed by " (missing comma between number and string)
-            result = re.sub(r'(\d)\s+"', r'\1, "', result)
-            # Fix: " followed by number (missing comma between string and number)
-            result = re.sub(r'"\s+(\d)', r'", \1', result)
-            # Fix: true/false/null followed by " (missing comma)
-            result = re.sub(r'(true|false|null)\s+"', r'\1, "', result)
-            # Fix: " followed by true/false/null (missing comma)
-            result = re.sub(r'"\s+(true|false|null)', r'", \1', result)
-            # Fix: } followed by { (missing comma between objects)
-            result = re.sub(r'}\s+{', r'}, {', result)
-            # Fix: ] followed by [ (missing comma between arrays)
-            result = re.sub(r']\s+\[', r'], [', result)
-            return result
-
-        def clean_control_chars(text: str) -> str:
-            return "".join(ch for ch in text if ord(ch) >= 32 or ch in "\r\n\t")
-
-        def quote_unquoted_keys(text: str) -> str:
-            # Add quotes around object keys that are unquoted (best-effort)
-            pattern = r'([{\[,]\s*)([A-Za-z0-9_]+)\s*:'
-            return re.sub(pattern, r'\1"\2":', text)
-
-        def close_unterminated_strings(text: str) -> str:
-            # Best-effort fix for unterminated strings by closing them at line breaks or end of text
-            out = []
-            in_str = False
-            escape = False
-            for ch in text:
-                if ch == "\n" and in_str:
-                    out.append('"')  # close before newline
-                    in_str = False
-                out.append(ch)
-                if escape:
-                    escape = False
-                    continue
-                if ch == "\\":
-                    escape = True
-                    continue
-                if ch == '"':
-                    in_str = not in_str
-            if in_str:
-                out.append('"')
-            return "".join(out)
-
-
-        def extract_json(text: str) -> str:
-            cleaned = strip_fences(text)
-            cleaned = clean_control_chars(cleaned)
-            cleaned = close_unterminated_strings(cleaned)
-            cleaned = quote_unquoted_keys(cleaned)
-            cleaned = fix_missing_commas_in_json(cleaned)
-            balanced = extract_balanced_json(cleaned)
-            balanced = remove_trailing_commas(balanced)
-            return balanced.strip()
-
-        json_text = extract_json(raw)
+                results.append({**result, "status": "ok", "data": data})
+                continue
+        results.append({**result, "status": "error", "status_code": 502, "error": error})
+    return results
+
 
+@app.post("/extract-invoice/stream")
+async def extract_invoice_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    client_name: str | None = Form(None),
+    mapping_text: str | None = Form(None),
+    expected_items: int | None = Form(None),
+    provider: str | None = Form(None),
+    format: str | None = Form(None),
+):
+    """Stream items as they are generated: one "item" event per completed item, then a "summary" event.
+
+    Responds with NDJSON by default, or Server-Sent Events when format=sse or the client sends
+    Accept: text/event-stream.
+    """
+    use_sse = format == "sse" or "text/event-stream" in request.headers.get("accept", "")
+    suffix = _validate_upload(file)
+    primary = _route(provider)[0]
+
+    # Reject up front while we can still send a status code; the slot itself is held by the generator
+    try:
+        extraction_limiter.check()
+    except QueueFullError as e:
+        print(f"[FastAPI] Rejecting {file.filename}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {e}. Retry in {e.retry_after}s.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    with span("read_upload"):
+        file_content = await read_upload(file)
+    print(f"[FastAPI] Starting streaming extraction for file: {file.filename} ({len(file_content)} bytes)")
+
+    def encode(event: str, payload: dict) -> str:
+        if use_sse:
+            return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        return json.dumps({"event": event, **payload}) + "\n"
+
+    async def events():
+        attachment = None
+        slot = AsyncExitStack()
         try:
-            data = json.loads(json_text)
-        except json.JSONDecodeError as json_error:
-            # Enhanced fallback: try multiple repair strategies
-            print(f"[FastAPI] First JSON parse attempt failed: {json_error}")
-            print(f"[FastAPI] Error at position: {json_error.pos if hasattr(json_error, 'pos') else 'unknown'}")
-            
-            def fix_at_error_position(text: str, error_pos: int) -> str:
-                """Try to fix JSON at the specific error position"""
-                if error_pos >= len(text):
-                    return text
-                # Look backwards from error position to find where to insert comma
-                last_bracket = text.rfind('[', 0, error_pos)
-                if last_bracket != -1:
-                    # Find the last comma or opening bracket before error
-                    last_comma = text.rfind(',', last_bracket, error_pos)
-                    last_quote = text.rfind('"', last_bracket, error_pos)
-                    if last_quote > last_comma and error_pos < len(text) and text[error_pos] in ['"', '{', '[']:
-                        # Insert comma before the next element
-                        return text[:error_pos] + ',' + text[error_pos:]
-                return text
-            
-            fallback_strategies = [
-                # Strategy 1: Apply missing comma fixes again
-                lambda t: fix_missing_commas_in_json(t),
-                # Strategy 2: Remove double commas and fix trailing commas
-                lambda t: re.sub(r",\s*,", ",", remove_trailing_commas(t)),
-                # Strategy 3: Fix common issues in arrays and objects
-                lambda t: re.sub(r'(\])\s*(\[)', r'\1,\2', t),  # Missing comma between arrays
-                lambda t: re.sub(r'(\})\s*(\{)', r'\1,\2', t),  # Missing comma between objects
-                # Strategy 4: Try to fix at the specific error location if available
-                lambda t: fix_at_error_position(t, json_error.pos) if hasattr(json_error, 'pos') else t,
-            ]
-            
-            for i, strategy in enumerate(fallback_strategies):
-                try:
-                    fallback = strategy(json_text)
-                    if fallback != json_text:  # Only try if strategy made changes
-                        data = json.loads(fallback)
-                        json_text = fallback
-                        print(f"[FastAPI] JSON parsing succeeded with strategy {i+1}")
-                        break
-                except Exception as e:
-                    if i == len(fallback_strategies) - 1:  # Last strategy failed
-                        print(f"[FastAPI] All JSON repair strategies failed")
-                        print(f"[FastAPI] JSON parsing error: {json_error}")
-                        print(f"[FastAPI] Error position: {json_error.pos if hasattr(json_error, 'pos') else 'unknown'}")
-                        # Print context around error
-                        if hasattr(json_error, 'pos') and json_error.pos < len(json_text):
-                            start = max(0, json_error.pos - 100)
-                            end = min(len(json_text), json_error.pos + 100)
-                            print(f"[FastAPI] Context around error: {json_text[start:end]}")
-                        print(f"[FastAPI] Raw response length: {len(raw)} chars")
-                        raise HTTPException(status_code=500, detail=f"Failed to parse JSON response: {str(json_error)}")
-                    continue
+            await slot.enter_async_context(extraction_limiter.slot())
+            prompt = build_prompt(client_name, mapping_text, expected_items)
+            result_key = None
+            if result_cache is not None:
+                key_prompt = f"{prompt}\n[stream][compact:{PROMPT_COMPACTION}:{PROMPT_TABLE_FORMAT}]"
+                result_key = await asyncio.to_thread(
+                    cache_key, file_content, key_prompt, primary, PROVIDER_MODELS[primary]
+                )
+                cached = result_cache.get(result_key)
+                if cached is not None:
+                    for index, item in enumerate(cached.get("items", [])):
+                        yield encode("item", {"index": index, "item": item})
+                    summary = {k: v for k, v in cached.items() if k != "items"}
+                    yield encode("summary", {"data": summary, "items_streamed": len(cached.get("items", []))})
+                    return
+
+            answered = set()
+            _answered_by.set(answered)
+            full_prompt, attachment = await _prepare_document(file_content, suffix, prompt, file.filename, provider)
+            parser = IncrementalItemParser()
+            index = 0
+            async for delta in _stream_extraction(full_prompt, attachment, provider):
+                # One delta can complete several items; number them one by one
+                for item in parser.feed(delta):
+                    if ITEM_NORMALIZATION:
+                        item = normalize_items([item])[0][0]
+                    yield encode("item", {"index": index, "item": item})
+                    index += 1
+            raw = parser.text
+            print(f"[FastAPI] Stream finished: {len(raw)} chars, {parser.items_emitted} items streamed")
+
+            data = _finalize_result(parse_model_json(raw), expected_items, client_name)
+            if result_key is not None and _cacheable(data, primary, answered):
+                result_cache.set(result_key, data)
+            summary = {k: v for k, v in data.items() if k != "items"}
+            payload = {"data": summary, "items_streamed": parser.items_emitted}
+            if len(data["items"]) != parser.items_emitted:
+                # The repair pass recovered a different item list than the stream; send the authoritative one
+                payload["items"] = data["items"]
+            yield encode("summary", payload)
+        except HTTPException as e:
+            yield encode("error", {"status_code": e.status_code, "detail": e.detail})
+        except QueueFullError as e:
+            yield encode("error", {"status_code": 429, "detail": f"Server busy: {e}. Retry in {e.retry_after}s."})
+        except Exception as e:
+            print(f"[FastAPI] Error during streaming extraction: {type(e).__name__}: {e}")
+            yield encode("error", {"status_code": 500, "detail": f"Extraction failed: {type(e).__name__}: {e}"})
+        finally:
+            await _cleanup(attachment)
+            release(file_content)
+            await slot.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _validate_upload(file: UploadFile) -> str:
+    """Return the lower-cased file extension, rejecting unsupported uploads."""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+
+    suffix = os.path.splitext(file.filename)[-1].lower()
+    supported_extensions = ['.pdf', '.xlsx', '.xls']
+    if suffix not in supported_extensions:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Unsupported file type: {suffix}. Supported types: {', '.join(supported_extensions)}"
+        )
+    return suffix
+
+
+async def _prepare_document(
+    file_content, suffix: str, prompt: str, filename: str | None = None, provider: str | None = None
+):
+    """Build the single-call prompt for a document held in memory. Returns (full_prompt, UploadedDocument or None).
+
+    PDFs are uploaded to Gemini when Gemini is first on the route; their text is extracted only if the
+    call reaches another provider (failover or hedging), or up front when Gemini is not first.
+    """
+    if suffix == ".xlsx" or suffix == ".xls":
+        # Handle Excel: convert to text and include in prompt (same for both providers)
+        print(f"[FastAPI] Converting Excel file to text format...")
+        try:
+            with span("excel_text"):
+                excel_content = await asyncio.to_thread(_excel_to_text, open_stream(file_content))
+            print(f"[FastAPI] Excel file converted to text (length: {len(excel_content)} chars)")
+        except Exception as excel_error:
+            print(f"[FastAPI] Error reading Excel file: {excel_error}")
+            raise HTTPException(status_code=400, detail=f"Failed to read Excel file: {str(excel_error)}")
+
+        file_type_context = "\n\nIMPORTANT: This is an Excel file. The file content is provided below as text. Read all worksheets, identify header rows, and extract all data rows as items. Pay special attention to column names and map them according to the mapping rules provided."
+        return prompt + file_type_context + "\n\nExcel File Content:\n" + excel_content, None
+
+    # PDF
+    file_type_context = "\n\nIMPORTANT: This is a PDF file. Extract text and tables carefully, identifying the client name, PO number, date, and all item rows."
+
+    async def text_prompt() -> str:
+        print(f"[FastAPI] Extracting PDF text for the prompt...")
+        with span("pdf_text"):
+            pdf_text = await asyncio.to_thread(_pdf_to_text, file_content)
+        return prompt + file_type_context + "\n\nPDF content (extracted text):\n" + pdf_text
+
+    gfile = await _upload_for_route(file_content, suffix, filename, _route(provider))
+    if gfile is None:
+        return await text_prompt(), None
+    return prompt + file_type_context, UploadedDocument(gfile, text_prompt)
+
+
+async def _upload_for_route(data, suffix: str, filename: str | None, route: list[str]):
+    """Upload a document to Gemini if Gemini is first on the route (after health ordering), else None.
+
+    A failed upload falls back to None (text for the other providers) when the route has one.
+    """
+    route = provider_router.order(route)
+    if route[0] != "gemini":
+        return None
+    print(f"[FastAPI] Uploading file to Gemini...")
+    try:
+        with span("gemini_upload"):
+            gfile = await asyncio.to_thread(
+                lambda: _genai().upload_file(open_stream(data), mime_type=MIME_TYPES[suffix], display_name=filename)
+            )
+    except Exception as upload_error:
+        if len(route) == 1:
+            raise
+        print(f"[FastAPI] Gemini upload failed ({type(upload_error).__name__}: {upload_error}), sending text instead")
+        return None
+    print(f"[FastAPI] File uploaded to Gemini: {gfile.name}")
+    return gfile
+
+
+def _cacheable(data: dict, primary: str, answered: set) -> bool:
+    """Only results the primary produced (the key names it) and whose item count checked out are cached,
+    so a retry of a known-bad extraction calls the provider again."""
+    return answered <= {primary} and "_item_count_mismatch" not in data
+
+
+def _finalize_result(data: dict, expected_items: int | None, client_name: str | None) -> dict:
+    # Ensure items array exists (rename lines to items if present)
+    if "lines" in data and "items" not in data:
+        data["items"] = data.pop("lines")
+    data.setdefault("items", [])
+
+    # Force total_entries to match actual items length, taking expected_items into account if provided
+    actual_items = len(data["items"])
+    data["total_entries"] = actual_items
+    checked = expected_items is not None and expected_items > 0
+    extraction_results.inc(1, "yes" if checked else "no")
+    if checked and actual_items != expected_items:
+        item_count_mismatches.inc()
+        data["_item_count_mismatch"] = {
+            "expected": expected_items,
+            "actual": actual_items,
+        }
+
+    if client_name:
+        data["client_name"] = client_name
+    if ITEM_NORMALIZATION:
+        with span("normalize"):
+            normalize_result(data)
+        for row in data.get("_unresolved_items", []):
+            for field in row["fields"]:
+                unresolved_fields.inc(1, field)
+    return data
+
+
+async def _cleanup(attachment) -> None:
+    # Clean up the file uploaded to Gemini, if any
+    if attachment is not None:
+        gfile = attachment.file
+        try:
+            with span("gemini_delete"):
+                await asyncio.to_thread(genai.delete_file, gfile.name)
+            print(f"[FastAPI] Gemini file deleted: {gfile.name}")
+        except Exception as cleanup_error:
+            print(f"[FastAPI] Warning: Failed to delete Gemini file {gfile.name}: {cleanup_error}")
+
+
+async def _extract_invoice(
+    file: UploadFile,
+    client_name: str | None,
+    mapping_text: str | None,
+    expected_items: int | None,
+    chunked: bool | None = None,
+    pages_per_chunk: int | None = None,
+    provider: str | None = None,
+):
+    print(f"[FastAPI] Starting extraction for file: {file.filename} (size: {file.size} bytes)")
+    suffix = _validate_upload(file)
+    print(f"[FastAPI] Processing {suffix.upper()} file: {file.filename}")
+
+    # Read file content (memory-mapped when the upload was large enough to be spooled to disk)
+    with span("read_upload"):
+        file_content = await read_upload(file)
+    print(f"[FastAPI] File read successfully: {len(file_content)} bytes")
+
+    try:
+        data = await _extract_document(
+            file.filename,
+            suffix,
+            file_content,
+            client_name,
+            mapping_text,
+            expected_items,
+            chunked,
+            pages_per_chunk,
+            provider,
+        )
+    finally:
+        release(file_content)
+    return JSONResponse(content=data)
+
+
+async def _extract_document(
+    filename: str,
+    suffix: str,
+    file_content,
+    client_name: str | None,
+    mapping_text: str | None,
+    expected_items: int | None,
+    chunked: bool | None = None,
+    pages_per_chunk: int | None = None,
+    provider: str | None = None,
+) -> dict:
+    """Extract one uploaded document (already validated and read; bytes or mmap) into the canonical result dict."""
+    attachment = None
+    answered = set()
+    answered_token = _answered_by.set(answered)
+    try:
+        primary = _route(provider)[0]
+        prompt = build_prompt(client_name, mapping_text, expected_items)
+
+        pages_per_chunk = pages_per_chunk or PDF_CHUNK_PAGES
+
+        # Identical file + prompt inputs + model -> serve the stored result without calling the provider
+        result_key = None
+        if result_cache is not None:
+            key_prompt = (
+                f"{prompt}\n[chunked:{chunked}:{pages_per_chunk}][excel_fastpath:{EXCEL_FASTPATH}]"
+                f"[compact:{PROMPT_COMPACTION}:{PROMPT_TABLE_FORMAT}]"
+            )
+            with span("cache_lookup"):
+                result_key = await asyncio.to_thread(
+                    cache_key, file_content, key_prompt, primary, PROVIDER_MODELS[primary]
+                )
+                cached = result_cache.get(result_key)
+            if cached is not None:
+                print(f"[FastAPI] Cache hit for {filename}: {cached.get('total_entries', 0)} items")
+                return cached
+
+        excel_plan = None
+        if (suffix == ".xlsx" or suffix == ".xls") and mapping_text and EXCEL_FASTPATH:
+            from excel_fastpath import plan_excel_extraction
+            try:
+                with span("excel_plan"):
+                    excel_plan = await asyncio.to_thread(
+                        plan_excel_extraction, open_stream(file_content), mapping_text, client_name
+                    )
+            except Exception as plan_error:
+                print(f"[FastAPI] Excel fast path unavailable, falling back to LLM: {plan_error}")
             else:
-                # If no strategy worked, raise the original error
-                print(f"[FastAPI] JSON parsing error: {json_error}")
-                print(f"[FastAPI] Raw response (first 500 chars): {raw[:500]}")
-                raise HTTPException(status_code=500, detail=f"Failed to parse JSON response: {str(json_error)}")
-
-        # Ensure items array exists (rename lines to items if present)
-        if "lines" in data and "items" not in data:
-            data["items"] = data.pop("lines")
-        data.setdefault("items", [])
-
-        # Force total_entries to match actual items length, taking expected_items into account if provided
-        actual_items = len(data["items"])
-        data["total_entries"] = actual_items
-        if expected_items is not None and expected_items > 0 and actual_items != expected_items:
-            data["_item_count_mismatch"] = {
-                "expected": expected_items,
-                "actual": actual_items,
-            }
-
-        if client_name:
-            data["client_name"] = client_name
+                if excel_plan is None:
+                    print(f"[FastAPI] Excel fast path: no mapped header row found, using full LLM extraction")
+
+        use_chunks = False
+        if suffix == ".pdf" and chunked is not False:
+            with span("pdf_page_count"):
+                page_count = await asyncio.to_thread(_pdf_page_count, file_content)
+            use_chunks = page_count > pages_per_chunk and (chunked or page_count >= PDF_CHUNK_MIN_PAGES)
+
+        if excel_plan is not None:
+            data = await _complete_excel_plan(excel_plan, mapping_text, provider)
+        elif use_chunks:
+            data = await _extract_pdf_chunked(
+                file_content, page_count, client_name, mapping_text, expected_items, pages_per_chunk, provider
+            )
+        else:
+            full_prompt, attachment = await _prepare_document(file_content, suffix, prompt, filename, provider)
+            print(f"[FastAPI] Generating content with {primary} {PROVIDER_MODELS[primary]}...")
+            raw = await _run_extraction(full_prompt, attachment, provider)
+            print(f"[FastAPI] Content generated successfully (length: {len(raw)} chars)")
+            data = parse_model_json(raw)
+
+        data = _finalize_result(data, expected_items, client_name)
+
+        if result_key is not None and _cacheable(data, primary, answered):
+            result_cache.set(result_key, data)
 
         print(f"[FastAPI] Extraction completed successfully: {data.get('total_entries', 0)} items found")
-        return JSONResponse(content=data)
+        return data
 
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -460,18 +1514,5 @@ async def extract_invoice(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Extraction failed: {error_type}: {error_msg}")
     finally:
-        # Clean up temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.unlink(tmp_path)
-                print(f"[FastAPI] Temporary file deleted: {tmp_path}")
-            except Exception as cleanup_error:
-                print(f"[FastAPI] Warning: Failed to clean up temp file {tmp_path}: {cleanup_error}")
-        
-        # Clean up Gemini uploaded file if it exists (only when using Gemini provider)
-        if gfile and EXTRACTION_PROVIDER == "gemini":
-            try:
-                genai.delete_file(gfile.name)
-                print(f"[FastAPI] Gemini file deleted: {gfile.name}")
-            except Exception as cleanup_error:
-                print(f"[FastAPI] Warning: Failed to delete Gemini file {gfile.name}: {cleanup_error}")
+        _answered_by.reset(answered_token)
+        await _cleanup(attachment)
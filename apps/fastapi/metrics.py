@@ -0,0 +1,259 @@
+"""Per-stage timing spans and Prometheus metrics (text exposition format, no client library).
+
+with span("pdf_text"): ... times a block into the extraction_stage_seconds histogram and, during a
+request wrapped by ServerTimingMiddleware, into that request's timings. Those are returned as a
+Server-Timing header when SERVER_TIMING=1 or the request sends `X-Server-Timing: 1`.
+
+Everything is recorded on the event loop thread (spans around asyncio.to_thread calls time the
+awaited work), so recording is a few dict and list operations without locks.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").strip().lower() in ("1", "true", "on")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SIZE_BUCKETS = (1_000, 4_000, 16_000, 64_000, 256_000, 1_000_000, 4_000_000)
+
+
+def _label_text(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, *label_values) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, values)} {_number(total)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _number(bound)
+                labels = _label_text((*self.labels, "le"), (*values, le))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "extraction_stage_seconds", "Time spent in each extraction stage", ("stage",)
+)
+request_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status", ("method", "route", "status")
+)
+prompt_chars = Histogram(
+    "extraction_prompt_chars", "Prompt size per provider call in characters", buckets=SIZE_BUCKETS
+)
+prompt_tokens_estimate = Histogram(
+    "extraction_prompt_tokens_estimate", "Prompt size per provider call in tokens (tiktoken or chars/4)",
+    buckets=tuple(b // 4 for b in SIZE_BUCKETS),
+)
+response_chars = Histogram(
+    "extraction_response_chars", "Provider response size per call in characters", ("provider",), SIZE_BUCKETS
+)
+provider_calls = Counter(
+    "provider_calls_total", "Provider calls by the provider that answered", ("provider",)
+)
+provider_tokens = Counter(
+    "provider_tokens_total", "Tokens reported in provider responses (kind: prompt, cached share of prompt, completion)",
+    ("provider", "kind"),
+)
+provider_first_token_seconds = Histogram(
+    "provider_first_token_seconds", "Time from a streaming provider call to its first response token", ("provider",)
+)
+json_parses = Counter(
+    "json_parse_total", "Model responses parsed, by repair strategy (clean = no repair needed)", ("strategy",)
+)
+extraction_results = Counter(
+    "extraction_results_total", "Extraction results returned, by whether expected_items was given", ("expected_items",)
+)
+item_count_mismatches = Counter(
+    "extraction_item_count_mismatch_total", "Results whose item count differs from expected_items"
+)
+unresolved_fields = Counter(
+    "extraction_unresolved_fields_total", "Item fields post-processing could not resolve, by field", ("field",)
+)
+
+METRICS = [
+    request_seconds,
+    stage_seconds,
+    prompt_chars,
+    prompt_tokens_estimate,
+    response_chars,
+    provider_calls,
+    provider_tokens,
+    provider_first_token_seconds,
+    json_parses,
+    extraction_results,
+    item_count_mismatches,
+    unresolved_fields,
+]
+
+# Callables returning extra exposition lines (values read from live objects at scrape time)
+_collectors: list[Callable[[], list[str]]] = []
+
+
+def add_collector(collector: Callable[[], list[str]]) -> None:
+    _collectors.append(collector)
+
+
+def live_lines(name: str, help: str, kind: str, samples: dict, label: str | None = None) -> list[str]:
+    """Exposition lines for a value read at scrape time; samples maps label value -> value ("" if unlabelled)."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for key, value in samples.items():
+        labels = _label_text((label,), (key,)) if label else ""
+        lines.append(f"{name}{labels} {_number(value)}")
+    return lines
+
+
+def _worker_label() -> str | None:
+    """The process id when several worker processes serve the app (WEB_CONCURRENCY > 1), else None.
+
+    Each worker keeps its own series and a scrape reaches one of them at random, so without the
+    label counters would appear to go backwards; sum(...) without (worker) gives service totals.
+    """
+    if int(os.getenv("WEB_CONCURRENCY", "1") or 1) <= 1:
+        return None
+    return str(os.getpid())
+
+
+def _add_label(line: str, label: str) -> str:
+    """Add label (`name="value"`) to one sample line."""
+    end = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+    if line[end] == "{":
+        return f"{line[:end + 1]}{label},{line[end + 1:]}"
+    return f"{line[:end]}{{{label}}}{line[end:]}"
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    worker = _worker_label()
+    if worker is not None:
+        label = _label_text(("worker",), (worker,))[1:-1]
+        lines = [line if line.startswith("#") else _add_label(line, label) for line in lines]
+    return "\n".join(lines) + "\n"
+
+
+# Stage name -> [total seconds, count] for the request being handled, None outside a request
+_timings: ContextVar[dict | None] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage)
+        timings = _timings.get()
+        if timings is not None:
+            entry = timings.get(stage)
+            if entry is None:
+                timings[stage] = [elapsed, 1]
+            else:
+                entry[0] += elapsed
+                entry[1] += 1
+
+
+def server_timing_header(timings: dict, total: float) -> str:
+    parts = []
+    for stage, (elapsed, count) in timings.items():
+        part = f"{stage};dur={elapsed * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count} calls"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware: per-request timings context, request latency histogram, Server-Timing header.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses pass through untouched. For
+    streamed responses the header only covers the stages finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        timings: dict = {}
+        token = _timings.set(timings)
+        enabled = SERVER_TIMING or any(
+            name == b"x-server-timing" and value.strip() in (b"1", b"true", b"on") for name, value in scope["headers"]
+        )
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if enabled:
+                    header = server_timing_header(timings, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            request_seconds.observe(time.perf_counter() - start, scope["method"], path, status)
@@ -0,0 +1,172 @@
+"""Vectorised normalisation of the canonical enum fields (Category/Metal/Tone/StockType/MakeType).
+
+Each normaliser takes a pandas Series of free text (a dedicated column or an item description)
+and returns a Series of canonical enum values, "" / None where nothing matched. The rules mirror
+ENUM_RULES_FULL in main.py; the Excel fast path and postprocess.py apply them.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORY_VALUES = ["Ring", "Band", "Pendant", "Necklace", "Bracelet", "Earring", "Bangle"]
+METAL_VALUES = ["G09KT", "G10KT", "G14KT", "G18KT", "PT950", "S925"]
+TONE_VALUES = ["Y", "R", "W", "YW", "RW", "RY"]
+STOCK_TYPE_VALUES = [
+    "Normal",
+    "Studded Gold Jewellery IC",
+    "Studded Platinum Jewellery IC",
+    "Plain Gold Jewellery IC",
+    "Plain Platinum Jewellery IC",
+    "Studded Semi Mount Gold Jewellery IC",
+    "Studded Silver Jewellery IC",
+    "Plain Silver Jewellery IC",
+    "Studded Semi Mount Platinum Jewellery IC",
+    "Gold Mount Jewellery IC",
+    "Studded Combination Jewellery IC",
+]
+MAKE_TYPE_VALUES = ["CNC", "HOLLOW TUBING", "1 PC CAST", "2 PC CAST", "MULTI CAST", "HIP HOP"]
+
+# (pattern, value) pairs, first match wins. Patterns run against upper-cased text.
+_CATEGORY_RULES = [
+    (r"\bEAR\s?RINGS?\b|\bSTUDS?\b|\bHOOPS?\b", "Earring"),
+    (r"\bBANGLES?\b", "Bangle"),
+    (r"\bBRACELETS?\b", "Bracelet"),
+    (r"\bNECKLACES?\b", "Necklace"),
+    (r"\bPENDANTS?\b", "Pendant"),
+    (r"\bBANDS?\b", "Band"),
+    (r"\bRINGS?\b", "Ring"),
+]
+_METAL_RULES = [
+    (r"\bPT\s?950\b|\bPLATINUM\b|\b950\b", "PT950"),
+    (r"\bS\s?925\b|\bSV\s?925\b|\bSILVER\b|\b925\b", "S925"),
+    (r"\b18\s?K(?:T|ARAT)?\b|\bG18KT\b", "G18KT"),
+    (r"\b14\s?K(?:T|ARAT)?\b|\bG14KT\b", "G14KT"),
+    (r"\b10\s?K(?:T|ARAT)?\b|\bG10KT\b", "G10KT"),
+    (r"\b0?9\s?K(?:T|ARAT)?\b|\bG09KT\b", "G09KT"),
+]
+_TONE_RULES = [
+    (r"\bROSE\s*(?:/|&|AND)?\s*WHITE\b|\bWHITE\s*(?:/|&|AND)?\s*ROSE\b|\bR\s?/\s?W\b|\bRW\b", "RW"),
+    (r"\bROSE\s*(?:/|&|AND)?\s*YELLOW\b|\bYELLOW\s*(?:/|&|AND)?\s*ROSE\b|\bR\s?/\s?Y\b|\bRY\b", "RY"),
+    (r"\bYELLOW\s*(?:/|&|AND)?\s*WHITE\b|\bWHITE\s*(?:/|&|AND)?\s*YELLOW\b|\bY\s?/\s?W\b|\bYW\b", "YW"),
+    (r"\bROSE\b|\bPINK\b", "R"),
+    (r"\bWHITE\b", "W"),
+    (r"\bYELLOW\b", "Y"),
+]
+_MAKE_TYPE_RULES = [
+    (r"\bHIP\s?HOP\b", "HIP HOP"),
+    (r"\bHOLLOW\b|\bTUBING\b", "HOLLOW TUBING"),
+    (r"\bMULTI\b", "MULTI CAST"),
+    (r"\b2\s?PCS?\b|\bTWO\s+PIECE\b", "2 PC CAST"),
+    (r"\b1\s?PCS?\b|\bONE\s+PIECE\b", "1 PC CAST"),
+    (r"\bCNC\b", "CNC"),
+]
+
+_EXACT = {
+    "Category": {v.upper(): v for v in CATEGORY_VALUES},
+    "Metal": {v.upper(): v for v in METAL_VALUES},
+    "Tone": {v: v for v in TONE_VALUES},
+    "StockType": {v.upper(): v for v in STOCK_TYPE_VALUES},
+    "MakeType": {v.upper(): v for v in MAKE_TYPE_VALUES},
+}
+
+
+def _upper(values: pd.Series) -> pd.Series:
+    return values.fillna("").astype(str).str.upper().str.strip()
+
+
+def _first_match(text: pd.Series, rules: list[tuple[str, str]], default) -> pd.Series:
+    conditions = [text.str.contains(pattern, regex=True) for pattern, _ in rules]
+    choices = [value for _, value in rules]
+    result = np.select(conditions, choices, default=None) if len(text) else np.array([], dtype=object)
+    out = pd.Series(result, index=text.index, dtype=object)
+    return out.where(out.notna(), default)
+
+
+def _with_exact(field: str, text: pd.Series, matched: pd.Series) -> pd.Series:
+    exact = text.map(_EXACT[field])
+    return exact.where(exact.notna(), matched)
+
+
+def normalize_category(values: pd.Series, keep_unmatched: bool = False) -> pd.Series:
+    text = _upper(values)
+    matched = _with_exact("Category", text, _first_match(text, _CATEGORY_RULES, None))
+    fallback = values.fillna("").astype(str).str.strip() if keep_unmatched else ""
+    return matched.where(matched.notna(), fallback)
+
+
+def normalize_metal(values: pd.Series, keep_unmatched: bool = False) -> pd.Series:
+    text = _upper(values)
+    matched = _with_exact("Metal", text, _first_match(text, _METAL_RULES, None))
+    fallback = values.fillna("").astype(str).str.strip() if keep_unmatched else ""
+    return matched.where(matched.notna(), fallback)
+
+
+def normalize_tone(values: pd.Series, keep_unmatched: bool = False) -> pd.Series:
+    text = _upper(values)
+    compact = text.str.replace(r"[\s/&-]+", "", regex=True)
+    matched = _with_exact("Tone", compact, _first_match(text, _TONE_RULES, None))
+    fallback = values.fillna("").astype(str).str.strip() if keep_unmatched else ""
+    return matched.where(matched.notna(), fallback)
+
+
+def normalize_stock_type(values: pd.Series) -> pd.Series:
+    text = _upper(values)
+    has = lambda pattern: text.str.contains(pattern, regex=True)  # noqa: E731
+    platinum, silver = has(r"\bPLATINUM\b|\bPT\s?950\b"), has(r"\bSILVER\b|\b925\b")
+    studded, plain = has(r"\bSTUDDED\b|\bDIAMONDS?\b"), has(r"\bPLAIN\b")
+    semi_mount, mount = has(r"\bSEMI[\s-]?MOUNTS?\b"), has(r"\bMOUNTS?\b")
+    conditions = [
+        semi_mount & platinum,
+        semi_mount,
+        has(r"\bCOMBINATION\b"),
+        mount,
+        studded & platinum,
+        studded & silver,
+        studded,
+        plain & platinum,
+        plain & silver,
+        plain,
+        has(r"\bNORMAL\b"),
+    ]
+    choices = [
+        "Studded Semi Mount Platinum Jewellery IC",
+        "Studded Semi Mount Gold Jewellery IC",
+        "Studded Combination Jewellery IC",
+        "Gold Mount Jewellery IC",
+        "Studded Platinum Jewellery IC",
+        "Studded Silver Jewellery IC",
+        "Studded Gold Jewellery IC",
+        "Plain Platinum Jewellery IC",
+        "Plain Silver Jewellery IC",
+        "Plain Gold Jewellery IC",
+        "Normal",
+    ]
+    if not len(text):
+        return pd.Series([], index=text.index, dtype=object)
+    matched = pd.Series(np.select(conditions, choices, default=None), index=text.index, dtype=object)
+    return _with_exact("StockType", text, matched)
+
+
+def normalize_make_type(values: pd.Series) -> pd.Series:
+    text = _upper(values)
+    return _with_exact("MakeType", text, _first_match(text, _MAKE_TYPE_RULES, None))
+
+
+def to_quantity(values: pd.Series) -> pd.Series:
+    """Numbers as numbers, "2 pcs" -> 2, missing -> 0."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    missing = numeric.isna() & values.notna()
+    if missing.any():
+        extracted = values[missing].astype(str).str.replace(",", "").str.extract(r"(-?\d+(?:\.\d+)?)")[0]
+        numeric[missing] = pd.to_numeric(extracted, errors="coerce")
+    numeric = numeric.fillna(0)
+    whole = numeric == numeric.round()
+    return numeric.astype(object).where(~whole, numeric.round().astype("int64").astype(object))
+
+
+NORMALIZERS = {
+    "Category": normalize_category,
+    "Metal": normalize_metal,
+    "Tone": normalize_tone,
+    "StockType": normalize_stock_type,
+    "MakeType": normalize_make_type,
+}
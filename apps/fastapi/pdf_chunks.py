@@ -0,0 +1,110 @@
+"""Page-window chunking for large PDFs (server-side counterpart of the backend's pdfChunks.ts)."""
+
+
+def plan_page_windows(page_count: int, pages_per_chunk: int) -> list[tuple[int, int]]:
+    """Split 1..page_count into consecutive (start_page, end_page) windows, 1-indexed and inclusive."""
+    pages_per_chunk = max(1, pages_per_chunk)
+    return [
+        (start, min(start + pages_per_chunk - 1, page_count))
+        for start in range(1, page_count + 1, pages_per_chunk)
+    ]
+
+
+def header_context(page_texts: list[str], max_lines: int) -> str:
+    """Top lines of the first page (buyer, PO number, date, table headers) to repeat in every later window."""
+    if not page_texts:
+        return ""
+    lines = [line for line in page_texts[0].splitlines() if line.strip()]
+    return "\n".join(lines[:max_lines])
+
+
+def chunk_instructions(
+    start_page: int, end_page: int, page_count: int, expected_items: int | None, attached: bool = False
+) -> str:
+    """attached=True: the window is sent as a PDF file (see window_pages) instead of extracted text."""
+    count_note = (
+        f" The full document has exactly {expected_items} items across all pages; output only the item rows that appear on THESE pages."
+        if expected_items is not None
+        else ""
+    )
+    if not attached:
+        source = f"The text below contains only pages {start_page} to {end_page} of the original document. "
+    elif start_page > 1:
+        source = (
+            f"The attached PDF contains page 1 of the original document as the 'Document header', "
+            f"followed by pages {start_page} to {end_page}. "
+        )
+    else:
+        source = f"The attached PDF contains only pages {start_page} to {end_page} of the original document. "
+    return (
+        f"\n\nIMPORTANT — PDF extraction (Pages {start_page}-{end_page} of {page_count}): {source}"
+        "If a 'Document header' section is included, use it ONLY for client_name, invoice_number, invoice_date and to "
+        "understand the table columns; never output items from it. "
+        "Extract every serial-numbered item row on these pages, with no skipped or extra rows, and list their serial "
+        'numbers in "_debug_serials" in the same order as "items".' + count_note
+    )
+
+
+def window_pages(start_page: int, end_page: int) -> list[int]:
+    """0-indexed pages of the PDF uploaded for a window: page 1 (as header context) for later windows, then the window."""
+    pages = list(range(start_page - 1, end_page))
+    return pages if start_page == 1 else [0] + pages
+
+
+def _serial_key(serial) -> str:
+    return str(serial).strip().lstrip("0") or "0"
+
+
+def merge_chunk_results(results: list[dict]) -> dict:
+    """Merge per-window extraction results in page order.
+
+    Items are deduplicated by serial number when a window's "_debug_serials" lines up with its
+    items (rows split across a page boundary are often reported by both neighbouring windows).
+    Header fields come from the first window that has them; total_value from the last window
+    that reports one, since grand totals sit at the end of the document.
+    """
+    merged: dict = {
+        "total_value": None,
+        "client_name": "",
+        "invoice_number": "",
+        "invoice_date": "",
+        "items": [],
+    }
+    serials: list = []
+    seen: set[str] = set()
+    duplicates = 0
+
+    for result in results:
+        for field in ("client_name", "invoice_number", "invoice_date"):
+            if not merged[field] and result.get(field):
+                merged[field] = result[field]
+        if result.get("total_value") is not None:
+            merged["total_value"] = result["total_value"]
+
+        items = result.get("items")
+        if items is None:
+            items = result.get("lines") or []
+        chunk_serials = result.get("_debug_serials") or []
+        if len(chunk_serials) != len(items):
+            # Cannot align serials to items, keep everything this window returned
+            merged["items"].extend(items)
+            for serial in chunk_serials:
+                if _serial_key(serial) not in seen:
+                    seen.add(_serial_key(serial))
+                    serials.append(serial)
+            continue
+        for serial, item in zip(chunk_serials, items):
+            key = _serial_key(serial)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            serials.append(serial)
+            merged["items"].append(item)
+
+    merged["total_entries"] = len(merged["items"])
+    if serials:
+        merged["_debug_serials"] = serials
+    if duplicates:
+        print(f"[FastAPI] Dropped {duplicates} duplicate item(s) across chunk boundaries")
+    return merged
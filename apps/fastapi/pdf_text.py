@@ -0,0 +1,230 @@
+"""PDF text extraction: per-page cache, process pool, plain or layout mode.
+
+Every page gets a key hashed from what its text depends on - the content stream(s), the fonts'
+encodings / ToUnicode maps and any form XObjects it draws - plus the extraction mode. Texts are
+cached by that key, so a PO re-sent with one page changed only has that page re-extracted, and
+identical pages repeated across documents are extracted once.
+
+Pages missing from the cache are extracted in the calling thread, or, when there are at least
+min_parallel_pages of them, split into contiguous runs across a process pool (pypdf is pure Python,
+so threads would not run it in parallel). The document is copied once into a shared memory block
+and the workers are sent its name and their page numbers, so each parses the same pages in place
+instead of receiving its own pickled copy of the file.
+
+Modes: "plain" is pypdf's default extraction; "layout" (pypdf extraction_mode="layout") keeps
+the horizontal positions of text, so table columns stay aligned instead of being joined by
+single spaces.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from documents import open_stream
+
+PDF_TEXT_MODES = ("plain", "layout")
+
+
+def _stream_bytes(obj) -> bytes:
+    obj = obj.get_object()
+    try:
+        return obj.get_data()
+    except Exception:
+        return repr(obj).encode()
+
+
+class _PageHasher:
+    """Hashes pages of one document, remembering fonts and XObjects shared between pages."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._digests: dict = {}
+
+    def _shared_digest(self, ref, compute) -> bytes:
+        key = getattr(ref, "idnum", None)
+        if key is None:
+            return compute()
+        if key not in self._digests:
+            self._digests[key] = compute()
+        return self._digests[key]
+
+    def _font_digest(self, font) -> bytes:
+        font = font.get_object()
+        h = hashlib.sha256()
+        h.update(repr(font.get("/BaseFont")).encode())
+        h.update(repr(font.get("/Subtype")).encode())
+        encoding = font.get("/Encoding")
+        h.update(repr(encoding.get_object() if encoding is not None else None).encode())
+        if "/ToUnicode" in font:
+            h.update(_stream_bytes(font["/ToUnicode"]))
+        for descendant in font.get("/DescendantFonts") or []:
+            h.update(repr(descendant.get_object().get("/CIDSystemInfo")).encode())
+        return h.digest()
+
+    def _resources_digest(self, resources) -> bytes:
+        h = hashlib.sha256()
+        if resources is None:
+            return h.digest()
+        resources = resources.get_object()
+        fonts = resources.get("/Font")
+        for name, font in sorted((fonts.get_object() if fonts is not None else {}).items()):
+            h.update(name.encode())
+            h.update(self._shared_digest(font, lambda font=font: self._font_digest(font)))
+        xobjects = resources.get("/XObject")
+        for name, xobject in sorted((xobjects.get_object() if xobjects is not None else {}).items()):
+            if xobject.get_object().get("/Subtype") != "/Form":
+                continue  # images carry no text
+            h.update(name.encode())
+            h.update(self._shared_digest(xobject, lambda xobject=xobject: self._form_digest(xobject)))
+        return h.digest()
+
+    def _form_digest(self, xobject) -> bytes:
+        xobject = xobject.get_object()
+        return hashlib.sha256(_stream_bytes(xobject) + self._resources_digest(xobject.get("/Resources"))).digest()
+
+    def page_key(self, page) -> str:
+        h = hashlib.sha256(self.mode.encode())
+        contents = page.get_contents()
+        if contents is not None:
+            h.update(contents.get_data())
+        h.update(repr([float(v) for v in page.mediabox]).encode())
+        h.update(repr(page.get("/Rotate", 0)).encode())
+        h.update(self._resources_digest(page.get("/Resources")))
+        return h.hexdigest()
+
+
+def _extract(page, mode: str) -> str:
+    if mode == "layout":
+        return page.extract_text(extraction_mode="layout") or ""
+    return page.extract_text() or ""
+
+
+def _extract_pages(block_name: str, size: int, indices: list[int], mode: str) -> list[str]:
+    """Process pool task: text of the given pages of the PDF held in shared memory block block_name."""
+    from multiprocessing import shared_memory
+
+    from pypdf import PdfReader
+
+    block = shared_memory.SharedMemory(name=block_name)
+    view = block.buf[:size]
+    stream = open_stream(view)
+    try:
+        reader = PdfReader(stream)
+        return [_extract(reader.pages[i], mode) for i in indices]
+    finally:
+        # The block can only be closed once no view of it is left
+        stream.close()
+        view.release()
+        block.close()
+
+
+class PdfTextExtractor:
+    def __init__(self, mode: str = "plain", workers: int = 0, cache_entries: int = 5000, min_parallel_pages: int = 16):
+        self.mode = mode if mode in PDF_TEXT_MODES else "plain"
+        self.workers = max(0, workers)
+        self.cache_entries = max(0, cache_entries)
+        self.min_parallel_pages = max(1, min_parallel_pages)
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+        self.parallel_runs = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+
+                # spawn: the server process has threads (event loop helpers, job workers) that fork would copy mid-state
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def page_texts(self, source, mode: str | None = None) -> list[str]:
+        """Text of every page of a PDF given as bytes / mmap / path."""
+        from pypdf import PdfReader
+
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                source = f.read()
+        mode = mode if mode in PDF_TEXT_MODES else self.mode
+        reader = PdfReader(open_stream(source))
+        hasher = _PageHasher(mode)
+        keys = [hasher.page_key(page) for page in reader.pages]
+
+        texts: list[str | None] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                text = self._cache.get(key)
+                if text is not None:
+                    self._cache.move_to_end(key)
+                    texts[i] = text
+        missing = [i for i, text in enumerate(texts) if text is None]
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if not missing:
+            return texts
+
+        if self.workers > 1 and len(missing) >= self.min_parallel_pages:
+            from multiprocessing import shared_memory
+
+            size = -(-len(missing) // self.workers)
+            runs = [missing[i : i + size] for i in range(0, len(missing), size)]
+            block = shared_memory.SharedMemory(create=True, size=max(1, len(source)))
+            try:
+                block.buf[: len(source)] = source
+                futures = [self._pool().submit(_extract_pages, block.name, len(source), run, mode) for run in runs]
+                for run, future in zip(runs, futures):
+                    for i, text in zip(run, future.result()):
+                        texts[i] = text
+                with self._lock:
+                    self.parallel_runs += 1
+            except BrokenProcessPool as pool_error:
+                print(f"[PDF] Process pool failed, extracting in this thread: {pool_error}")
+                self.close()  # the next parallel extraction starts a fresh pool
+            finally:
+                block.close()
+                block.unlink()
+        for i in missing:
+            if texts[i] is None:
+                texts[i] = _extract(reader.pages[i], mode)
+
+        if self.cache_entries:
+            with self._lock:
+                for i in missing:
+                    self._cache[keys[i]] = texts[i]
+                    self._cache.move_to_end(keys[i])
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return texts
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "cached_pages": len(self._cache),
+            "page_hits": self.hits,
+            "page_misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "parallel_runs": self.parallel_runs,
+        }
+
+
+def pdf_extractor_from_env() -> PdfTextExtractor:
+    workers = os.getenv("PDF_TEXT_WORKERS")
+    return PdfTextExtractor(
+        mode=os.getenv("PDF_TEXT_MODE", "plain").strip().lower(),
+        workers=int(workers) if workers else min(4, os.cpu_count() or 1),
+        cache_entries=int(os.getenv("PDF_PAGE_CACHE_ENTRIES", "5000")),
+        min_parallel_pages=int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16")),
+    )
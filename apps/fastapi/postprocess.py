@@ -0,0 +1,183 @@
+"""Validation and normalisation of extracted results against the canonical item schema.
+
+normalize_result() runs on every parsed result: items are reduced to the schema's keys, strings
+and quantities get their schema types, and the enum fields (Category/Metal/Tone/StockType/MakeType)
+are mapped to their canonical values - from the field as extracted, otherwise from the item's
+description fields - so the prompt no longer has to spell the enum rules out.
+
+Enum values go through per-field lookup tables (text -> canonical value). Texts not seen before
+are resolved in one vectorised pass of normalize.py's rules over the new distinct values and kept
+for later requests, so even a 10k-item result is mostly dict lookups. pandas is only imported
+when a lookup misses.
+
+A row is flagged in "_unresolved_items" only when something could not be resolved: a
+Category/Metal/Tone value matching no canonical option (kept as extracted), a missing
+VendorStyleCode, or an OrderQty with no number in it.
+"""
+import math
+import re
+
+ITEM_FIELDS = [
+    "VendorStyleCode",
+    "Category",
+    "ItemSize",
+    "OrderQty",
+    "Metal",
+    "Tone",
+    "ItemPoNo",
+    "ItemRefNo",
+    "StockType",
+    "MakeType",
+    "CustomerProductionInstruction",
+    "SpecialRemarks",
+    "DesignProductionInstruction",
+    "StampInstruction",
+]
+NULLABLE_FIELDS = {
+    "ItemSize",
+    "StockType",
+    "MakeType",
+    "CustomerProductionInstruction",
+    "SpecialRemarks",
+    "DesignProductionInstruction",
+    "StampInstruction",
+}
+ENUM_FIELDS = {"Category", "Metal", "Tone", "StockType", "MakeType"}
+ENUM_ORDER = ("Category", "Metal", "Tone", "StockType", "MakeType")
+# Enums every item has: when the field does not resolve they are derived from the description
+# fields, and a value matching nothing is kept as extracted and flagged. The nullable ones
+# (StockType/MakeType) become null when their own value matches nothing, as the prompt rules said.
+REQUIRED_ENUM_FIELDS = ("Category", "Metal", "Tone")
+DESCRIPTION_FIELDS = ("CustomerProductionInstruction", "SpecialRemarks", "DesignProductionInstruction")
+
+LOOKUP_MAX_ENTRIES = 50_000
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Field -> {text: canonical value, "" when no rule matched}
+_lookups: dict[str, dict[str, str]] = {field: {"": ""} for field in ENUM_FIELDS}
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def _resolve(field: str, texts: list[str]) -> list[str]:
+    """Canonical value of field for each text ("" where no rule matched)."""
+    table = _lookups[field]
+    new = {text for text in texts if text not in table}
+    if new:
+        if len(table) + len(new) > LOOKUP_MAX_ENTRIES:
+            table.clear()
+            new = set(texts)
+        new = list(new)
+        table.update(zip(new, _apply_rules(field, new)))
+    return [table[text] for text in texts]
+
+
+def _apply_rules(field: str, texts: list[str]) -> list[str]:
+    import pandas as pd
+
+    from normalize import NORMALIZERS
+
+    resolved = NORMALIZERS[field](pd.Series(texts, dtype=object))
+    return [value if isinstance(value, str) else "" for value in resolved]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not math.isnan(value)
+
+
+def _quantities(values: list) -> tuple[list, list[int]]:
+    """OrderQty values as numbers (missing -> 0), and the indexes whose text holds no number."""
+    quantities = [int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
+    other = [i for i, v in enumerate(values) if not _is_number(v)]
+    if not other:
+        return quantities, []
+    import pandas as pd
+
+    from normalize import to_quantity
+
+    parsed = to_quantity(pd.Series([values[i] for i in other], dtype=object))
+    bad = []
+    for i, quantity in zip(other, parsed):
+        quantities[i] = quantity
+        value = values[i]
+        if isinstance(value, str) and value.strip() and not _NUMBER.search(value.replace(",", "")):
+            bad.append(i)
+    return quantities, bad
+
+
+def normalize_items(items: list) -> tuple[list[dict], list[dict]]:
+    """Items in the canonical schema, and the unresolved rows as [{"index", "fields": {field: value}}]."""
+    rows = [item if isinstance(item, dict) else {} for item in items]
+    columns = {}
+    for field in ITEM_FIELDS:
+        values = [row.get(field) for row in rows]
+        columns[field] = [value.strip() if type(value) is str else _text(value) for value in values]
+    unresolved: dict[int, dict] = {}
+
+    description = None
+    metal = columns["Metal"]
+    for field in ENUM_ORDER:
+        raw = columns[field]
+        values = _resolve(field, raw)
+        if field == "StockType":
+            # Stock words without the metal ("Studded") resolve to the gold variant; add the item's metal
+            values = _resolve(field, [f"{s} {m}" if s != v else s for s, v, m in zip(raw, values, metal)])
+        if field in REQUIRED_ENUM_FIELDS:
+            missing = [i for i, value in enumerate(values) if not value]
+            if missing:
+                # Descriptions are nearly unique per row, so they are not worth a lookup table entry
+                if description is None:
+                    parts = zip(*(columns[f] for f in DESCRIPTION_FIELDS))
+                    description = [" ".join(p for p in row if p) for row in parts]
+                described = [i for i in missing if description[i]]
+                derived = dict(zip(described, _apply_rules(field, [description[i] for i in described]) if described else []))
+                for i in missing:
+                    value = derived.get(i)
+                    if value:
+                        values[i] = value
+                    elif raw[i]:
+                        values[i] = raw[i]
+                        unresolved.setdefault(i, {})[field] = raw[i]
+        columns[field] = values
+
+    columns["OrderQty"], bad_quantities = _quantities([row.get("OrderQty") for row in rows])
+    for i in bad_quantities:
+        unresolved.setdefault(i, {})["OrderQty"] = rows[i]["OrderQty"]
+    for i, style in enumerate(columns["VendorStyleCode"]):
+        if not style:
+            unresolved.setdefault(i, {})["VendorStyleCode"] = ""
+    for field in NULLABLE_FIELDS:
+        columns[field] = [value or None for value in columns[field]]
+
+    normalized = [dict(zip(ITEM_FIELDS, values)) for values in zip(*(columns[f] for f in ITEM_FIELDS))]
+    return normalized, [{"index": i, "fields": unresolved[i]} for i in sorted(unresolved)]
+
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if isinstance(value, float) and math.isnan(value) else value
+    match = _NUMBER.search(str(value).replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def normalize_result(data: dict) -> dict:
+    """Normalise data["items"] and total_value in place; flags unresolved rows in "_unresolved_items"."""
+    items, unresolved = normalize_items(data.get("items") or [])
+    data["items"] = items
+    data["total_value"] = _number(data.get("total_value"))
+    data.pop("_unresolved_items", None)
+    if unresolved:
+        data["_unresolved_items"] = unresolved
+    return data
@@ -0,0 +1,172 @@
+"""Prompt prefix caching: a stable prompt prefix per client, sent so the providers can cache it.
+
+Prompts are assembled in a fixed order: the static rules (PROMPT_BASE), the client's mapping and
+name hint, PREFIX_END, then everything specific to one request (expected item count, file type,
+page window, document text). split_prompt() cuts a prompt at PREFIX_END:
+
+- OpenAI gets the prefix as the system message and the rest as the user message. OpenAI caches
+  prompt prefixes of 1024+ tokens on its own; all that is needed is an identical prefix.
+- Gemini gets the prefix as explicit cached content (GeminiPrefixCache), so repeated requests for
+  a client only send and pay full price for the document.
+
+The full prompt string (prefix, marker and all) is still what is hashed for the result cache,
+logged and passed around; only the provider calls split it.
+"""
+import asyncio
+import datetime
+import hashlib
+import time
+from collections import OrderedDict
+
+from compaction import count_tokens
+
+PREFIX_END = "\n\n=== Purchase order to extract ===\n"
+
+
+def split_prompt(full_prompt: str) -> tuple[str, str]:
+    """(cacheable prefix, request part); the prefix is "" for prompts built without PREFIX_END."""
+    prefix, marker, rest = full_prompt.partition(PREFIX_END)
+    if not marker:
+        return "", full_prompt
+    return prefix, rest.lstrip("\n")
+
+
+def chat_messages(full_prompt: str) -> list[dict]:
+    """Chat Completions messages: the prefix as the system message, so OpenAI can serve it from its prompt cache."""
+    prefix, body = split_prompt(full_prompt)
+    if not prefix:
+        return [{"role": "user", "content": full_prompt}]
+    return [{"role": "system", "content": prefix}, {"role": "user", "content": body}]
+
+
+class _Entry:
+    def __init__(self, cached, model, expires: float):
+        self.cached = cached
+        self.model = model
+        self.expires = expires
+
+
+class GeminiPrefixCache:
+    """Explicit Gemini context caches for prompt prefixes, one per distinct prefix, with a TTL.
+
+    The cache is created by the first request whose prefix has at least min_tokens (Gemini refuses
+    smaller ones) and reused by later requests; a request finding it in the last quarter of its TTL
+    extends it by another TTL. At most max_entries are kept: the least recently used one is deleted
+    to make room, and close() deletes the rest. A prefix the API refused to cache is sent inline
+    for one TTL before it is tried again.
+    """
+
+    def __init__(self, genai, model_name: str, ttl: float = 3600, max_entries: int = 32, min_tokens: int = 1024):
+        self._genai = genai
+        self.model_name = model_name
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.min_tokens = min_tokens
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._refused: dict[str, float] = {}
+        self.hits = 0
+        self.created = 0
+        self.extended = 0
+        self.refused = 0
+
+    def _create(self, key: str, prefix: str) -> _Entry:
+        genai = self._genai()
+        cached = genai.caching.CachedContent.create(
+            model=self.model_name,
+            display_name=f"po-prefix-{key[:16]}",
+            system_instruction=prefix,
+            ttl=datetime.timedelta(seconds=self.ttl),
+        )
+        model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+        return _Entry(cached, model, time.time() + self.ttl)
+
+    def _extend(self, entry: _Entry) -> None:
+        entry.cached.update(ttl=datetime.timedelta(seconds=self.ttl))
+        entry.expires = time.time() + self.ttl
+
+    @staticmethod
+    def _delete(entry: _Entry) -> None:
+        try:
+            entry.cached.delete()
+        except Exception as e:
+            print(f"[FastAPI] Warning: could not delete Gemini cache {entry.cached.name}: {e}")
+
+    def _key(self, prefix: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\n{prefix}".encode("utf-8")).hexdigest()
+
+    def _refuse(self, key: str) -> None:
+        now = time.time()
+        if len(self._refused) >= 1000:
+            self._refused = {k: until for k, until in self._refused.items() if until > now}
+        self._refused[key] = now + self.ttl
+
+    async def model_for(self, prefix: str):
+        """A model answering with prefix as cached system instruction, or None to send it inline."""
+        if not prefix:
+            return None
+        key = self._key(prefix)
+        if self._refused.get(key, 0) > time.time():
+            return None
+        if key not in self._entries and count_tokens(prefix) < self.min_tokens:
+            self._refuse(key)
+            return None
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._entries.get(key)
+            now = time.time()
+            # Leave a margin so the cache does not expire between this check and the call
+            if entry is not None and entry.expires - now > min(60, self.ttl / 10):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if entry.expires - now < self.ttl / 4:
+                    try:
+                        await asyncio.to_thread(self._extend, entry)
+                        self.extended += 1
+                    except Exception as e:
+                        print(f"[FastAPI] Warning: could not extend Gemini cache {entry.cached.name}: {e}")
+                return entry.model
+            if entry is not None:
+                del self._entries[key]
+            try:
+                entry = await asyncio.to_thread(self._create, key, prefix)
+            except Exception as e:
+                self.refused += 1
+                self._refuse(key)
+                self._locks.pop(key, None)
+                print(f"[FastAPI] Gemini prompt prefix not cached, sending it inline: {type(e).__name__}: {e}")
+                return None
+            self.created += 1
+            self._entries[key] = entry
+            print(f"[FastAPI] Gemini prompt prefix cached as {entry.cached.name} for {self.ttl:.0f}s")
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                old_key, old = self._entries.popitem(last=False)
+                self._locks.pop(old_key, None)
+                evicted.append(old)
+        for old in evicted:
+            await asyncio.to_thread(self._delete, old)
+        return entry.model
+
+    def discard(self, prefix: str) -> bool:
+        """Forget the cache for prefix after a call through it failed (e.g. it expired early); the next call recreates it.
+
+        Returns whether there was one to forget.
+        """
+        key = self._key(prefix)
+        self._locks.pop(key, None)
+        return self._entries.pop(key, None) is not None
+
+    def close(self) -> None:
+        """Delete every cache still held (they are billed per hour of storage)."""
+        while self._entries:
+            self._delete(self._entries.popitem()[1])
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "created": self.created,
+            "extended": self.extended,
+            "refused": self.refused,
+        }
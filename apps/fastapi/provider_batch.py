@@ -0,0 +1,90 @@
+"""OpenAI Batch API support for /extract-invoices/batch (mode=provider_batch).
+
+The batch API runs requests asynchronously within 24h at a lower price than synchronous calls.
+Each file becomes one /v1/chat/completions request line whose custom_id is the file's index in
+the upload. The per-file details needed to finish a result (filename, expected_items,
+client_name override) are kept in a local SQLite manifest keyed by the provider's batch id,
+along with the finished results once the batch has been collected.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from prompt_cache import chat_messages
+
+
+def batch_request_line(custom_id: str, full_prompt: str, model: str) -> dict:
+    """One JSONL line for the batch input file; mirrors the synchronous OpenAI call."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": chat_messages(full_prompt),
+            "temperature": 0.1,
+            "response_format": {"type": "json_object"},
+        },
+    }
+
+
+def parse_batch_output(text: str) -> dict[str, tuple[str | None, str | None]]:
+    """Map custom_id -> (response content, error message) from a batch output or error file."""
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        custom_id = record.get("custom_id")
+        response = record.get("response") or {}
+        error = record.get("error")
+        if error:
+            results[custom_id] = (None, error.get("message") or json.dumps(error))
+        elif response.get("status_code", 200) != 200:
+            body = response.get("body") or {}
+            message = (body.get("error") or {}).get("message") or f"HTTP {response.get('status_code')}"
+            results[custom_id] = (None, message)
+        else:
+            choices = (response.get("body") or {}).get("choices") or []
+            content = choices[0]["message"].get("content") if choices else None
+            results[custom_id] = (content, None) if content else (None, "Empty response")
+    return results
+
+
+class ProviderBatchStore:
+    """Manifests for submitted provider batches: per-file inputs, then the collected results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS provider_batches ("
+            " id TEXT PRIMARY KEY, manifest TEXT NOT NULL, results TEXT, created REAL NOT NULL)"
+        )
+
+    def save(self, batch_id: str, manifest: list[dict]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO provider_batches (id, manifest, created) VALUES (?, ?, ?)",
+                (batch_id, json.dumps(manifest), time.time()),
+            )
+
+    def load(self, batch_id: str) -> tuple[list[dict], list[dict] | None] | None:
+        """Return (manifest, results or None if not collected yet), or None for an unknown batch."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT manifest, results FROM provider_batches WHERE id = ?", (batch_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        manifest, results = row
+        return json.loads(manifest), json.loads(results) if results is not None else None
+
+    def set_results(self, batch_id: str, results: list[dict]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE provider_batches SET results = ? WHERE id = ?", (json.dumps(results), batch_id)
+            )
@@ -0,0 +1,258 @@
+"""Routing of extraction calls across LLM providers.
+
+ProviderRouter takes one async call per provider (prompt, attachment) -> text and, for a route
+such as ["openai", "gemini"]:
+
+- retries a provider on 429 / 408 / 5xx / connection errors with exponential backoff
+- fails over to the next provider in the route once a provider's retries are exhausted or it
+  fails with a non-retryable error
+- hedges: if the primary has not answered within its rolling p95 latency, the next provider is
+  started as well and whichever answers first wins (the other call is cancelled; its elapsed
+  time, at least the hedge delay, still counts as a latency sample)
+- keeps rolling latency / error statistics per provider: a provider failing at least half of its
+  recent calls is moved to the back of the route until it has gone `cooldown` seconds without
+  a failure, then gets traffic again (if it fails, it goes back for another cooldown)
+
+Streaming calls get retries and failover up to the first delta; they are never hedged.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+
+@dataclass
+class ProviderCalls:
+    complete: Callable[..., Awaitable[str]]
+    stream: Callable[..., AsyncIterator[str]]
+    model: str
+
+
+class ProviderStats:
+    """Rolling window of recent call outcomes for one provider."""
+
+    def __init__(self, window: int = 200):
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self.last_error_at = 0.0
+
+    def record(self, latency: float | None, ok: bool) -> None:
+        self.calls += 1
+        self._outcomes.append(ok)
+        if ok and latency is not None:
+            self._latencies.append(latency)
+        if not ok:
+            self.errors += 1
+            self.last_error_at = time.monotonic()
+
+    def record_censored(self, latency: float) -> None:
+        """A call cancelled before it answered (e.g. the losing side of a hedge): its latency is at
+        least `latency`. Kept in the latency window so p95 does not drift down to the calls that
+        happened to be fast; it is not an outcome, so the error rate is unaffected."""
+        self._latencies.append(latency)
+
+    def percentile(self, q: float) -> float | None:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes) if self._outcomes else 0.0
+
+    def unhealthy(self, cooldown: float, min_outcomes: int = 10) -> bool:
+        return (
+            len(self._outcomes) >= min_outcomes
+            and self.error_rate >= 0.5
+            and time.monotonic() - self.last_error_at < cooldown
+        )
+
+    def snapshot(self) -> dict:
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 3),
+            "p50_s": round(p50, 3) if p50 is not None else None,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+            "p99_s": round(p99, 3) if p99 is not None else None,
+            "hedges_won": self.hedges_won,
+        }
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, timeouts, server errors and dropped connections; not bad requests or auth errors."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    return any(marker in name for marker in ("Timeout", "Connection", "ServiceUnavailable", "ResourceExhausted"))
+
+
+class ProviderRouter:
+    def __init__(
+        self,
+        providers: dict[str, ProviderCalls],
+        rate_limiter=None,
+        retries: int = 2,
+        retry_backoff: float = 1.0,
+        hedge: bool = True,
+        hedge_min_samples: int = 50,
+        window: int = 200,
+        cooldown: float = 30.0,
+    ):
+        self.providers = providers
+        self.rate_limiter = rate_limiter
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.cooldown = cooldown
+        self.stats_by_provider = {name: ProviderStats(window) for name in providers}
+        self.hedges_started = 0
+        self.failovers = 0
+
+    def order(self, route: list[str]) -> list[str]:
+        """route with unhealthy providers moved to the back (stable otherwise)."""
+        if len(route) < 2:
+            return route
+        return sorted(route, key=lambda name: self.stats_by_provider[name].unhealthy(self.cooldown))
+
+    def hedge_delay(self, provider: str) -> float | None:
+        stats = self.stats_by_provider[provider]
+        if not self.hedge or stats.samples < self.hedge_min_samples:
+            return None
+        return stats.percentile(0.95)
+
+    async def _attempt(self, provider: str, prompt: str, attachment) -> str:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(provider)
+        start = time.perf_counter()
+        try:
+            text = await self.providers[provider].complete(prompt, attachment)
+        except asyncio.CancelledError:
+            self.stats_by_provider[provider].record_censored(
+                max(time.perf_counter() - start, self.hedge_delay(provider) or 0.0)
+            )
+            raise
+        except Exception:
+            self.stats_by_provider[provider].record(None, ok=False)
+            raise
+        self.stats_by_provider[provider].record(time.perf_counter() - start, ok=True)
+        return text
+
+    async def _with_retries(self, provider: str, prompt: str, attachment) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(provider, prompt, attachment)
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    raise
+                delay = self.retry_backoff * 2**attempt * (0.5 + random.random())
+                print(f"[Router] {provider} failed ({type(e).__name__}: {e}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def complete(self, route: list[str], prompt: str, attachment=None) -> tuple[str, str]:
+        """Run the call along route; returns (text, provider that answered)."""
+        route = self.order(route)
+        errors: list[str] = []
+        index = 0
+        while index < len(route):
+            provider = route[index]
+            backup = route[index + 1] if index + 1 < len(route) else None
+            owners = {asyncio.create_task(self._with_retries(provider, prompt, attachment)): provider}
+            delay = self.hedge_delay(provider) if backup is not None else None
+            try:
+                done, pending = await asyncio.wait(owners, timeout=delay)
+                if pending:
+                    # Primary is slower than its p95: race it against the backup
+                    self.hedges_started += 1
+                    print(f"[Router] {provider} exceeded p95 ({delay:.1f}s), hedging with {backup}")
+                    owners[asyncio.create_task(self._with_retries(backup, prompt, attachment))] = backup
+                    pending = set(owners)
+                while done or pending:
+                    for task in done:
+                        if task.exception() is None:
+                            if owners[task] != provider:
+                                self.stats_by_provider[owners[task]].hedges_won += 1
+                            return task.result(), owners[task]
+                        errors.append(f"{owners[task]}: {type(task.exception()).__name__}: {task.exception()}")
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in owners:
+                    if not task.done():
+                        task.cancel()
+            index += len(owners)
+            if index < len(route):
+                self.failovers += 1
+                print(f"[Router] {provider} failed, failing over to {route[index]}")
+        raise RuntimeError("All providers failed: " + "; ".join(errors))
+
+    async def stream(
+        self, route: list[str], prompt: str, attachment=None, on_start: Callable[[str], None] | None = None
+    ) -> AsyncIterator[str]:
+        """Stream deltas from the first provider on route that starts answering.
+
+        on_start(provider) is called once, before the first delta, with the provider that answers.
+        """
+        route = self.order(route)
+        errors: list[str] = []
+        for provider in route:
+            for attempt in range(self.retries + 1):
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire(provider)
+                start = time.perf_counter()
+                started = False
+                try:
+                    async for delta in self.providers[provider].stream(prompt, attachment):
+                        if not started and on_start is not None:
+                            on_start(provider)
+                        started = True
+                        yield delta
+                except Exception as e:
+                    self.stats_by_provider[provider].record(None, ok=False)
+                    if started:
+                        raise
+                    if attempt < self.retries and is_retryable(e):
+                        delay = self.retry_backoff * 2**attempt * (0.5 + random.random())
+                        print(f"[Router] {provider} stream failed ({type(e).__name__}), retry in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                    errors.append(f"{provider}: {type(e).__name__}: {e}")
+                    break
+                else:
+                    self.stats_by_provider[provider].record(time.perf_counter() - start, ok=True)
+                    return
+            if provider != route[-1]:
+                self.failovers += 1
+        raise RuntimeError("All providers failed: " + "; ".join(errors))
+
+    def stats(self) -> dict:
+        return {
+            "hedge": self.hedge,
+            "hedges_started": self.hedges_started,
+            "failovers": self.failovers,
+            "providers": {
+                name: {
+                    "model": calls.model,
+                    "healthy": not self.stats_by_provider[name].unhealthy(self.cooldown),
+                    **self.stats_by_provider[name].snapshot(),
+                }
+                for name, calls in self.providers.items()
+            },
+        }
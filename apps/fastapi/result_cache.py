@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(file_bytes: bytes, prompt: str, provider: str, model: str) -> str:
+    """Content-addressed key: same file + same prompt inputs + same model -> same result."""
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(file_bytes).digest())
+    for part in (prompt, provider, model):
+        h.update(b"\0")
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Base class for extraction result caches. Subclasses implement _get/_set."""
+
+    backend = "none"
+
+    def __init__(self, max_entries: int, ttl_seconds: float | None):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict | None:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        self._set(key, value)
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def _get(self, key: str) -> dict | None:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: dict) -> None:
+        raise NotImplementedError
+
+
+class MemoryResultCache(ResultCache):
+    """Per-process LRU cache with optional TTL."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float | None = None):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, payload = entry
+            if self._expired(created):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Stored serialised so callers can mutate the returned dict freely
+        return json.loads(payload)
+
+    def _set(self, key: str, value: dict) -> None:
+        payload = json.dumps(value)
+        with self._lock:
+            self._entries[key] = (time.time(), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResultCache(ResultCache):
+    """On-disk LRU cache with optional TTL, survives restarts and is shareable between workers."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl_seconds: float | None = None):
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extraction_cache_accessed ON extraction_cache(accessed)")
+
+    def _get(self, key: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created = row
+            if self._expired(created):
+                self._conn.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE extraction_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(payload)
+
+    def _set(self, key: str, value: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM extraction_cache WHERE key IN ("
+                " SELECT key FROM extraction_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            if self.ttl_seconds is not None:
+                self._conn.execute("DELETE FROM extraction_cache WHERE created < ?", (now - self.ttl_seconds,))
+
+
+def cache_from_env() -> ResultCache | None:
+    """EXTRACTION_CACHE=memory | sqlite | off; the default is sqlite when worker processes share state
+    (see concurrency.shared_state_path), so every worker sees the same cache, and memory otherwise."""
+    from concurrency import shared_state_path
+
+    default = "sqlite" if shared_state_path() else "memory"
+    backend = os.getenv("EXTRACTION_CACHE", default).strip().lower()
+    ttl = float(os.getenv("EXTRACTION_CACHE_TTL", "86400"))
+    if backend in ("off", "none", "0", "false"):
+        return None
+    if backend == "sqlite":
+        return SQLiteResultCache(
+            os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3"),
+            max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000")),
+            ttl_seconds=ttl,
+        )
+    return MemoryResultCache(
+        max_entries=int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=ttl,
+    )
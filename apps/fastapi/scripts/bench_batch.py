@@ -0,0 +1,133 @@
+"""30-file batch vs 30 sequential /extract-invoice calls, with a stubbed provider.
+
+Sequential mirrors what the backend does today (one upload per file, one at a time); the batch
+sends every file in one multipart request to /extract-invoices/batch, where they run
+concurrently under the shared extraction limit. Each file gets its own expected_items through
+the options field. The provider call is an asyncio.sleep of STUB_LATENCY seconds; run with
+STUB_LATENCY=0 to compare pure per-request overhead.
+
+Also round-trips mode=provider_batch against a fake OpenAI batch client to check the
+submit -> poll -> collect path end to end.
+
+Usage (from apps/fastapi):
+    python scripts/bench_batch.py [FILES] [STUB_LATENCY]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+os.environ.setdefault("EXTRACTION_MAX_QUEUE", "64")
+os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_batch_"), "jobs.sqlite3"))
+
+import httpx
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+STUB_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+import main  # noqa: E402
+from scripts.fixtures import stub_response_for, synthetic_po_pdf, synthetic_po_workbook  # noqa: E402
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+async def _stub_openai(full_prompt: str) -> str:
+    await asyncio.sleep(STUB_LATENCY)
+    return stub_response_for(full_prompt)
+
+
+class _FakeBatches:
+    """Just enough of openai_client.files / .batches for one provider batch."""
+
+    def __init__(self):
+        self.input = b""
+
+    async def create_file(self, file, purpose):
+        self.input = file[1]
+        return SimpleNamespace(id="file-in")
+
+    async def create_batch(self, **kwargs):
+        return SimpleNamespace(id="batch-1", status="validating")
+
+    async def retrieve(self, batch_id):
+        return SimpleNamespace(
+            id=batch_id, status="completed", output_file_id="file-out", error_file_id=None,
+            request_counts=None,
+        )
+
+    async def content(self, file_id):
+        lines = []
+        for line in self.input.decode().splitlines():
+            request = json.loads(line)
+            body = {"choices": [{"message": {"content": stub_response_for(request["body"]["messages"][0]["content"])}}]}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body}}))
+        return SimpleNamespace(text="\n".join(lines))
+
+
+def _documents(n: int) -> list[tuple[str, bytes, str, int]]:
+    docs = []
+    for i in range(n):
+        items = 20 + i
+        if i % 2:
+            docs.append((f"po-{i}.xlsx", synthetic_po_workbook(items), XLSX, items))
+        else:
+            docs.append((f"po-{i}.pdf", synthetic_po_pdf(items), "application/pdf", items))
+    return docs
+
+
+async def run() -> None:
+    main._run_extraction_openai = _stub_openai
+    docs = _documents(FILES)
+    options = json.dumps([{"expected_items": items} for _, _, _, items in docs])
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        sequential_items = 0
+        for name, payload, mime, items in docs:
+            resp = await client.post(
+                "/extract-invoice", files={"file": (name, payload, mime)}, data={"expected_items": str(items)}
+            )
+            sequential_items += resp.json()["total_entries"]
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resp = await client.post(
+            "/extract-invoices/batch",
+            files=[("files", (name, payload, mime)) for name, payload, mime, _ in docs],
+            data={"options": options},
+        )
+        batch = time.perf_counter() - start
+        body = resp.json()
+        batch_items = sum(r["data"]["total_entries"] for r in body["results"] if r["status"] == "ok")
+
+        fake = _FakeBatches()
+        openai_client = main._openai_client()
+        openai_client.files.create = fake.create_file
+        openai_client.files.content = fake.content
+        openai_client.batches.create = fake.create_batch
+        openai_client.batches.retrieve = fake.retrieve
+        submitted = (await client.post(
+            "/extract-invoices/batch",
+            files=[("files", (name, payload, mime)) for name, payload, mime, _ in docs],
+            data={"options": options, "mode": "provider_batch"},
+        )).json()
+        collected = (await client.get(submitted["status_url"])).json()
+
+    print(f"{FILES} files (PDF + Excel), stub latency {STUB_LATENCY:.2f}s, "
+          f"concurrency limit {main.extraction_limiter.max_concurrency}")
+    print(f"sequential /extract-invoice: {sequential:7.2f}s  ({sequential_items} items)")
+    print(f"/extract-invoices/batch:     {batch:7.2f}s  ({batch_items} items, "
+          f"{body['succeeded']}/{body['total_files']} ok)  speed-up {sequential / batch:.1f}x")
+    print(f"provider_batch round trip:   submitted {submitted['submitted']}, "
+          f"collected {collected['succeeded']}/{collected['total_files']} ok")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
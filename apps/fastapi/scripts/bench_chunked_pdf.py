@@ -0,0 +1,55 @@
+"""Compare single-call and chunked extraction of a large PDF with a stubbed provider.
+
+The stub's latency grows with the number of items it returns, like real generation
+time, so chunked wall-clock time should drop roughly with the chunk fan-out.
+
+Usage (from apps/fastapi):
+    python scripts/bench_chunked_pdf.py [PAGES] [ITEMS_PER_PAGE]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+
+import httpx
+
+import main  # noqa: E402
+from scripts.fixtures import stub_provider, synthetic_po_pdf  # noqa: E402
+
+PAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+ITEMS_PER_PAGE = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+async def _extract(client: httpx.AsyncClient, payload: bytes, chunked: bool) -> tuple[float, dict]:
+    start = time.perf_counter()
+    resp = await client.post(
+        "/extract-invoice",
+        files={"file": ("po.pdf", payload, "application/pdf")},
+        data={"chunked": str(chunked).lower(), "expected_items": str(PAGES * ITEMS_PER_PAGE)},
+    )
+    resp.raise_for_status()
+    return time.perf_counter() - start, resp.json()
+
+
+async def run() -> None:
+    main._run_extraction_openai = stub_provider()
+    payload = synthetic_po_pdf(PAGES * ITEMS_PER_PAGE, ITEMS_PER_PAGE)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        single, single_data = await _extract(client, payload, chunked=False)
+        chunked, chunked_data = await _extract(client, payload, chunked=True)
+
+    chunks = -(-PAGES // main.PDF_CHUNK_PAGES)
+    print(f"{PAGES} pages, {PAGES * ITEMS_PER_PAGE} items, {chunks} chunks of {main.PDF_CHUNK_PAGES} pages, fan-out {main.PDF_CHUNK_FANOUT}")
+    print(f"single call: {single:.2f}s  ({single_data['total_entries']} items)")
+    print(f"chunked:     {chunked:.2f}s  ({chunked_data['total_entries']} items, mismatch: {chunked_data.get('_item_count_mismatch')})")
+    print(f"speedup: {single / chunked:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+"""Load test for /extract-invoice with a stubbed provider.
+
+Fires N concurrent Excel uploads through the ASGI app while the provider call is
+replaced by an asyncio.sleep of STUB_LATENCY seconds. With the async pipeline the
+batch should finish in roughly the time of a single request.
+
+Usage (from apps/fastapi):
+    python scripts/bench_concurrency.py [N] [STUB_LATENCY]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+
+import httpx
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+STUB_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+os.environ.setdefault("EXTRACTION_CONCURRENCY", str(N))
+
+import main  # noqa: E402
+from scripts.fixtures import synthetic_po_workbook  # noqa: E402
+
+
+async def _stub_openai(full_prompt: str) -> str:
+    await asyncio.sleep(STUB_LATENCY)
+    return json.dumps({"client_name": "Stub", "invoice_number": "PO-1", "items": [{"VendorStyleCode": "A1"}]})
+
+
+async def _upload(client: httpx.AsyncClient, payload: bytes) -> int:
+    files = {"file": ("po.xlsx", payload, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    resp = await client.post("/extract-invoice", files=files)
+    return resp.status_code
+
+
+async def run() -> None:
+    main._run_extraction_openai = _stub_openai
+    payload = synthetic_po_workbook(50)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await _upload(client, payload)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(_upload(client, payload) for _ in range(N)))
+        batch = time.perf_counter() - start
+
+    print(f"stub latency: {STUB_LATENCY:.2f}s, concurrency limit: {main.extraction_limiter.max_concurrency}")
+    print(f"1 upload:  {single:.2f}s")
+    print(f"{N} uploads: {batch:.2f}s  (statuses: {sorted(set(statuses))})")
+    print(f"ratio: {batch / single:.2f}x the time of one request")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
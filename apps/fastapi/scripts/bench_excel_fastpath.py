@@ -0,0 +1,85 @@
+"""Compare the whole-workbook LLM path with the Excel fast path on a synthetic order sheet.
+
+The stubbed provider's latency grows with the number of items it generates, so the LLM path
+pays for every row while the fast path resolves rows locally and makes no provider call
+when the client mapping covers every field.
+
+It runs twice: with the fixture mapping (every field resolved by rules) and with the seeded UNEEK
+mapping from apps/backend/src/seed/clients.ts, whose free-form instructions ("Description apart
+from stone quality", "Description summary") send every row to the LLM in 200-row batches, at most
+EXCEL_ASSIST_FANOUT calls at a time.
+
+Usage (from apps/fastapi):
+    python scripts/bench_excel_fastpath.py [ROWS]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+
+import httpx
+
+import main  # noqa: E402
+from scripts.fixtures import EXCEL_MAPPING, seeded_mapping, stub_provider  # noqa: E402
+from scripts.fixtures import synthetic_po_workbook, uneek_po_workbook  # noqa: E402
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+
+async def _extract(
+    client: httpx.AsyncClient, payload: bytes, client_name: str, mapping_text: str, fast_path: bool
+) -> tuple[float, dict, dict]:
+    main.EXCEL_FASTPATH = fast_path
+    calls = {"count": 0, "prompt_chars": 0, "running": 0, "max_running": 0}
+    provider = stub_provider(base_latency=0.5, per_item_latency=0.001)
+
+    async def counting_provider(full_prompt: str) -> str:
+        calls["count"] += 1
+        calls["prompt_chars"] += len(full_prompt)
+        calls["running"] += 1
+        calls["max_running"] = max(calls["max_running"], calls["running"])
+        try:
+            return await provider(full_prompt)
+        finally:
+            calls["running"] -= 1
+
+    main._run_extraction_openai = counting_provider
+    start = time.perf_counter()
+    resp = await client.post(
+        "/extract-invoice",
+        files={"file": ("po.xlsx", payload, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
+        data={"client_name": client_name, "mapping_text": mapping_text},
+    )
+    resp.raise_for_status()
+    return time.perf_counter() - start, resp.json(), calls
+
+
+async def _compare(client: httpx.AsyncClient, label: str, payload: bytes, client_name: str, mapping_text: str) -> None:
+    llm_time, llm_data, llm_calls = await _extract(client, payload, client_name, mapping_text, fast_path=False)
+    fast_time, fast_data, fast_calls = await _extract(client, payload, client_name, mapping_text, fast_path=True)
+
+    print(f"\n{label}: {ROWS} rows, {len(payload) / 1024:.0f} KB workbook")
+    for name, elapsed, data, calls in (("LLM path", llm_time, llm_data, llm_calls), ("fast path", fast_time, fast_data, fast_calls)):
+        print(
+            f"{name + ':':10} {elapsed:6.2f}s  {data['total_entries']} items  {calls['count']} call(s) "
+            f"(at most {calls['max_running']} at once), {calls['prompt_chars']:,} prompt chars"
+        )
+    print(f"speedup: {llm_time / fast_time:.1f}x")
+    print(f"sample item: {fast_data['items'][0]}")
+
+
+async def run() -> None:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await _compare(client, "fixture mapping", synthetic_po_workbook(ROWS, with_header=True), "ACME JEWELLERS LTD", EXCEL_MAPPING)
+        await _compare(client, "seeded UNEEK mapping", uneek_po_workbook(ROWS), "UNEEK", seeded_mapping("UNEEK"))
+    print(f"\nEXCEL_ASSIST_FANOUT={main.EXCEL_ASSIST_FANOUT}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
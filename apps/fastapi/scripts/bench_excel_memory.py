@@ -0,0 +1,157 @@
+"""Peak RSS and time of turning a large workbook into prompt text, before and after the streaming reader.
+
+before: pd.ExcelFile + pd.read_excel per sheet (a DataFrame of the whole sheet), then
+        - raw text (PROMPT_COMPACTION=0): df.to_csv() per sheet appended to a string with +=
+        - compacted text: the DataFrame's cells turned into lists of strings
+after:  excel_reader.iter_sheets() - rows streamed by openpyxl read-only / xlrd on demand,
+        stopping at trailing empty regions - into a csv writer (raw) or the compaction rules
+
+"mapped" is the Excel fast path (plan_excel_extraction with the fixture client mapping), before
+and after it reads sheets through excel_reader; "unmapped" is the same with the seeded UNEEK
+mapping, which matches no header row, so the plan is None and the request falls back to the LLM.
+
+The workbook is generated by scripts/fixtures.large_po_workbook: several sheets of item rows, each
+followed by formatted but empty rows. Each (text, mode) runs in a fresh subprocess with pandas and
+openpyxl already imported (the server's warm-up does that). Peak RSS (VmHWM, reset just before
+the conversion) is reported relative to the RSS at that point. It also checks that both modes
+produce the same text (or plan).
+
+Usage (from apps/fastapi):
+    python scripts/bench_excel_memory.py [rows_per_sheet] [sheets]
+"""
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MB = 1024 * 1024
+
+
+def _proc_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak() -> None:
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def legacy_raw_text(source) -> str:
+    import pandas as pd
+
+    excel_content = ""
+    excel_file = pd.ExcelFile(source)
+    for sheet_name in excel_file.sheet_names:
+        df = pd.read_excel(excel_file, sheet_name=sheet_name)
+        excel_content += f"\n\n=== Sheet: {sheet_name} ===\n"
+        excel_content += df.to_csv(index=False, na_rep="")
+    return excel_content
+
+
+def _pandas_sheets(source):
+    """(name, rows) per sheet the way the code read workbooks before: pd.read_excel of the whole sheet."""
+    import pandas as pd
+
+    excel_file = pd.ExcelFile(source)
+    for name in excel_file.sheet_names:
+        raw = pd.read_excel(excel_file, sheet_name=name, header=None)
+        yield name, raw.itertuples(index=False, name=None)
+
+
+def _with_pandas_sheets(convert):
+    """convert(source) with excel_reader.iter_sheets swapped for _pandas_sheets (the rules are unchanged)."""
+    import excel_reader
+
+    def run(source):
+        streaming, excel_reader.iter_sheets = excel_reader.iter_sheets, lambda source, *_: _pandas_sheets(source)
+        try:
+            return convert(source)
+        finally:
+            excel_reader.iter_sheets = streaming
+
+    return run
+
+
+def _plan_text(mapping_text: str):
+    from excel_fastpath import plan_excel_extraction
+
+    def convert(source) -> str:
+        plan = plan_excel_extraction(source, mapping_text)
+        return "None" if plan is None else json.dumps(plan.header) + plan.items.to_csv() + json.dumps(plan.rows_text)
+
+    return convert
+
+
+def child(path: str, text: str, mode: str) -> None:
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+
+    import compaction
+    import excel_reader
+    from scripts.fixtures import EXCEL_MAPPING, seeded_mapping
+
+    with open(path, "rb") as f:
+        data = f.read()
+    after = {
+        "raw": excel_reader.excel_csv_text,
+        "compact": compaction.compact_excel_text,
+        "mapped": _plan_text(EXCEL_MAPPING),
+        "unmapped": _plan_text(seeded_mapping("UNEEK")),
+    }[text]
+    if mode == "after":
+        convert = after
+    else:
+        convert = legacy_raw_text if text == "raw" else _with_pandas_sheets(after)
+
+    rss_before = _proc_kb("VmRSS")
+    _reset_peak()
+    start = time.perf_counter()
+    result = convert(io.BytesIO(data))
+    elapsed = time.perf_counter() - start
+    peak = _proc_kb("VmHWM") - rss_before
+    print(f"{elapsed:.3f} {peak} {len(result)} {hashlib.sha256(result.encode()).hexdigest()}")
+
+
+def run() -> None:
+    from scripts.fixtures import large_po_workbook
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sheets = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_excel_"), "po-large.xlsx")
+    start = time.perf_counter()
+    large_po_workbook(path, rows, sheets)
+    size = os.path.getsize(path) / MB
+    print(f"workbook: {sheets} sheets x {rows} item rows + 20000 blank formatted rows, {size:.1f} MB "
+          f"(generated in {time.perf_counter() - start:.0f}s)")
+    print(f"{'text':<8} {'mode':<7} {'time s':>8} {'peak RSS +MB':>13} {'text MB':>8}")
+    try:
+        for text in ("raw", "compact", "mapped", "unmapped"):
+            outputs = {}
+            for mode in ("before", "after"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", path, text, mode], capture_output=True, text=True, check=True
+                ).stdout.strip().splitlines()[-1]
+                elapsed, peak_kb, chars, digest = out.split()
+                outputs[mode] = digest
+                print(f"{text:<8} {mode:<7} {float(elapsed):>8.2f} {int(peak_kb) / 1024:>13.1f} {int(chars) / MB:>8.1f}")
+            if text != "raw":
+                print(f"{text} output identical: {outputs['before'] == outputs['after']}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        run()
@@ -0,0 +1,101 @@
+"""Throughput of the job API vs worker count, plus a restart mid-run.
+
+Submits N Excel jobs through POST /jobs with the provider replaced by an asyncio.sleep of
+STUB_LATENCY seconds, then polls GET /jobs/{id} until every job has finished. Run once per
+worker count: drain time should fall roughly linearly with JOBS_WORKERS while each POST
+returns immediately. The restart run stops the worker pool halfway through (the running jobs
+are handed back to the queue), starts a fresh pool on the same database and checks nothing is
+lost and no job used more than one attempt.
+
+Usage (from apps/fastapi):
+    python scripts/bench_jobs.py [N] [STUB_LATENCY]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+
+import httpx
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+STUB_LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+import main  # noqa: E402
+from jobs import JobStore, JobWorkerPool  # noqa: E402
+from scripts.fixtures import synthetic_po_workbook  # noqa: E402
+
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+async def _stub_openai(full_prompt: str) -> str:
+    await asyncio.sleep(STUB_LATENCY)
+    return json.dumps({"client_name": "Stub", "invoice_number": "PO-1", "items": [{"VendorStyleCode": "A1"}]})
+
+
+def _use_store(path: str, workers: int, lease_seconds: float = 60) -> None:
+    main.job_store = JobStore(path, lease_seconds=lease_seconds)
+    main.job_pool = JobWorkerPool(main.job_store, main._run_job, workers=workers, poll_interval=0.05)
+    main.job_pool.start()
+
+
+async def _submit(client: httpx.AsyncClient, payload: bytes, n: int) -> tuple[list[str], float]:
+    start = time.perf_counter()
+    job_ids = []
+    for i in range(n):
+        resp = await client.post("/jobs", files={"file": (f"po-{i}.xlsx", payload, XLSX)})
+        job_ids.append(resp.json()["job_id"])
+    return job_ids, (time.perf_counter() - start) / n
+
+
+async def _wait(client: httpx.AsyncClient, job_ids: list[str]) -> dict[str, int]:
+    while True:
+        jobs = [(await client.get(f"/jobs/{job_id}")).json() for job_id in job_ids]
+        statuses: dict[str, int] = {}
+        for job in jobs:
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        if statuses.get("queued", 0) + statuses.get("running", 0) == 0:
+            return statuses
+        await asyncio.sleep(0.05)
+
+
+async def run() -> None:
+    main._run_extraction_openai = _stub_openai
+    payload = synthetic_po_workbook(50)
+    transport = httpx.ASGITransport(app=main.app)
+    tmpdir = tempfile.mkdtemp(prefix="bench_jobs_")
+
+    print(f"{N} jobs, stub latency {STUB_LATENCY:.2f}s")
+    print(f"{'workers':>8} {'submit ms/job':>14} {'drain s':>8} {'jobs/s':>7}  statuses")
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for workers in (1, 2, 4, 8):
+            _use_store(os.path.join(tmpdir, f"jobs-{workers}.sqlite3"), workers)
+            start = time.perf_counter()
+            job_ids, submit = await _submit(client, payload, N)
+            statuses = await _wait(client, job_ids)
+            drain = time.perf_counter() - start
+            await main.job_pool.stop()
+            print(f"{workers:>8} {submit * 1000:>14.1f} {drain:>8.2f} {N / drain:>7.1f}  {statuses}")
+
+        # Restart: stop the pool while jobs are running, then resume from the same database
+        path = os.path.join(tmpdir, "jobs-restart.sqlite3")
+        _use_store(path, 4, lease_seconds=1)
+        job_ids, _ = await _submit(client, payload, N)
+        await asyncio.sleep(STUB_LATENCY * 1.5)
+        await main.job_pool.stop()
+        before = main.job_store.stats()
+        _use_store(path, 4, lease_seconds=1)
+        statuses = await _wait(client, job_ids)
+        await main.job_pool.stop()
+        attempts = max(main.job_store.get(job_id)["attempts"] for job_id in job_ids)
+        print(f"restart: stopped with {before}, after resume {statuses}, max attempts per job {attempts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,227 @@
+"""Benchmark the single-pass tolerant parser against the previous regex repair cascade.
+
+Runs every case of scripts/json_corpus.py through both parsers and reports success, items
+recovered and time per parse.
+
+Usage (from apps/fastapi):
+    python scripts/bench_json_repair.py [ITEMS]
+"""
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_repair import loads_tolerant  # noqa: E402
+from scripts.json_corpus import build_corpus  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+def _log(message: str) -> None:
+    pass
+
+
+def legacy_parse(raw: str) -> dict:
+    """The repair pipeline extract_invoice used before json_repair.py, kept verbatim for comparison."""
+    # Parse JSON with resilience to markdown/code fences and common formatting issues
+    def strip_fences(text: str) -> str:
+        cleaned = text.strip()
+        cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned, flags=re.IGNORECASE | re.MULTILINE)
+        cleaned = re.sub(r"\s*```$", "", cleaned, flags=re.MULTILINE)
+        return cleaned
+
+    def extract_balanced_json(text: str) -> str:
+        # Find first '{' and parse until matching brace depth returns to 0
+        start = text.find("{")
+        if start == -1:
+            return text
+        depth = 0
+        for idx in range(start, len(text)):
+            ch = text[idx]
+            if ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start : idx + 1]
+        return text[start:]
+
+    def remove_trailing_commas(text: str) -> str:
+        # Remove trailing commas before } or ]
+        return re.sub(r",(\s*[}\]])", r"\1", text)
+
+    def fix_missing_commas_in_json(text: str) -> str:
+        """Fix missing commas in JSON structure, especially in arrays and objects"""
+        # Fix missing commas between array/object elements
+        # Pattern: }" or ]" or }" or number" or true" or false" or null" followed by new value
+        result = text
+        # Fix: } followed by " (missing comma between objects)
+        result = re.sub(r'}\s+"', r'}, "', result)
+        # Fix: ] followed by " (missing comma between array elements)
+        result = re.sub(r']\s+"', r'], "', result)
+        # Fix: " followed by { (missing comma between string and object)
+        result = re.sub(r'"\s+{', r'", {', result)
+        # Fix: " followed by [ (missing comma between string and array)
+        result = re.sub(r'"\s+\[', r'", [', result)
+        # Fix: number followed by " (missing comma between number and string)
+        result = re.sub(r'(\d)\s+"', r'\1, "', result)
+        # Fix: " followed by number (missing comma between string and number)
+        result = re.sub(r'"\s+(\d)', r'", \1', result)
+        # Fix: true/false/null followed by " (missing comma)
+        result = re.sub(r'(true|false|null)\s+"', r'\1, "', result)
+        # Fix: " followed by true/false/null (missing comma)
+        result = re.sub(r'"\s+(true|false|null)', r'", \1', result)
+        # Fix: } followed by { (missing comma between objects)
+        result = re.sub(r'}\s+{', r'}, {', result)
+        # Fix: ] followed by [ (missing comma between arrays)
+        result = re.sub(r']\s+\[', r'], [', result)
+        return result
+
+    def clean_control_chars(text: str) -> str:
+        return "".join(ch for ch in text if ord(ch) >= 32 or ch in "\r\n\t")
+
+    def quote_unquoted_keys(text: str) -> str:
+        # Add quotes around object keys that are unquoted (best-effort)
+        pattern = r'([{\[,]\s*)([A-Za-z0-9_]+)\s*:'
+        return re.sub(pattern, r'\1"\2":', text)
+
+    def close_unterminated_strings(text: str) -> str:
+        # Best-effort fix for unterminated strings by closing them at line breaks or end of text
+        out = []
+        in_str = False
+        escape = False
+        for ch in text:
+            if ch == "\n" and in_str:
+                out.append('"')  # close before newline
+                in_str = False
+            out.append(ch)
+            if escape:
+                escape = False
+                continue
+            if ch == "\\":
+                escape = True
+                continue
+            if ch == '"':
+                in_str = not in_str
+        if in_str:
+            out.append('"')
+        return "".join(out)
+
+
+    def extract_json(text: str) -> str:
+        cleaned = strip_fences(text)
+        cleaned = clean_control_chars(cleaned)
+        cleaned = close_unterminated_strings(cleaned)
+        cleaned = quote_unquoted_keys(cleaned)
+        cleaned = fix_missing_commas_in_json(cleaned)
+        balanced = extract_balanced_json(cleaned)
+        balanced = remove_trailing_commas(balanced)
+        return balanced.strip()
+
+    json_text = extract_json(raw)
+
+    try:
+        data = json.loads(json_text)
+    except json.JSONDecodeError as json_error:
+        # Enhanced fallback: try multiple repair strategies
+        _log(f"[FastAPI] First JSON parse attempt failed: {json_error}")
+        _log(f"[FastAPI] Error at position: {json_error.pos if hasattr(json_error, 'pos') else 'unknown'}")
+
+        def fix_at_error_position(text: str, error_pos: int) -> str:
+            """Try to fix JSON at the specific error position"""
+            if error_pos >= len(text):
+                return text
+            # Look backwards from error position to find where to insert comma
+            last_bracket = text.rfind('[', 0, error_pos)
+            if last_bracket != -1:
+                # Find the last comma or opening bracket before error
+                last_comma = text.rfind(',', last_bracket, error_pos)
+                last_quote = text.rfind('"', last_bracket, error_pos)
+                if last_quote > last_comma and error_pos < len(text) and text[error_pos] in ['"', '{', '[']:
+                    # Insert comma before the next element
+                    return text[:error_pos] + ',' + text[error_pos:]
+            return text
+
+        fallback_strategies = [
+            # Strategy 1: Apply missing comma fixes again
+            lambda t: fix_missing_commas_in_json(t),
+            # Strategy 2: Remove double commas and fix trailing commas
+            lambda t: re.sub(r",\s*,", ",", remove_trailing_commas(t)),
+            # Strategy 3: Fix common issues in arrays and objects
+            lambda t: re.sub(r'(\])\s*(\[)', r'\1,\2', t),  # Missing comma between arrays
+            lambda t: re.sub(r'(\})\s*(\{)', r'\1,\2', t),  # Missing comma between objects
+            # Strategy 4: Try to fix at the specific error location if available
+            lambda t: fix_at_error_position(t, json_error.pos) if hasattr(json_error, 'pos') else t,
+        ]
+
+        for i, strategy in enumerate(fallback_strategies):
+            try:
+                fallback = strategy(json_text)
+                if fallback != json_text:  # Only try if strategy made changes
+                    data = json.loads(fallback)
+                    json_text = fallback
+                    _log(f"[FastAPI] JSON parsing succeeded with strategy {i+1}")
+                    break
+            except Exception as e:
+                if i == len(fallback_strategies) - 1:  # Last strategy failed
+                    _log(f"[FastAPI] All JSON repair strategies failed")
+                    _log(f"[FastAPI] JSON parsing error: {json_error}")
+                    _log(f"[FastAPI] Error position: {json_error.pos if hasattr(json_error, 'pos') else 'unknown'}")
+                    # Print context around error
+                    if hasattr(json_error, 'pos') and json_error.pos < len(json_text):
+                        start = max(0, json_error.pos - 100)
+                        end = min(len(json_text), json_error.pos + 100)
+                        _log(f"[FastAPI] Context around error: {json_text[start:end]}")
+                    _log(f"[FastAPI] Raw response length: {len(raw)} chars")
+                    raise ValueError(f"Failed to parse JSON response: {str(json_error)}")
+                continue
+        else:
+            # If no strategy worked, raise the original error
+            _log(f"[FastAPI] JSON parsing error: {json_error}")
+            _log(f"[FastAPI] Raw response (first 500 chars): {raw[:500]}")
+            raise ValueError(f"Failed to parse JSON response: {str(json_error)}")
+    return data
+
+
+def _time(fn, raw: str, repeat: int) -> tuple[float, object]:
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        try:
+            result = fn(raw)
+        except Exception as e:  # noqa: BLE001
+            result = e
+    return (time.perf_counter() - start) / repeat, result
+
+
+def _items(result) -> str:
+    if isinstance(result, Exception):
+        return "FAIL"
+    if isinstance(result, tuple):
+        result = result[0]
+    return str(len(result.get("items", [])))
+
+
+def run() -> None:
+    repeat = 5
+    print(f"{'case':32} {'legacy ms':>10} {'items':>6}   {'tolerant ms':>11} {'items':>6}  repairs")
+    totals = [0.0, 0.0]
+    for name, raw, expected in build_corpus(ITEMS):
+        legacy_time, legacy_result = _time(legacy_parse, raw, repeat)
+        new_time, new_result = _time(loads_tolerant, raw, repeat)
+        totals[0] += legacy_time
+        totals[1] += new_time
+        repairs = ", ".join(new_result[1]) if isinstance(new_result, tuple) else f"{type(new_result).__name__}: {new_result}"
+        print(
+            f"{name:32} {legacy_time * 1000:10.2f} {_items(legacy_result):>6}   "
+            f"{new_time * 1000:11.2f} {_items(new_result):>6}  {repairs}"
+        )
+    print(f"{'total':32} {totals[0] * 1000:10.2f} {'':>6}   {totals[1] * 1000:11.2f}")
+    print(f"({ITEMS} items per case, expected item count per case shown in scripts/json_corpus.py)")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,88 @@
+"""Cost of the timing spans and metrics on the request path, and what they report.
+
+1. Micro-benchmark: span() enter/exit (inside a request context) and Histogram.observe().
+2. End to end: N Excel extractions through /extract-invoice with a zero-latency stub provider,
+   reporting the mean request time, the spans recorded per request and their share of it, one
+   Server-Timing header, and the size / render time of /metrics afterwards.
+
+Usage (from apps/fastapi):
+    python scripts/bench_metrics.py [requests]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+os.environ.setdefault("JOBS_WORKERS", "0")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+from scripts.fixtures import stub_provider, synthetic_po_workbook  # noqa: E402
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+def micro() -> tuple[float, float]:
+    n = 200_000
+    token = metrics._timings.set({})
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.span("bench"):
+            pass
+    span_cost = (time.perf_counter() - start) / n
+    metrics._timings.reset(token)
+    metrics.stage_seconds._series.pop(("bench",), None)
+
+    histogram = metrics.Histogram("bench_seconds", "bench", ("stage",))
+    start = time.perf_counter()
+    for i in range(n):
+        histogram.observe(i * 1e-6, "bench")
+    return span_cost, (time.perf_counter() - start) / n
+
+
+async def end_to_end(span_cost: float) -> None:
+    main._run_extraction_openai = stub_provider(base_latency=0.0, per_item_latency=0.0)
+    main._log_prompt_size = lambda prompt: None
+    data = synthetic_po_workbook(50)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        files = {"file": ("po.xlsx", data)}
+        await client.post("/extract-invoice", files=files)  # warm-up
+        spans_before = sum(series[2] for series in metrics.stage_seconds._series.values())
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            response = await client.post("/extract-invoice", files=files)
+            response.raise_for_status()
+        elapsed = (time.perf_counter() - start) / REQUESTS
+        spans = (sum(series[2] for series in metrics.stage_seconds._series.values()) - spans_before) / REQUESTS
+
+        response = await client.post("/extract-invoice", files=files, headers={"X-Server-Timing": "1"})
+        header = response.headers.get("server-timing")
+
+        start = time.perf_counter()
+        body = (await client.get("/metrics")).text
+        scrape = time.perf_counter() - start
+
+    print(f"\n{REQUESTS} Excel extractions (50 rows, zero-latency stub provider)")
+    print(f"  mean request time:      {elapsed * 1000:8.2f} ms")
+    print(f"  spans per request:      {spans:8.1f}  (~{spans * span_cost * 1e6:.1f} us, "
+          f"{spans * span_cost / elapsed:.3%} of the request)")
+    print(f"  Server-Timing:          {header}")
+    print(f"  /metrics:               {len(body.splitlines())} lines, {scrape * 1000:.1f} ms to scrape")
+
+
+def run() -> None:
+    span_cost, observe_cost = micro()
+    print(f"span() enter/exit:        {span_cost * 1e6:8.2f} us")
+    print(f"Histogram.observe():      {observe_cost * 1e6:8.2f} us")
+    asyncio.run(end_to_end(span_cost))
+
+
+if __name__ == "__main__":
+    run()
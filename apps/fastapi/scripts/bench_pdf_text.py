@@ -0,0 +1,78 @@
+"""PDF page text extraction: the previous serial function vs PdfTextExtractor.
+
+On a cell-by-cell table PO (the layout of spreadsheet PDF exports) this reports pages/sec for:
+    - the previous _pdf_page_texts (PdfReader + extract_text() page by page)
+    - PdfTextExtractor in the calling thread and across the process pool, plain and layout mode,
+      with the page cache off
+    - re-processing the same PO with one item's quantity changed: pages re-extracted and time
+and one compacted item row per mode (layout mode keeps the columns as tabs).
+
+The pool cannot beat the serial path with fewer CPUs than workers; the CPU count is printed.
+
+Usage (from apps/fastapi):
+    python scripts/bench_pdf_text.py [items] [workers]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compaction import compact_pdf_pages  # noqa: E402
+from documents import open_stream  # noqa: E402
+from pdf_text import PdfTextExtractor  # noqa: E402
+from scripts.fixtures import table_po_pdf  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+
+def previous_page_texts(data: bytes) -> list[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(open_stream(data))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def timed(fn, data: bytes) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    texts = fn(data)
+    return time.perf_counter() - start, texts
+
+
+def run() -> None:
+    data = table_po_pdf(ITEMS)
+    pages = len(previous_page_texts(data))
+    print(f"{ITEMS} items, {pages} pages, {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPUs, pool of {WORKERS}\n")
+
+    elapsed, _ = timed(previous_page_texts, data)
+    print(f"{'previous function':<28} {elapsed:7.2f}s  {pages / elapsed:7.1f} pages/s")
+    for mode in ("plain", "layout"):
+        for workers in (0, WORKERS):
+            extractor = PdfTextExtractor(mode, workers=workers, cache_entries=0, min_parallel_pages=1)
+            if workers:
+                timed(extractor.page_texts, table_po_pdf(workers))  # start the worker processes
+            elapsed, _ = timed(extractor.page_texts, data)
+            label = f"{mode}, {'pool' if workers else 'serial'}"
+            print(f"{label:<28} {elapsed:7.2f}s  {pages / elapsed:7.1f} pages/s")
+            extractor.close()
+
+    print("\nRe-processing with one changed item (plain, serial):")
+    extractor = PdfTextExtractor("plain", workers=0)
+    first, _ = timed(extractor.page_texts, data)
+    misses = extractor.misses
+    again, texts = timed(extractor.page_texts, table_po_pdf(ITEMS, changed_item=ITEMS // 2))
+    print(f"  first pass:    {first:6.2f}s, {misses} pages extracted")
+    print(f"  changed PO:    {again:6.3f}s, {extractor.misses - misses} page(s) extracted, {extractor.hits} from cache")
+    fresh = previous_page_texts(table_po_pdf(ITEMS, changed_item=ITEMS // 2))
+    print(f"  same text as a fresh extraction: {texts == fresh}")
+
+    print("\nFirst item row after compaction:")
+    for mode in ("plain", "layout"):
+        page = PdfTextExtractor(mode, workers=0).page_texts(table_po_pdf(1))
+        row = compact_pdf_pages(page, columns=mode == "layout")[0].splitlines()[3]
+        print(f"  {mode:<7} {row!r}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,93 @@
+"""Item post-processing (postprocess.py): time to normalise a large result and what it saves in the prompt.
+
+Builds N items the way the shortened prompt asks the model to return them (enum text copied as
+written: "14k", "Yellow/White", "earrings", quantities as "2 pcs" now and then), with a few rows
+that cannot be resolved, and reports:
+    - normalize_items() time on the first call (rules applied to every distinct value) and once
+      the lookup tables are filled, and per item for one-item calls (the streaming endpoint)
+    - rows flagged unresolved vs rows made unresolvable
+    - prompt size of PROMPT_BASE with the full enum rules vs the short ones
+
+Usage (from apps/fastapi):
+    python scripts/bench_postprocess.py [items]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import postprocess  # noqa: E402
+from compaction import count_tokens  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+CATEGORIES = ["ring", "RINGS", "Pendant", "earrings", "Ear Ring", "bracelet", "Necklace", "bangle", "Band"]
+METALS = ["14k", "14KT", "18K", "10kt", "9KT", "Platinum", "PT950", "Silver", "925", "SV925"]
+TONES = ["Yellow", "white", "Rose", "Y/W", "YW", "Rose White", "R/Y", "W"]
+STOCK = ["Studded", "Plain", "Studded Gold", "Semi Mount", None, None]
+MAKE = ["CNC", "Hollow", "2 PC Cast", "1pc", None, None, None]
+UNRESOLVABLE_EVERY = 500
+
+
+def model_items(n: int) -> list[dict]:
+    items = []
+    for i in range(n):
+        metal, tone, category = METALS[i % len(METALS)], TONES[i % len(TONES)], CATEGORIES[i % len(CATEGORIES)]
+        item = {
+            "VendorStyleCode": f"CJ-{1000 + i}",
+            "Category": category,
+            "ItemSize": 5 + i % 6 if i % 3 else None,
+            "OrderQty": f"{1 + i % 3} pcs" if i % 10 == 0 else 1 + i % 3,
+            "Metal": metal,
+            "Tone": tone,
+            "ItemPoNo": "PO-2026-001",
+            "ItemRefNo": f"REF-{i}",
+            "StockType": STOCK[i % len(STOCK)],
+            "MakeType": MAKE[i % len(MAKE)],
+            "CustomerProductionInstruction": f"{metal} {tone} diamond {category} size {5 + i % 6} #{i}",
+            "SpecialRemarks": None,
+            "DesignProductionInstruction": None,
+            "StampInstruction": "14K",
+        }
+        if i % UNRESOLVABLE_EVERY == 0:
+            item["Metal"] = "Gold"
+            item["CustomerProductionInstruction"] = "see sketch"
+        items.append(item)
+    return items
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run() -> None:
+    items = model_items(ITEMS)
+    import pandas  # noqa: F401  (imported at startup by the server's warm-up; keep it out of the timing)
+
+    cold, (normalized, unresolved) = timed(postprocess.normalize_items, items)
+    warm = min(timed(postprocess.normalize_items, items)[0] for _ in range(5))
+    single = min(timed(postprocess.normalize_items, [item])[0] for item in items[:200])
+
+    print(f"{ITEMS} items")
+    print(f"  first call (rules on every distinct value): {cold * 1000:7.1f} ms")
+    print(f"  lookup tables filled:                       {warm * 1000:7.1f} ms  ({warm / ITEMS * 1e6:.1f} us/item)")
+    print(f"  one item at a time (streaming):             {single * 1e6:7.1f} us/item")
+    print(f"  unresolved rows: {len(unresolved)} (made unresolvable: {len(range(0, ITEMS, UNRESOLVABLE_EVERY))}), "
+          f"e.g. {unresolved[0] if unresolved else None}")
+    print(f"  sample: {normalized[1]}")
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    import main
+
+    full = main.PROMPT_BASE.replace(main.ENUM_RULES_SHORT.strip(), main.ENUM_RULES_FULL.strip())
+    short = main.PROMPT_BASE if main.ITEM_NORMALIZATION else full.replace(
+        main.ENUM_RULES_FULL.strip(), main.ENUM_RULES_SHORT.strip()
+    )
+    print(f"\nPROMPT_BASE with the full enum rules: {len(full):5d} chars, {count_tokens(full):4d} tokens")
+    print(f"PROMPT_BASE with the short enum rules: {len(short):5d} chars, {count_tokens(short):4d} tokens")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,144 @@
+"""Prompt prefix caching: how much of each prompt a provider can serve from its cache, before and after.
+
+before: the previous build_prompt - rules, client hint, the request's expected item count, then
+        the client mapping, all in one user message
+after:  build_prompt() now - rules, client mapping and hint, PREFIX_END, then the expected item
+        count and the document (system message + user message for OpenAI, cached content for Gemini)
+
+A sequence of POs from one client (same mapping, different documents and expected_items) is
+assembled both ways. Offline, it reports per request the prompt tokens and the tokens a cache can
+serve. For OpenAI that is the prefix shared with an earlier request, counted the way OpenAI does
+(nothing below 1024 tokens, then in 128-token steps). For Gemini it is the cached prefix when the
+prefix reaches GEMINI_CACHE_MIN_TOKENS. Tokens are tiktoken's (chars/4 without it) and ignore
+message framing.
+
+With --live and an API key, every prompt is streamed from the provider both ways. The report then
+shows the cached tokens the provider reported, the cached share and the time to first token.
+
+Usage (from apps/fastapi):
+    python scripts/bench_prompt_cache.py [--requests 8] [--live openai|gemini]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("JOBS_WORKERS", "0")
+os.environ.setdefault("WARM_IMPORTS", "0")
+
+import main  # noqa: E402
+from compaction import _encoding  # noqa: E402
+from prompt_cache import split_prompt  # noqa: E402
+from scripts.fixtures import EXCEL_MAPPING, synthetic_po_pdf  # noqa: E402
+
+CLIENT = "ACME JEWELLERS LTD"
+
+
+def legacy_build_prompt(client_name_hint, mapping_text, expected_items) -> str:
+    prompt_parts = [main.PROMPT_BASE.strip()]
+    if client_name_hint:
+        prompt_parts.append(f"Client name hint: {client_name_hint}. Use this as client_name if it matches the PO header.")
+    if expected_items is not None:
+        prompt_parts.append(
+            f"CRITICAL: This PO contains exactly {expected_items} items. "
+            f'Your "items" array MUST have exactly {expected_items} entries. '
+            f'Set "total_entries" to {expected_items}. Count carefully and match this number exactly.'
+        )
+    if mapping_text:
+        prompt_parts.append(
+            "Client mapping (apply these rules to populate the canonical fields above):\n" f"{mapping_text.strip()}"
+        )
+    prompt_parts.append("Respond with JSON only, no markdown or explanations.")
+    return "\n\n".join(prompt_parts)
+
+
+def _tokens(text: str) -> list:
+    encoding = _encoding(main.OPENAI_MODEL)
+    return encoding.encode(text, disallowed_special=()) if encoding is not None else list(text[::4])
+
+
+def _openai_cacheable(tokens: list, earlier: list[list]) -> int:
+    shared = 0
+    for other in earlier:
+        n = 0
+        for a, b in zip(tokens, other):
+            if a != b:
+                break
+            n += 1
+        shared = max(shared, n)
+    return 0 if shared < 1024 else 1024 + (shared - 1024) // 128 * 128
+
+
+async def _prompts(n: int, build) -> list[str]:
+    prompts = []
+    for i in range(n):
+        items = 20 + 15 * i
+        prompt = build(CLIENT, EXCEL_MAPPING, items)
+        full_prompt, _ = await main._prepare_document(synthetic_po_pdf(items), ".pdf", prompt, "po.pdf", "openai")
+        prompts.append(full_prompt)
+    return prompts
+
+
+def _offline(label: str, prompts: list[str]) -> None:
+    min_tokens = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "1024"))
+    print(f"\n{label}")
+    print(f"{'request':>7} {'prompt tok':>10} {'openai cached':>14} {'gemini cached':>14}")
+    seen, totals = [], [0, 0, 0]
+    for i, prompt in enumerate(prompts):
+        tokens = _tokens(prompt)
+        openai = _openai_cacheable(tokens, seen) if seen else 0
+        prefix, _ = split_prompt(prompt)
+        prefix_tokens = len(_tokens(prefix)) if prefix else 0
+        gemini = prefix_tokens if i and prefix_tokens >= min_tokens else 0
+        seen.append(tokens)
+        totals = [totals[0] + len(tokens), totals[1] + openai, totals[2] + gemini]
+        print(f"{i + 1:>7} {len(tokens):>10} {openai:>7} ({openai / len(tokens):>4.0%}) {gemini:>7} ({gemini / len(tokens):>4.0%})")
+    print(f"{'all':>7} {totals[0]:>10} {totals[1]:>7} ({totals[1] / totals[0]:>4.0%}) {totals[2]:>7} ({totals[2] / totals[0]:>4.0%})")
+
+
+async def _live(provider: str, label: str, prompts: list[str]) -> None:
+    stream = main._stream_extraction_openai if provider == "openai" else main._stream_extraction_gemini
+    print(f"\n{label}, live {provider}")
+    print(f"{'request':>7} {'prompt tok':>10} {'cached':>14} {'first token':>12} {'total':>8}")
+    for i, prompt in enumerate(prompts):
+        before = dict(main.provider_tokens._values)
+        start = time.perf_counter()
+        first = None
+        args = (prompt,) if provider == "openai" else (prompt, None)
+        async for _ in stream(*args):
+            first = first or time.perf_counter() - start
+        total = time.perf_counter() - start
+        used = {kind: main.provider_tokens._values.get((provider, kind), 0) - before.get((provider, kind), 0)
+                for kind in ("prompt", "cached")}
+        ratio = used["cached"] / used["prompt"] if used["prompt"] else 0
+        print(f"{i + 1:>7} {used['prompt']:>10.0f} {used['cached']:>7.0f} ({ratio:>4.0%}) {first or 0:>11.2f}s {total:>7.2f}s")
+
+
+async def run() -> None:
+    parser = argparse.ArgumentParser(description="Prompt prefix caching, before and after")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--live", choices=("openai", "gemini"), default=None)
+    args = parser.parse_args()
+
+    before = await _prompts(args.requests, legacy_build_prompt)
+    after = await _prompts(args.requests, main.build_prompt)
+    _offline("before: one user message, expected_items ahead of the mapping", before)
+    _offline("after: rules + mapping prefix, then the request", after)
+
+    if args.live:
+        if not main.PROVIDER_KEYS[args.live] or main.PROVIDER_KEYS[args.live] == "stub":
+            print(f"\n--live {args.live}: no API key configured")
+            return
+        await _live(args.live, "before", before)
+        await _live(args.live, "after", after)
+        if main.gemini_prefix_cache is not None:
+            print(f"\nGemini prefix cache: {main.gemini_prefix_cache.stats()}")
+            await asyncio.to_thread(main.gemini_prefix_cache.close)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
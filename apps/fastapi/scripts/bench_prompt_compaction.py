@@ -0,0 +1,90 @@
+"""Prompt tokens and extracted items with and without document compaction.
+
+Builds the single-call prompt for a corpus of sample POs (clean and layout-heavy PDFs, clean and
+messy multi-sheet workbooks) with PROMPT_COMPACTION off and on, and reports prompt tokens, the
+time spent reading + compacting, and whether the extracted items are identical. Offline the
+"model" is the stub from fixtures.py, which reads items straight out of the document text.
+
+With --live and a real OPENAI_API_KEY the prompts go to the OpenAI API instead, and the report
+adds the measured call latency and compares the items the model returns.
+
+Usage (from apps/fastapi):
+    python scripts/bench_prompt_compaction.py [--live]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LIVE = "--live" in sys.argv
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+if not LIVE:
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("JOBS_WORKERS", "0")
+
+import main  # noqa: E402
+from compaction import count_tokens, tokenizer_name  # noqa: E402
+from scripts.fixtures import (  # noqa: E402
+    layout_po_pdf,
+    messy_po_workbook,
+    stub_response_for,
+    synthetic_po_pdf,
+    synthetic_po_workbook,
+)
+
+CORPUS = [
+    ("clean PDF, 120 items", ".pdf", lambda: synthetic_po_pdf(120)),
+    ("layout PDF, 120 items", ".pdf", lambda: layout_po_pdf(120)),
+    ("layout PDF, 400 items", ".pdf", lambda: layout_po_pdf(400)),
+    ("clean sheet, 200 rows", ".xlsx", lambda: synthetic_po_workbook(200, with_header=True)),
+    ("messy 2 sheets, 200 rows", ".xlsx", lambda: messy_po_workbook(200, sheets=2)),
+    ("messy 4 sheets, 800 rows", ".xlsx", lambda: messy_po_workbook(800, sheets=4)),
+]
+
+
+async def _measure(data: bytes, suffix: str, compact: bool) -> dict:
+    main.PROMPT_COMPACTION = compact
+    prompt = main.build_prompt(None, None, None)
+    start = time.perf_counter()
+    full_prompt, _ = await main._prepare_document(data, suffix, prompt)
+    prep = time.perf_counter() - start
+
+    start = time.perf_counter()
+    raw = await main._run_extraction_openai(full_prompt) if LIVE else stub_response_for(full_prompt)
+    call = time.perf_counter() - start
+    items = main.parse_model_json(raw).get("items", [])
+    return {
+        "tokens": count_tokens(full_prompt, main.EXTRACTION_MODEL),
+        "prep": prep,
+        "call": call,
+        "items": [(i.get("VendorStyleCode"), i.get("OrderQty")) for i in items],
+    }
+
+
+async def run() -> None:
+    header = f"{'document':<26} {'tokens off':>10} {'tokens on':>10} {'saved':>6} {'prep ms off/on':>15}"
+    if LIVE:
+        header += f" {'call s off/on':>14}"
+    print(header + "  items")
+    total_off = total_on = 0
+    for label, suffix, build in CORPUS:
+        data = build()
+        off = await _measure(data, suffix, False)
+        on = await _measure(data, suffix, True)
+        total_off += off["tokens"]
+        total_on += on["tokens"]
+        line = (
+            f"{label:<26} {off['tokens']:>10,} {on['tokens']:>10,} {1 - on['tokens'] / off['tokens']:>6.0%}"
+            f" {off['prep'] * 1000:>7.0f}/{on['prep'] * 1000:<7.0f}"
+        )
+        if LIVE:
+            line += f" {off['call']:>6.1f}/{on['call']:<7.1f}"
+        same = "identical" if off["items"] == on["items"] else f"DIFFER ({len(off['items'])} vs {len(on['items'])})"
+        print(f"{line}  {len(on['items'])} {same}")
+    print(f"{'total':<26} {total_off:>10,} {total_on:>10,} {1 - total_on / total_off:>6.0%}")
+    print(f"(token counts: {tokenizer_name(main.EXTRACTION_MODEL)}; the fixed prompt rules are included in both)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
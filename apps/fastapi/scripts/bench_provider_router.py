@@ -0,0 +1,119 @@
+"""Extraction call latency and success rate through the provider router, with stub providers.
+
+Both providers answer in ~0.2s but 3% of calls (independently per provider) hit a slow tail of
+~1.6s. Scenarios:
+    tail:    single provider (EXTRACTION_FALLBACK=0 behaviour) vs two providers, hedging off / on
+    429s:    the primary rejects 20% of calls with 429 - no retries vs retry-with-backoff
+    outage:  the primary fails every call - failover to the backup provider
+calls/req counts provider calls started per request, including retries and cancelled hedges.
+Calls go through main._run_extraction (routing, retries, hedging, rate limiter) with 20 in flight.
+
+Usage (from apps/fastapi):
+    python scripts/bench_provider_router.py
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("JOBS_WORKERS", "0")
+
+import main  # noqa: E402
+from provider_router import ProviderCalls, ProviderRouter  # noqa: E402
+
+CALLS = 400
+WARMUP = 200
+IN_FLIGHT = 20
+attempts = 0
+
+
+class StubStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def stub(rng: random.Random, tail: float = 0.03, error_rate: float = 0.0, status: int = 429):
+    async def call(prompt: str, attachment) -> str:
+        global attempts
+        attempts += 1
+        if rng.random() < error_rate:
+            await asyncio.sleep(0.02)
+            raise StubStatusError(status)
+        latency = 0.2 * rng.lognormvariate(0, 0.2) * (8 if rng.random() < tail else 1)
+        await asyncio.sleep(latency)
+        return '{"items": []}'
+
+    async def stream(prompt: str, attachment):
+        yield await call(prompt, attachment)
+
+    return call, stream
+
+
+def install(providers: dict, retries: int = 2, hedge: bool = False) -> None:
+    main.provider_router = ProviderRouter(
+        {name: ProviderCalls(call, stream, model=name) for name, (call, stream) in providers.items()},
+        retries=retries,
+        retry_backoff=0.05,
+        hedge=hedge,
+    )
+
+
+async def measure() -> dict:
+    gate = asyncio.Semaphore(IN_FLIGHT)
+    latencies = []
+
+    async def one(record: bool) -> None:
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await main._run_extraction("prompt")
+            except Exception:
+                return
+            if record:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(False) for _ in range(WARMUP)))
+    before = attempts
+    await asyncio.gather(*(one(True) for _ in range(CALLS)))
+    calls = attempts - before
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {"p50": q[49], "p95": q[94], "p99": q[98], "ok": len(latencies), "calls": calls}
+
+
+def report(label: str, result: dict) -> None:
+    print(
+        f"{label:<34} {result['p50']:>6.2f} {result['p95']:>6.2f} {result['p99']:>6.2f}"
+        f" {result['ok'] / CALLS:>8.1%} {result['calls'] / CALLS:>10.2f}"
+    )
+
+
+async def run() -> None:
+    main._log_prompt_size = lambda prompt: None
+    main.EXTRACTION_PROVIDER = "openai"
+    print(f"{CALLS} calls, {IN_FLIGHT} in flight")
+    print(f"{'scenario':<34} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'success':>8} {'calls/req':>10}")
+
+    install({"openai": stub(random.Random(1))})
+    report("tail: one provider", await measure())
+    install({"openai": stub(random.Random(1)), "gemini": stub(random.Random(2))})
+    report("tail: two providers, no hedge", await measure())
+    install({"openai": stub(random.Random(1)), "gemini": stub(random.Random(2))}, hedge=True)
+    report("tail: two providers, hedge at p95", await measure())
+
+    install({"openai": stub(random.Random(3), error_rate=0.2)}, retries=0)
+    report("429s: no retries", await measure())
+    install({"openai": stub(random.Random(3), error_rate=0.2)}, retries=2)
+    report("429s: 2 retries with backoff", await measure())
+
+    install({"openai": stub(random.Random(4), error_rate=1.0, status=503), "gemini": stub(random.Random(5))})
+    report("outage: primary 503, failover", await measure())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,161 @@
+"""Cold-start cost of the service: import time of main and time until /health answers.
+
+For the working tree (and, with --baseline REF, the apps/fastapi tree of that git ref, extracted
+to a temp dir) this reports:
+    - `python -X importtime -c "import main"`: total, and the heaviest packages it pulled in
+    - wall time of `import main` (best of 3)
+    - time from spawning uvicorn to the first 200 from /health, and the slowest /health
+      response over the next 2s (while the background warm-up runs)
+    - whether /health answers with no provider API key set
+
+--provider gemini measures with EXTRACTION_PROVIDER=gemini (google.generativeai is the heaviest SDK).
+
+Usage (from apps/fastapi):
+    python scripts/bench_startup.py [--baseline REF] [--provider openai|gemini]
+"""
+import os
+import re
+import socket
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = ["fastapi", "pandas", "numpy", "openai", "google.generativeai", "pypdf", "openpyxl", "tiktoken"]
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+PROVIDER = sys.argv[sys.argv.index("--provider") + 1] if "--provider" in sys.argv else "openai"
+
+
+def _env(tmp: str, **overrides) -> dict:
+    env = {**os.environ, "EXTRACTION_PROVIDER": PROVIDER, "EXTRACTION_CACHE": "off"}
+    env.update({"OPENAI_API_KEY" if PROVIDER == "openai" else "GOOGLE_API_KEY": "stub"})
+    env.update(JOBS_DB_PATH=os.path.join(tmp, "jobs.sqlite3"))
+    env.update(overrides)
+    return {k: v for k, v in env.items() if v is not None}
+
+
+def import_profile(app_dir: str, env: dict) -> tuple[float, dict[str, float]]:
+    """Cumulative import time of main and of each package in PACKAGES that it imported, in seconds."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=app_dir, env=env, capture_output=True, text=True
+    )
+    total, packages = 0.0, {}
+    for line in out.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if not m:
+            continue
+        cumulative, name = int(m.group(2)) / 1e6, m.group(4)
+        if name == "main":
+            total = cumulative
+        elif name in PACKAGES and name not in packages:
+            packages[name] = cumulative
+    return total, packages
+
+
+def import_wall_time(app_dir: str, env: dict) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=app_dir, env=env, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 5.0) -> int:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status
+
+
+def time_to_health(app_dir: str, env: dict) -> tuple[float | None, float | None]:
+    """Seconds from spawning uvicorn to the first /health 200, and the slowest /health in the 2s after."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = None
+        while time.perf_counter() - start < 30:
+            if server.poll() is not None:
+                return None, None
+            try:
+                if _get(url, timeout=1) == 200:
+                    ready = time.perf_counter() - start
+                    break
+            except OSError:
+                time.sleep(0.01)
+        if ready is None:
+            return None, None
+        slowest = 0.0
+        until = time.perf_counter() + 2
+        while time.perf_counter() < until:
+            t = time.perf_counter()
+            _get(url)
+            slowest = max(slowest, time.perf_counter() - t)
+            time.sleep(0.02)
+        return ready, slowest
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def measure(label: str, app_dir: str) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp)
+        total, packages = import_profile(app_dir, env)
+        wall = import_wall_time(app_dir, env)
+        ready, slowest = time_to_health(app_dir, env)
+        no_key_ready, _ = time_to_health(app_dir, _env(tmp, OPENAI_API_KEY=None, GOOGLE_API_KEY=None))
+
+    print(f"\n== {label} ==")
+    print(f"import main (-X importtime): {total:.3f}s")
+    for name, seconds in sorted(packages.items(), key=lambda item: -item[1]):
+        print(f"  {name:<22} {seconds:.3f}s")
+    print(f"import main (wall, best of 3): {wall:.3f}s")
+    if ready is None:
+        print("first /health: server did not start")
+    else:
+        print(f"first /health 200 after spawn: {ready:.3f}s, slowest /health over the next 2s: {slowest * 1000:.0f}ms")
+    print(f"/health with no API key: {'200' if no_key_ready is not None else 'server did not start'}")
+
+
+def extract_ref(ref: str, dest: str) -> str:
+    """Extract apps/fastapi as of git ref into dest; returns the extracted app directory."""
+    prefix = subprocess.run(
+        ["git", "rev-parse", "--show-prefix"], cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    root = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    archive = os.path.join(dest, "tree.tar")
+    subprocess.run(["git", "archive", "-o", archive, ref, prefix], cwd=root, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(dest)
+    app_dir = os.path.join(dest, prefix)
+    # Same footing as the working tree: byte-code compiled before anything is timed
+    subprocess.run([sys.executable, "-m", "compileall", "-q", app_dir], check=True)
+    return app_dir
+
+
+def run() -> None:
+    if "--baseline" in sys.argv:
+        ref = sys.argv[sys.argv.index("--baseline") + 1]
+        with tempfile.TemporaryDirectory() as tmp:
+            measure(f"baseline ({ref})", extract_ref(ref, tmp))
+    subprocess.run([sys.executable, "-m", "compileall", "-q", APP_DIR], check=True)
+    measure("working tree", APP_DIR)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,71 @@
+"""Time-to-first-item for /extract-invoice/stream versus the buffered /extract-invoice.
+
+Both endpoints use a stubbed provider paced at a fixed time per generated item. The app is
+served by an in-process uvicorn server because httpx's ASGI transport buffers whole responses.
+
+Usage (from apps/fastapi):
+    python scripts/bench_streaming.py [ITEMS]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("EXTRACTION_CACHE", "off")
+
+import httpx
+import uvicorn
+
+import main  # noqa: E402
+from scripts.fixtures import stub_provider, stub_stream_provider, synthetic_po_pdf  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+PER_ITEM = 0.02
+
+
+async def run() -> None:
+    main._run_extraction_openai = stub_provider(base_latency=0.3, per_item_latency=PER_ITEM)
+    main._stream_extraction_openai = stub_stream_provider(per_item_latency=PER_ITEM, first_token_latency=0.3)
+    payload = synthetic_po_pdf(ITEMS)
+    files = {"file": ("po.pdf", payload, "application/pdf")}
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=8765, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    async with httpx.AsyncClient(base_url="http://127.0.0.1:8765", timeout=None) as client:
+        start = time.perf_counter()
+        resp = await client.post("/extract-invoice", files=files, data={"chunked": "false"})
+        buffered = time.perf_counter() - start
+        buffered_items = resp.json()["total_entries"]
+
+        start = time.perf_counter()
+        first_item = None
+        streamed = 0
+        summary = None
+        async with client.stream("POST", "/extract-invoice/stream", files=files) as stream:
+            async for line in stream.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["event"] == "item":
+                    streamed += 1
+                    if first_item is None:
+                        first_item = time.perf_counter() - start
+                elif event["event"] == "summary":
+                    summary = event
+        total = time.perf_counter() - start
+    server.should_exit = True
+    await serving
+
+    print(f"{ITEMS} items, stub pace {PER_ITEM * 1000:.0f} ms/item")
+    print(f"buffered /extract-invoice:   first item after {buffered:.2f}s ({buffered_items} items)")
+    print(f"/extract-invoice/stream:     first item after {first_item:.2f}s, done after {total:.2f}s ({streamed} items)")
+    print(f"summary: total_entries={summary['data']['total_entries']}, items_streamed={summary['items_streamed']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
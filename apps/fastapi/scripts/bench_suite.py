@@ -0,0 +1,249 @@
+"""Offline benchmark / regression gate: /extract-invoice end to end against the replay provider.
+
+Every scenario (document kind x item count) runs in its own process, so peak memory is per
+scenario and no cache carries over. Requests go through the ASGI app in-process (httpx
+ASGITransport) with the providers replaced by scripts/replay_provider.py, and outbound network
+connections raise, so a run costs no API calls and cannot reach one by accident (with tiktoken
+installed, its encoding file must already be cached).
+
+Per scenario it reports throughput (requests/s and items/s), p50/p95/p99 request latency, peak
+RSS, the share of requests returning every item, and mean time per request in each stage
+(extraction_stage_seconds; stages that run concurrently, like chunked PDF provider calls, are
+summed, so they can exceed the request latency). Kinds: pdf, excel (whole workbook to the LLM),
+excel-mapped (with a client mapping, i.e. the Excel fast path).
+
+--save writes the results as JSON; --baseline compares against such a file and exits with status 1
+when a scenario's throughput or completeness falls, or its p95 or peak RSS grows, by more than
+--max-regression (default 0.25).
+
+Usage (from apps/fastapi):
+    python scripts/bench_suite.py [--sizes 1,10,100,1000,5000] [--kinds pdf,excel] [--requests 20]
+        [--concurrency 4] [--latency 0.2] [--per-item-latency 0.001] [--malformed-rate 0.05]
+        [--recordings DIR] [--save results.json] [--baseline results.json] [--max-regression 0.25]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# Per scenario, requests are capped so that large documents do not run for minutes
+ITEM_BUDGET = 20_000
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Offline /extract-invoice benchmark")
+    parser.add_argument("--sizes", default="1,10,100,1000,5000")
+    parser.add_argument("--kinds", default="pdf,excel")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="provider base latency (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.001)
+    parser.add_argument("--jitter", type=float, default=0.2, help="sigma of the log-normal latency factor")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--recordings", default=None, help="directory of recorded responses to replay")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--scenario", nargs=2, metavar=("KIND", "ITEMS"), help=argparse.SUPPRESS)
+    return parser
+
+
+def _forbid_network() -> None:
+    def refuse(*args, **kwargs):
+        raise RuntimeError("outbound network access during the offline benchmark")
+
+    original_connect = socket.socket.connect
+
+    def connect(sock, address):
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            refuse()
+        return original_connect(sock, address)
+
+    socket.socket.connect = connect
+    socket.create_connection = refuse
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+async def _scenario(args, kind: str, n_items: int) -> dict:
+    import httpx
+
+    import main
+    import metrics
+    from scripts.fixtures import EXCEL_MAPPING, synthetic_po_pdf, synthetic_po_workbook
+    from scripts.replay_provider import ReplayProvider
+
+    provider = ReplayProvider(
+        args.recordings, args.latency, args.per_item_latency, args.jitter, args.malformed_rate, args.seed
+    )
+    provider.install(main)
+    if kind == "pdf":
+        upload = ("po.pdf", synthetic_po_pdf(n_items), "application/pdf")
+    else:
+        upload = ("po.xlsx", synthetic_po_workbook(n_items, with_header=True),
+                  "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    form = {"client_name": "ACME JEWELLERS LTD"}
+    if kind == "excel-mapped":
+        form["mapping_text"] = EXCEL_MAPPING
+    requests = max(3, min(args.requests, ITEM_BUDGET // max(n_items, 1)))
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def extract() -> tuple[float, int, int]:
+            start = time.perf_counter()
+            response = await client.post("/extract-invoice", files={"file": upload}, data=form)
+            items = len(response.json().get("items", [])) if response.status_code == 200 else 0
+            return time.perf_counter() - start, response.status_code, items
+
+        # First request pays for lazy imports and the provider client; not counted
+        malformed_rate, provider.malformed_rate = provider.malformed_rate, 0.0
+        await extract()
+        provider.malformed_rate = malformed_rate
+        rss_before = _rss_mb()
+        stages_before = {stage[0]: series[1] for stage, series in metrics.stage_seconds._series.items()}
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited():
+            async with semaphore:
+                return await extract()
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(limited() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _, _ in results]
+    statuses: dict[str, int] = {}
+    for _, status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    stages = {
+        stage[0]: round((series[1] - stages_before.get(stage[0], 0.0)) / requests * 1000, 2)
+        for stage, series in metrics.stage_seconds._series.items()
+    }
+    return {
+        "kind": kind,
+        "items": n_items,
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 3),
+        "items_per_s": round(sum(items for _, _, items in results) / elapsed, 1),
+        "p50_s": round(_percentile(latencies, 0.50), 4),
+        "p95_s": round(_percentile(latencies, 0.95), 4),
+        "p99_s": round(_percentile(latencies, 0.99), 4),
+        "complete": round(sum(1 for _, status, items in results if status == 200 and items == n_items) / requests, 3),
+        "statuses": statuses,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "stage_ms": {stage: ms for stage, ms in sorted(stages.items(), key=lambda item: -item[1]) if ms > 0},
+        "provider": provider.stats(),
+    }
+
+
+def run_scenario(args) -> None:
+    kind, n_items = args.scenario[0], int(args.scenario[1])
+    for name, value in {
+        "EXTRACTION_PROVIDER": "openai", "OPENAI_API_KEY": "offline", "EXTRACTION_CACHE": "off",
+        "JOBS_WORKERS": "0", "WARM_IMPORTS": "0", "SERVER_TIMING": "0",
+    }.items():
+        os.environ.setdefault(name, value)
+    _forbid_network()
+    result = asyncio.run(_scenario(args, kind, n_items))
+    print(json.dumps(result))
+
+
+# Options passed on to every scenario process, saved with the results
+SETTINGS = ("requests", "concurrency", "latency", "per_item_latency", "jitter", "malformed_rate", "recordings", "seed")
+
+
+def _child_args(args, kind: str, n_items: int) -> list[str]:
+    argv = [sys.executable, os.path.abspath(__file__), "--scenario", kind, str(n_items)]
+    for flag in SETTINGS:
+        value = getattr(args, flag)
+        if value is not None:
+            argv += ["--" + flag.replace("_", "-"), str(value)]
+    return argv
+
+
+# metric -> +1 if higher is better, -1 if lower is better
+GATED = {"throughput_rps": 1, "complete": 1, "p95_s": -1, "peak_rss_mb": -1}
+
+
+def regressions(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    previous = {(r["kind"], r["items"]): r for r in baseline}
+    found = []
+    for result in results:
+        before = previous.get((result["kind"], result["items"]))
+        if before is None:
+            continue
+        for metric, direction in GATED.items():
+            old, new = before[metric], result[metric]
+            if not old:
+                continue
+            change = (new - old) / old * direction
+            if change < -tolerance:
+                found.append(f"{result['kind']}/{result['items']}: {metric} {old} -> {new} ({-change:.0%} worse)")
+    return found
+
+
+def run() -> None:
+    args = _parser().parse_args()
+    if args.scenario:
+        run_scenario(args)
+        return
+
+    results = []
+    print(f"{'scenario':<20} {'req':>4} {'req/s':>7} {'items/s':>9} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'peak RSS':>9} {'complete':>8}  slowest stages (ms/request)")
+    for kind in args.kinds.split(","):
+        for n_items in (int(size) for size in args.sizes.split(",")):
+            out = subprocess.run(_child_args(args, kind, n_items), cwd=APP_DIR, capture_output=True, text=True)
+            lines = out.stdout.strip().splitlines()
+            if out.returncode != 0 or not lines:
+                print(f"{kind}/{n_items}: failed\n{out.stderr[-2000:]}")
+                sys.exit(1)
+            r = json.loads(lines[-1])
+            results.append(r)
+            stages = ", ".join(f"{stage} {ms:.0f}" for stage, ms in list(r["stage_ms"].items())[:3])
+            print(f"{kind + '/' + str(n_items):<20} {r['requests']:>4} {r['throughput_rps']:>7.2f} {r['items_per_s']:>9.0f} "
+                  f"{r['p50_s']:>6.2f}s {r['p95_s']:>6.2f}s {r['p99_s']:>6.2f}s {r['peak_rss_mb']:>7.0f}MB "
+                  f"{r['complete']:>8.0%}  {stages}")
+            if r["provider"]["malformed"]:
+                print(f"{'':<20} malformed responses injected: {r['provider']['malformed']}, statuses {r['statuses']}")
+
+    settings = {flag: getattr(args, flag) for flag in SETTINGS}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["settings"] != settings:
+            print(f"\nWarning: {args.baseline} was recorded with different settings: {baseline['settings']}")
+        found = regressions(results, baseline["results"], args.max_regression)
+        if found:
+            print(f"\nRegressions beyond {args.max_regression:.0%} against {args.baseline}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,124 @@
+"""Peak RSS and latency of getting an upload from the request to document text, before and after.
+
+before: the old pipeline - await file.read(), write a NamedTemporaryFile, reopen it with
+        PdfReader(path) / pd.ExcelFile(path) (page count, then text), unlink
+after:  documents.read_upload() (bytes, or an mmap of the spooled upload above
+        UPLOAD_MMAP_THRESHOLD) and readers over open_stream(), no temp file
+
+Each (document, mode) runs in a fresh subprocess. The upload is copied into a
+SpooledTemporaryFile in 64 KB chunks the way the multipart parser does, then the peak RSS
+(VmHWM, reset just before the pipeline starts) is reported relative to the RSS at that point.
+
+Usage (from apps/fastapi):
+    python scripts/bench_upload_memory.py
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EXTRACTION_PROVIDER", "openai")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("JOBS_WORKERS", "0")
+
+MB = 1024 * 1024
+DOCUMENTS = [
+    ("1 MB PDF", "po-1mb.pdf", lambda: synthetic_po_pdf(200, padding_bytes=1 * MB)),
+    ("50 MB PDF", "po-50mb.pdf", lambda: synthetic_po_pdf(200, padding_bytes=50 * MB)),
+    ("1 MB Excel", "po-1mb.xlsx", lambda: synthetic_po_workbook(50000)),
+]
+
+
+def _proc_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak() -> None:
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+async def _legacy(file, suffix: str) -> int:
+    import main
+
+    content = await file.read()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        tmp_path = tmp.name
+    try:
+        if suffix == ".pdf":
+            main._pdf_page_count(tmp_path)
+            return len(main._pdf_to_text(tmp_path))
+        return len(main._excel_to_text(tmp_path))
+    finally:
+        os.unlink(tmp_path)
+
+
+async def _in_memory(file, suffix: str) -> int:
+    import main
+    from documents import open_stream, read_upload, release
+
+    content = await read_upload(file)
+    try:
+        if suffix == ".pdf":
+            main._pdf_page_count(content)
+            return len(main._pdf_to_text(content))
+        return len(main._excel_to_text(open_stream(content)))
+    finally:
+        release(content)
+
+
+def child(path: str, mode: str) -> None:
+    from starlette.datastructures import UploadFile
+
+    import main  # noqa: F401  (imports outside the measured window)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=MB)
+    with open(path, "rb") as src:
+        while chunk := src.read(64 * 1024):
+            spool.write(chunk)
+    size = spool.tell()
+    spool.seek(0)
+    upload = UploadFile(spool, size=size, filename=os.path.basename(path))
+    suffix = os.path.splitext(path)[1]
+
+    rss_before = _proc_kb("VmRSS")
+    _reset_peak()
+    start = time.perf_counter()
+    chars = asyncio.run((_legacy if mode == "before" else _in_memory)(upload, suffix))
+    elapsed = time.perf_counter() - start
+    peak = _proc_kb("VmHWM") - rss_before
+    print(f"{elapsed:.3f} {peak} {chars}")
+
+
+def run() -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_upload_")
+    print(f"{'document':<12} {'size':>8} {'mode':<7} {'latency s':>10} {'peak RSS +MB':>13} {'text chars':>11}")
+    for label, name, build in DOCUMENTS:
+        path = os.path.join(workdir, name)
+        with open(path, "wb") as f:
+            f.write(build())
+        size = os.path.getsize(path) / MB
+        for mode in ("before", "after"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path, mode], capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            elapsed, peak_kb, chars = out.split()
+            print(f"{label:<12} {size:>6.1f}MB {mode:<7} {float(elapsed):>10.3f} {int(peak_kb) / 1024:>13.1f} {chars:>11}")
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        from scripts.fixtures import synthetic_po_pdf, synthetic_po_workbook
+
+        run()
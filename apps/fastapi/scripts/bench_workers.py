@@ -0,0 +1,197 @@
+"""Load test: /extract-invoice throughput against the number of gunicorn worker processes.
+
+For each worker count the real server is started (gunicorn -c gunicorn.conf.py, uvicorn workers)
+with the providers replaced by scripts/replay_provider.py in every worker, and CLIENTS concurrent
+clients post the same PO for DURATION seconds. Reported per worker count: requests/s, p50/p95
+latency and the status codes seen. The document is parsed on every request (EXTRACTION_CACHE=off),
+so with a short provider latency the run is CPU bound and throughput grows with the workers up to
+the number of CPUs; on a machine with one CPU it stays flat.
+
+A last run checks backpressure across workers: EXTRACTION_CONCURRENCY / EXTRACTION_MAX_QUEUE are
+made small, a burst larger than both together is sent, and the extra requests must come back as
+429 with Retry-After - as many as the service-wide limits imply, not per-worker ones.
+
+The server side of this file is the app target `scripts.bench_workers:app`.
+
+Usage (from apps/fastapi):
+    python scripts/bench_workers.py [--workers 1,2,4] [--kind pdf|excel] [--items 200]
+        [--clients 16] [--duration 15] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def __getattr__(name: str):
+    # Imported by each gunicorn worker: the service with the offline provider installed
+    if name != "app":
+        raise AttributeError(name)
+    from scripts.bench_suite import _forbid_network
+    from scripts.replay_provider import ReplayProvider
+
+    _forbid_network()
+    import main
+
+    ReplayProvider(base_latency=float(os.environ["BENCH_LATENCY"]), seed=os.getpid()).install(main)
+    return main.app
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Throughput against gunicorn worker count")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--kind", default="pdf", choices=("pdf", "excel"))
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--latency", type=float, default=0.05, help="provider base latency (s)")
+    return parser
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, latency: float, **env) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    environment = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "BENCH_LATENCY": str(latency),
+        "EXTRACTION_PROVIDER": "openai",
+        "OPENAI_API_KEY": "offline",
+        "EXTRACTION_CACHE": "off",
+        "JOBS_WORKERS": "0",
+        "SERVER_TIMING": "0",
+        "SHARED_STATE_PATH": os.path.join(APP_DIR, f".bench_workers_{port}.sqlite3"),
+        **env,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "scripts.bench_workers:app", "-c", "gunicorn.conf.py", "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=environment,
+        stdout=subprocess.DEVNULL,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+def _stop_server(server: subprocess.Popen, base_url: str) -> None:
+    server.terminate()
+    server.wait(timeout=30)
+    path = os.path.join(APP_DIR, f".bench_workers_{base_url.rsplit(':', 1)[1]}.sqlite3")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+async def _wait_ready(client, workers: int, upload, form) -> None:
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                break
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not start")
+        await asyncio.sleep(0.2)
+    # Let every worker import its dependencies before timing
+    await asyncio.gather(*(client.post("/extract-invoice", files={"file": upload}, data=form) for _ in range(workers * 2)))
+
+
+def _document(kind: str, items: int):
+    from scripts.fixtures import synthetic_po_pdf, synthetic_po_workbook
+
+    if kind == "pdf":
+        return ("po.pdf", synthetic_po_pdf(items), "application/pdf")
+    return ("po.xlsx", synthetic_po_workbook(items, with_header=True),
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
+async def _throughput(args, workers: int, upload) -> dict:
+    import httpx
+
+    form = {"client_name": "ACME JEWELLERS LTD"}
+    server, base_url = _start_server(
+        workers, args.latency, EXTRACTION_CONCURRENCY=str(args.clients), EXTRACTION_MAX_QUEUE=str(args.clients)
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            await _wait_ready(client, workers, upload, form)
+            latencies, statuses = [], {}
+            stop = time.monotonic() + args.duration
+
+            async def worker():
+                while time.monotonic() < stop:
+                    start = time.perf_counter()
+                    response = await client.post("/extract-invoice", files={"file": upload}, data=form)
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.clients)))
+            elapsed = time.perf_counter() - start
+    finally:
+        _stop_server(server, base_url)
+    latencies.sort()
+    return {
+        "workers": workers,
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def _backpressure(args, workers: int, upload) -> None:
+    import httpx
+
+    concurrency, queue, burst = 2, 2, 12
+    form = {"client_name": "ACME JEWELLERS LTD"}
+    server, base_url = _start_server(
+        workers, 2.0, EXTRACTION_CONCURRENCY=str(concurrency), EXTRACTION_MAX_QUEUE=str(queue),
+        EXTRACTION_RETRY_AFTER="7",
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            await _wait_ready(client, workers, upload, form)
+            responses = await asyncio.gather(
+                *(client.post("/extract-invoice", files={"file": upload}, data=form) for _ in range(burst))
+            )
+    finally:
+        _stop_server(server, base_url)
+    rejected = [r for r in responses if r.status_code == 429]
+    retry_after = sorted({r.headers.get("retry-after") for r in rejected})
+    print(f"\nBackpressure, {workers} workers, EXTRACTION_CONCURRENCY={concurrency} EXTRACTION_MAX_QUEUE={queue}, "
+          f"burst of {burst}:")
+    print(f"  200: {sum(r.status_code == 200 for r in responses)}, 429: {len(rejected)} "
+          f"(expected {burst - concurrency - queue} with service-wide limits), Retry-After: {retry_after}")
+
+
+async def run() -> None:
+    args = _parser().parse_args()
+    upload = _document(args.kind, args.items)
+    counts = [int(n) for n in args.workers.split(",")]
+    print(f"{args.kind}/{args.items} items, {args.clients} clients, {args.duration:.0f}s per run, "
+          f"provider latency {args.latency}s, {len(os.sched_getaffinity(0))} CPUs")
+    print(f"{'workers':>7} {'req/s':>7} {'vs 1':>6} {'p50':>7} {'p95':>7}  statuses")
+    base = None
+    for workers in counts:
+        r = await _throughput(args, workers, upload)
+        base = base or r["rps"]
+        print(f"{workers:>7} {r['rps']:>7.2f} {r['rps'] / base:>5.2f}x {r['p50']:>6.2f}s {r['p95']:>6.2f}s  {r['statuses']}")
+    await _backpressure(args, max(counts), upload)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
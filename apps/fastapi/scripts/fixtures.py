@@ -0,0 +1,321 @@
+"""Synthetic PO documents and a stand-in provider for the scripts in this folder."""
+import asyncio
+import datetime
+import io
+import json
+import os
+import re
+
+import pandas as pd
+
+CATEGORIES = ["Ring", "Pendant", "Earring", "Bracelet", "Necklace", "Bangle", "Band"]
+METALS = ["14K", "18K", "10KT", "Platinum", "Silver 925"]
+TONES = ["Yellow", "White", "Rose", "Y/W"]
+
+# Serial, style, description, qty - separated by spaces, commas or tabs, with or without spacer cells / ".0"
+ITEM_LINE = re.compile(r"^[\s,]*(\d+)(?:\.0)?[\s,]+(CJ-\d+)[\s,]+(.+?)[\s,]+(\d+)(?:\.0)?[\s,]*$", re.MULTILINE)
+EXCEL_MAPPING = "\n".join([
+    "StyleCode -> Style",
+    "OrderQty -> Qty",
+    "Metal -> Description first few words; convert to Enum value",
+    "Tone -> Description first few words; convert to Enum value",
+    "ItemPoNo -> [Header] PO Number",
+    "ItemRefNo -> (blank if not present)",
+    "StockType -> Extract from Description or Category field",
+    "MakeType -> Extract from Description or Category field",
+    "CustomerProductionInstruction -> Description",
+])
+
+# Client mappings as the backend seeds them (free-form instructions included)
+SEED_CLIENTS_TS = os.path.join(os.path.dirname(__file__), "..", "..", "backend", "src", "seed", "clients.ts")
+
+
+def seeded_mapping(client: str) -> str:
+    """mapping_text of a client seeded by apps/backend/src/seed/clients.ts."""
+    with open(SEED_CLIENTS_TS, encoding="utf-8") as f:
+        source = f.read()
+    block = re.search(r"name: '" + re.escape(client) + r"',\s*mapping: \[(.*?)\]\.join", source, re.DOTALL)
+    if block is None:
+        raise KeyError(f"No seeded client {client!r} in {SEED_CLIENTS_TS}")
+    return "\n".join(re.findall(r"^\s*'(.*)',$", block.group(1), re.MULTILINE))
+
+
+def uneek_po_workbook(n_items: int) -> bytes:
+    """Order sheet laid out for the seeded UNEEK mapping (Item No., Pieces, Vendor Item #, Stamp, ...)."""
+    rows = [
+        {
+            "Sr No": r["Sr No"],
+            "Item No.": r["Style"],
+            "Vendor Item #": f"V-{5000 + r['Sr No']}",
+            "Description": f"{r['Description']} 0.{25 + r['Sr No'] % 50}ct GH-SI Diamond {METALS[r['Sr No'] % len(METALS)]}",
+            "Size": 5 + r["Sr No"] % 4,
+            "Stamp": f"{METALS[r['Sr No'] % len(METALS)]} UNEEK",
+            "Pieces": r["Qty"],
+        }
+        for r in item_rows(n_items)
+    ]
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        pd.DataFrame([
+            ["UNEEK JEWELRY INC", None],
+            ["Purchase Order Number:", "UNK-2026-042"],
+            ["Date:", "2026-02-03"],
+        ]).to_excel(writer, sheet_name="Order", index=False, header=False)
+        pd.DataFrame(rows).to_excel(writer, sheet_name="Order", index=False, startrow=4)
+    return buf.getvalue()
+
+
+def item_rows(n_items: int) -> list[dict]:
+    return [
+        {
+            "Sr No": i,
+            "Style": f"CJ-{1000 + i}",
+            "Description": f"{METALS[i % len(METALS)]} {TONES[i % len(TONES)]} {CATEGORIES[i % len(CATEGORIES)]}",
+            "Qty": 1 + i % 3,
+        }
+        for i in range(1, n_items + 1)
+    ]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: list[list[str]], padding_bytes: int = 0) -> bytes:
+    """Build a minimal text PDF, one list of lines per page.
+
+    padding_bytes adds an unreferenced binary stream of that size, standing in for the embedded
+    images / fonts that make real PO PDFs large without adding text.
+    """
+    streams = [
+        "BT /F1 9 Tf 11 TL 36 806 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        for lines in pages
+    ]
+    return _pdf_from_streams(streams, padding_bytes)
+
+
+def _pdf_from_streams(streams: list[str], padding_bytes: int = 0) -> bytes:
+    """Assemble a PDF with one page per content stream (Helvetica as /F1)."""
+    objects: list[bytes] = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    bodies = []
+    for stream in streams:
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        data = stream.encode("latin-1")
+        bodies.append((content_id, b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"))
+        bodies.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()))
+    objects.append((1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append((2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()))
+    objects.append((3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    objects.extend(bodies)
+    if padding_bytes:
+        blob = os.urandom(padding_bytes)
+        objects.append((next_id, b"<< /Length %d >>\nstream\n" % len(blob) + blob + b"\nendstream"))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(f"{obj_id} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for obj_id in range(1, len(objects) + 1):
+        out.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def synthetic_po_pdf(n_items: int, items_per_page: int = 40, padding_bytes: int = 0) -> bytes:
+    rows = item_rows(n_items)
+    header = ["ACME JEWELLERS LTD - PURCHASE ORDER", "PO Number: PO-2026-001   Date: 2026-01-15", "Vendor: Chandra Jewels", "Sr No  Style  Description  Qty"]
+    pages = []
+    for start in range(0, max(n_items, 1), items_per_page):
+        lines = list(header) if start == 0 else []
+        lines += [f"{r['Sr No']} {r['Style']} {r['Description']} {r['Qty']}" for r in rows[start : start + items_per_page]]
+        pages.append(lines)
+    return make_pdf(pages, padding_bytes)
+
+
+def synthetic_po_workbook(n_items: int, with_header: bool = False) -> bytes:
+    """Order sheet of n_items rows, optionally below a buyer / PO number / date block."""
+    buf = io.BytesIO()
+    startrow = 0
+    with pd.ExcelWriter(buf) as writer:
+        if with_header:
+            pd.DataFrame([
+                ["ACME JEWELLERS LTD", None],
+                ["PO Number:", "PO-2026-001"],
+                ["Date:", "2026-01-15"],
+            ]).to_excel(writer, sheet_name="Order", index=False, header=False)
+            startrow = 4
+        pd.DataFrame(item_rows(n_items)).to_excel(writer, sheet_name="Order", index=False, startrow=startrow)
+    return buf.getvalue()
+
+
+def layout_po_pdf(n_items: int, items_per_page: int = 40) -> bytes:
+    """PO as layout-heavy PDFs come out of pypdf: column-aligned rows, header and footer on every page."""
+    rows = item_rows(n_items)
+    header = [
+        "ACME JEWELLERS LTD                              PURCHASE ORDER",
+        "PO Number:    PO-2026-001                       Date:    2026-01-15",
+        "Vendor:       Chandra Jewels                    Currency:  USD",
+        "",
+        "Sr No     Style          Description                          Qty",
+    ]
+    footer = ["", "Confidential - for vendor use only", "ACME Jewellers Ltd  |  5th Avenue, New York  |  +1 212 555 0100"]
+    pages = []
+    for page, start in enumerate(range(0, max(n_items, 1), items_per_page)):
+        lines = list(header)
+        lines += [
+            f"{r['Sr No']:<9} {r['Style']:<14} {r['Description']:<36} {r['Qty']:>3}"
+            for r in rows[start : start + items_per_page]
+        ]
+        lines += footer + [f"Page {page + 1}"]
+        pages.append(lines)
+    return make_pdf(pages)
+
+
+def table_po_pdf(n_items: int, items_per_page: int = 40, changed_item: int | None = None) -> bytes:
+    """PO whose rows are drawn cell by cell at fixed column positions, as PDF exports of spreadsheets are.
+
+    changed_item gets a different quantity, so only the page holding it differs from the default document.
+    """
+    rows = item_rows(n_items)
+    columns = (36, 90, 170, 400, 500)
+
+    def cells(y: int, values) -> str:
+        return " ".join(
+            f"BT /F1 9 Tf 1 0 0 1 {x} {y} Tm ({_pdf_escape(str(v))}) Tj ET" for x, v in zip(columns, values)
+        )
+
+    streams = []
+    for page, start in enumerate(range(0, max(n_items, 1), items_per_page)):
+        parts = [
+            cells(806, ["ACME JEWELLERS LTD", "", "", "PURCHASE ORDER"]),
+            cells(792, ["PO Number:", "PO-2026-001", "", "Date: 2026-01-15"]),
+            cells(764, ["Sr No", "Style", "Description", "Qty", "Remarks"]),
+        ]
+        y = 750
+        for r in rows[start : start + items_per_page]:
+            qty = r["Qty"] + 10 if r["Sr No"] == changed_item else r["Qty"]
+            parts.append(cells(y, [r["Sr No"], r["Style"], r["Description"], qty, ""]))
+            y -= 16
+        parts.append(cells(40, ["", "", f"Page {page + 1}"]))
+        streams.append(" ".join(parts))
+    return _pdf_from_streams(streams)
+
+
+def messy_po_workbook(n_items: int, sheets: int = 2, repeat_title_every: int = 50) -> bytes:
+    """Multi-sheet PO as clients export it: header block on every sheet, spacer columns, blank rows."""
+    rows = item_rows(n_items)
+    per_sheet = -(-n_items // sheets)
+    title = ["Sr No", None, "Style", "Description", None, "Qty", "Remarks", None]
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        for sheet in range(sheets):
+            grid = [["ACME JEWELLERS LTD"], ["PO Number:", "PO-2026-001"], ["Date:", "2026-01-15"], [], title]
+            for i, r in enumerate(rows[sheet * per_sheet : (sheet + 1) * per_sheet]):
+                if i and i % repeat_title_every == 0:
+                    grid += [[], [], title]
+                grid.append([r["Sr No"], None, r["Style"], r["Description"], None, r["Qty"], None, None])
+            pd.DataFrame(grid).to_excel(writer, sheet_name=f"Order {sheet + 1}", index=False, header=False)
+    return buf.getvalue()
+
+
+def large_po_workbook(path: str, rows_per_sheet: int, sheets: int = 3, blank_rows: int = 20000) -> None:
+    """Large multi-sheet PO written straight to path (openpyxl write-only mode, nothing held in memory).
+
+    Every sheet has the header block, rows_per_sheet item rows over 10 columns (two of them empty
+    spacers) and then blank_rows formatted but empty rows, as left behind by formatting a whole
+    column range in Excel.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import PatternFill
+
+    workbook = Workbook(write_only=True)
+    fill = PatternFill("solid", fgColor="FFF2CC")
+    for sheet in range(sheets):
+        ws = workbook.create_sheet(f"Order {sheet + 1}")
+        ws.append(["ACME JEWELLERS LTD"])
+        ws.append(["PO Number:", "PO-2026-001"])
+        ws.append(["Date:", datetime.datetime(2026, 1, 15)])
+        ws.append([])
+        ws.append(["Sr No", None, "Style", "Description", "Metal", "Tone", None, "Qty", "Size", "Remarks"])
+        for i in range(rows_per_sheet):
+            serial = sheet * rows_per_sheet + i + 1
+            ws.append([
+                serial, None, f"CJ-{1000 + serial}",
+                f"{METALS[serial % len(METALS)]} {TONES[serial % len(TONES)]} {CATEGORIES[serial % len(CATEGORIES)]}",
+                "14K", "Yellow",
+                None, 1 + serial % 3, 5 + serial % 6 if serial % 3 else None, "Rush" if serial % 7 == 0 else None,
+            ])
+        blank = WriteOnlyCell(ws, value=None)
+        blank.fill = fill
+        for _ in range(blank_rows):
+            ws.append([blank] * 10)
+    workbook.save(path)
+
+
+def stub_response_for(prompt: str) -> str:
+    """Answer like the model would: one item per serial-numbered line found in the document text.
+
+    Excel fast-path row prompts get one {"row": id, field: value} entry per row instead.
+    """
+    if "Rows (cells joined with ' | '):" in prompt:
+        fields = re.findall(r"^- (\w+): ", prompt.split("Rows (cells joined with")[0], re.MULTILINE)
+        rows = [
+            {"row": json.loads(line)["row"], **{field: f"{field} (stub)" for field in fields}}
+            for line in prompt.split("Rows (cells joined with ' | '):\n", 1)[1].splitlines()
+            if line.startswith("{")
+        ]
+        return json.dumps({"rows": rows})
+    document = re.split(r"PDF content \(extracted text\):|Excel File Content:", prompt)[-1]
+    items, serials = [], []
+    for serial, style, description, qty in ITEM_LINE.findall(document):
+        serials.append(int(serial))
+        items.append({"VendorStyleCode": style, "Category": description.split()[-1], "OrderQty": int(qty)})
+    return json.dumps({
+        "client_name": "ACME JEWELLERS LTD",
+        "invoice_number": "PO-2026-001",
+        "invoice_date": "2026-01-15",
+        "total_value": None,
+        "total_entries": len(items),
+        "_debug_serials": serials,
+        "items": items,
+    })
+
+
+def stub_provider(base_latency: float = 0.5, per_item_latency: float = 0.02):
+    """Async provider stand-in whose latency grows with the number of items it has to generate."""
+
+    async def run(full_prompt: str, *args) -> str:
+        response = stub_response_for(full_prompt)
+        generated = response.count("VendorStyleCode") + response.count('"row":')
+        await asyncio.sleep(base_latency + per_item_latency * generated)
+        return response
+
+    return run
+
+
+def stub_stream_provider(per_item_latency: float = 0.02, first_token_latency: float = 0.3):
+    """Streaming stand-in: emits the stub response item by item, paced like token generation."""
+
+    async def run(full_prompt: str, *args):
+        response = stub_response_for(full_prompt)
+        await asyncio.sleep(first_token_latency)
+        pieces = re.split(r"(?<=\}),\s*(?=\{)", response)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(per_item_latency)
+            yield piece + ("," if i < len(pieces) - 1 else "")
+
+    return run
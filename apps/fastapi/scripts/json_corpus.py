@@ -0,0 +1,65 @@
+"""Malformed model outputs seen (or plausible) from the extraction providers.
+
+Each case is built from a well-formed response of n_items items so the benchmark can check
+both that parsing succeeds and that every item is recovered.
+"""
+import json
+import re
+
+
+def _response(n_items: int) -> dict:
+    return {
+        "total_value": 1234.5,
+        "client_name": "ACME JEWELLERS LTD",
+        "invoice_number": "PO-2026-001",
+        "invoice_date": "2026-01-15",
+        "total_entries": n_items,
+        "_debug_serials": list(range(1, n_items + 1)),
+        "items": [
+            {
+                "VendorStyleCode": f"CJ-{1000 + i}",
+                "Category": "Ring",
+                "ItemSize": "7",
+                "OrderQty": 1 + i % 3,
+                "Metal": "G14KT",
+                "Tone": "Y",
+                "ItemPoNo": "PO-2026-001",
+                "ItemRefNo": f"REF-{i}",
+                "StockType": "Studded Gold Jewellery IC",
+                "MakeType": None,
+                "CustomerProductionInstruction": "14K Yellow Gold Diamond Ring, size 7",
+                "SpecialRemarks": None,
+                "DesignProductionInstruction": None,
+                "StampInstruction": "14K",
+            }
+            for i in range(1, n_items + 1)
+        ],
+    }
+
+
+def build_corpus(n_items: int = 500) -> list[tuple[str, str, int]]:
+    """[(case name, model output, expected item count)]"""
+    good = json.dumps(_response(n_items), indent=2)
+    compact = json.dumps(_response(n_items))
+    truncated_at = good.rfind('"VendorStyleCode"')
+    cases = [
+        ("valid", good, n_items),
+        ("valid_compact", compact, n_items),
+        ("markdown_fences", f"```json\n{good}\n```", n_items),
+        ("prose_around", f"Here is the extracted JSON:\n{good}\nLet me know if you need anything else.", n_items),
+        ("trailing_commas", re.sub(r"(\n\s*[}\]])", r",\1", good), n_items),
+        ("missing_commas_between_items", good.replace("},\n    {", "}\n    {"), n_items),
+        ("missing_commas_between_fields", re.sub(r'(null|"|\d),\n', r"\1\n", good), n_items),
+        ("unquoted_keys", re.sub(r'"(\w+)":', r"\1:", good), n_items),
+        ("python_literals", good.replace("null", "None"), n_items),
+        ("raw_newlines_in_strings", good.replace("Diamond Ring, size 7", "Diamond Ring\nsize 7"), n_items),
+        ("control_chars", good.replace("Diamond", "Dia\x07mond"), n_items),
+        ("single_quotes", compact.replace('"', "'"), n_items),
+        ("double_commas", good.replace('",\n', '",,\n'), n_items),
+        ("truncated_mid_item", good[: truncated_at + 30], n_items),
+        ("unterminated_string", good.replace('"REF-3",', '"REF-3\n'), n_items),
+        # No JSON at all (refusal, empty output): must fail with JSONRepairError, not a bare ValueError
+        ("no_json_refusal", "I cannot help with that.", 0),
+        ("empty_output", "", 0),
+    ]
+    return cases
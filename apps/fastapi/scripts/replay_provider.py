@@ -0,0 +1,129 @@
+"""Offline stand-in for the extraction providers: replays recorded responses with injected latency and malformed JSON.
+
+A response is looked up in the recordings directory by the sha256 of the prompt (files written by
+record() around a real provider call); prompts without a recording get stub_response_for(), which
+answers like the model: one item per serial-numbered line of the document.
+
+Latency is the recorded one when there is a recording, otherwise base + per item, times a
+log-normal jitter. With malformed_rate > 0 that share of responses is damaged by one of MUTATIONS,
+the ways model output has been seen to break (see json_corpus.py for the parser's full corpus).
+Everything is seeded, so two runs with the same settings see the same latencies and damage.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+from scripts.fixtures import stub_response_for
+
+
+def _truncate(response: str) -> str:
+    cut = response.rfind("{", 0, int(len(response) * 0.98))
+    return response[: cut + 10] if cut > 0 else response[: len(response) // 2]
+
+
+MUTATIONS = {
+    "markdown_fences": lambda r: f"```json\n{r}\n```",
+    "prose_around": lambda r: f"Here is the extracted JSON:\n{r}\nLet me know if you need anything else.",
+    "trailing_comma": lambda r: r.replace("}]", "},]"),
+    "missing_commas_between_items": lambda r: r.replace("}, {", "} {"),
+    "python_literals": lambda r: r.replace("null", "None"),
+    "single_quotes": lambda r: r.replace('"', "'"),
+    "truncated": _truncate,
+}
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def load_recordings(directory: str | None) -> dict[str, dict]:
+    """{prompt key: {"response": text, "latency": seconds}} from the *.json files record() wrote."""
+    recordings = {}
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    recordings[name[:-5]] = json.load(f)
+    return recordings
+
+
+def record(complete, directory: str):
+    """Wrap a real provider call (prompt -> text) so every response is saved for replay."""
+    os.makedirs(directory, exist_ok=True)
+
+    async def run(full_prompt: str, *args) -> str:
+        start = time.perf_counter()
+        response = await complete(full_prompt, *args)
+        entry = {"response": response, "latency": round(time.perf_counter() - start, 3)}
+        with open(os.path.join(directory, prompt_key(full_prompt) + ".json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        return response
+
+    return run
+
+
+class ReplayProvider:
+    def __init__(
+        self,
+        recordings_dir: str | None = None,
+        base_latency: float = 0.2,
+        per_item_latency: float = 0.001,
+        jitter: float = 0.2,
+        malformed_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.recordings = load_recordings(recordings_dir)
+        self.base_latency = base_latency
+        self.per_item_latency = per_item_latency
+        self.jitter = jitter
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.replayed = 0
+        self.malformed: dict[str, int] = {}
+
+    def _respond(self, prompt: str) -> tuple[str, float]:
+        self.calls += 1
+        recording = self.recordings.get(prompt_key(prompt))
+        if recording is not None:
+            self.replayed += 1
+            response, latency = recording["response"], recording.get("latency")
+        else:
+            response, latency = stub_response_for(prompt), None
+        if latency is None:
+            latency = self.base_latency + self.per_item_latency * response.count("VendorStyleCode")
+        if self.jitter:
+            latency *= self._random.lognormvariate(0, self.jitter)
+        if self.malformed_rate and self._random.random() < self.malformed_rate:
+            name = self._random.choice(list(MUTATIONS))
+            self.malformed[name] = self.malformed.get(name, 0) + 1
+            response = MUTATIONS[name](response)
+        return response, latency
+
+    async def complete(self, full_prompt: str, *args) -> str:
+        response, latency = self._respond(full_prompt)
+        await asyncio.sleep(latency)
+        return response
+
+    async def stream(self, full_prompt: str, *args):
+        """Emits the response item by item, a third of the latency before the first piece."""
+        response, latency = self._respond(full_prompt)
+        pieces = re.split(r"(?<=\}),\s*(?=\{)", response)
+        await asyncio.sleep(latency / 3)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(latency * 2 / 3 / len(pieces))
+            yield piece + ("," if i < len(pieces) - 1 else "")
+
+    def install(self, main) -> None:
+        """Answer every provider call of the service module main."""
+        main._run_extraction_openai = self.complete
+        main._run_extraction_gemini = self.complete
+        main._stream_extraction_openai = self.stream
+        main._stream_extraction_gemini = self.stream
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "replayed": self.replayed, "malformed": dict(sorted(self.malformed.items()))}
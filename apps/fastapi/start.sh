@@ -2,17 +2,11 @@
 # Startup script for FastAPI on Render
 # Render provides PORT environment variable automatically
 
-PORT=${PORT:-8000}
-HOST=${HOST:-0.0.0.0}
+export PORT=${PORT:-8000}
+export HOST=${HOST:-0.0.0.0}
 
 echo "Starting FastAPI server on ${HOST}:${PORT}"
 
-# Use uvicorn with proper configuration for production
-uvicorn main:app \
-  --host "${HOST}" \
-  --port "${PORT}" \
-  --workers 1 \
-  --timeout-keep-alive 75 \
-  --timeout-graceful-shutdown 10 \
-  --log-level info
-
+# gunicorn with uvicorn workers, one per CPU (WEB_CONCURRENCY overrides); see gunicorn.conf.py.
+# The workers share extraction limits and provider rate limits through SHARED_STATE_PATH.
+exec gunicorn main:app -c gunicorn.conf.py
@@ -0,0 +1,97 @@
+from json_repair import JSONRepairError, loads_tolerant
+
+
+class IncrementalItemParser:
+    """Pulls completed objects out of the top-level "items" (or "lines") array of a streamed JSON response.
+
+    feed() takes the next piece of model output and returns the item dicts whose closing brace
+    arrived in it. The scan is a single pass over new characters only, and only the unconsumed tail
+    (the open item, or an open top-level string) is kept for scanning, so total work is linear in
+    the response size. The deltas are kept in a list and joined once by .text for the final parse
+    once the stream ends.
+    """
+
+    ITEM_KEYS = ("items", "lines")
+
+    def __init__(self):
+        self._chunks: list[str] = []
+        self._buf = ""  # unconsumed tail of the output; _pos and the *_start indices point into it
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string = None
+        self._items_depth = None  # depth inside the items array once it has been opened
+        self._item_start = -1
+        self.items_emitted = 0
+        self.items_skipped = 0
+
+    def feed(self, chunk: str) -> list[dict]:
+        self._chunks.append(chunk)
+        self._buf += chunk
+        text = self._buf
+        completed = []
+        for idx in range(self._pos, len(text)):
+            ch = text[idx]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1 : idx]
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = idx
+            elif ch == "{":
+                self._depth += 1
+                if self._items_depth is not None and self._depth == self._items_depth + 1:
+                    self._item_start = idx
+            elif ch == "}":
+                if self._items_depth is not None and self._depth == self._items_depth + 1 and self._item_start >= 0:
+                    item = self._load(text[self._item_start : idx + 1])
+                    if item is not None:
+                        completed.append(item)
+                    self._item_start = -1
+                self._depth -= 1
+            elif ch == "[":
+                self._depth += 1
+                if self._depth == 2 and self._items_depth is None and self._last_string in self.ITEM_KEYS:
+                    self._items_depth = self._depth
+            elif ch == "]":
+                if self._items_depth is not None and self._depth == self._items_depth:
+                    self._items_depth = None
+                    self._last_string = None
+                self._depth -= 1
+        # Drop what no open item or top-level string still needs, so the next delta is appended to a
+        # short tail instead of copying the whole response
+        keep = len(text)
+        if self._item_start >= 0:
+            keep = self._item_start
+        if self._in_string and self._depth == 1:
+            keep = min(keep, self._string_start)
+        self._buf = text[keep:]
+        if self._item_start >= 0:
+            self._item_start -= keep
+        self._string_start -= keep
+        self._pos = len(self._buf)
+        self.items_emitted += len(completed)
+        return completed
+
+    @property
+    def text(self) -> str:
+        """The whole response so far."""
+        return "".join(self._chunks)
+
+    def _load(self, fragment: str) -> dict | None:
+        try:
+            item, _ = loads_tolerant(fragment)
+        except JSONRepairError:
+            # Leave unrecoverable items for the repair pass on the full response
+            self.items_skipped += 1
+            return None
+        return item if isinstance(item, dict) else None